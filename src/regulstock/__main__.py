@@ -8,6 +8,19 @@ from typing import Any
 from kedro.framework.cli.utils import find_run_command
 from kedro.framework.project import configure_project
 
+from regulstock.diff import diff_command
+from regulstock.incremental import incremental_command
+from regulstock.lookup import lookup_command
+from regulstock.sharding import sharded_command
+
+# commandes d'investigation : `regulstock <commande> ...`, le reste part sur `kedro run`
+COMMANDS = {
+    "lookup": lookup_command,
+    "sharded": sharded_command,
+    "incremental": incremental_command,
+    "diff": diff_command,
+}
+
 
 def main(*args, **kwargs) -> Any:
     package_name = Path(__file__).parent.name
@@ -16,6 +29,9 @@ def main(*args, **kwargs) -> Any:
     interactive = hasattr(sys, 'ps1')
     kwargs["standalone_mode"] = not interactive
 
+    if not args and sys.argv[1:2] and sys.argv[1] in COMMANDS:
+        return COMMANDS[sys.argv[1]].main(sys.argv[2:], prog_name=f"regulstock {sys.argv[1]}", **kwargs)
+
     run = find_run_command(package_name)
     return run(*args, **kwargs)
 
@@ -0,0 +1,120 @@
+"""
+Colonnes clés encodées en catégories (dictionnaire Arrow une fois en parquet).
+
+sku, sku_m3, depot, category, emplacement, type, lot et qualite ont peu de modalités : en ``category``
+elles coûtent un entier par ligne au lieu d'un objet Python, et les groupby / merge
+travaillent directement sur les codes.
+Pour que l'encodage survive aux merge et concat, les tables jointes doivent partager
+exactement les mêmes catégories : c'est le rôle de ``unify_categories``.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+CATEGORICAL_COLS = ["sku", "sku_m3", "depot", "category", "emplacement", "type", "lot", "qualite"]
+
+
+def to_categorical(df: pd.DataFrame, cols: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Convertit en ``category`` les colonnes clés présentes (catégories triées)."""
+    to_convert = {
+        col: "category"
+        for col in cols or CATEGORICAL_COLS
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype)
+    }
+    return df.astype(to_convert) if to_convert else df
+
+
+def sort_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """Trie les modalités des colonnes catégorielles (ex. après relecture de parties parquet)."""
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and not df[col].cat.categories.is_monotonic_increasing:
+            df[col] = df[col].cat.reorder_categories(df[col].cat.categories.sort_values())
+    return df
+
+
+def _as_values(s: pd.Series) -> pd.Series:
+    return s.astype(object) if isinstance(s.dtype, pd.CategoricalDtype) else s
+
+
+def sort_by_value(df: pd.DataFrame, cols: Sequence[str]) -> pd.DataFrame:
+    """
+    Tri stable sur la valeur des colonnes et non sur le code de catégorie (ordre des
+    statistiques parquet), valeurs nulles en fin. Les colonnes absentes sont ignorées.
+    """
+    keys = [col for col in cols if col in df.columns]
+    if not keys:
+        return df
+    return df.sort_values(keys, key=_as_values, kind="stable", na_position="last").reset_index(drop=True)
+
+
+def unify_categories(
+    frames: Sequence[pd.DataFrame],
+    cols: Optional[Sequence[str]] = None,
+) -> Tuple[List[pd.DataFrame], Dict[str, pd.CategoricalDtype]]:
+    """
+    Aligne les catégories des colonnes communes sur l'union triée des modalités.
+    Seules les colonnes catégorielles dans toutes les tables qui les portent sont traitées.
+    Renvoie les tables, dans l'ordre de ``frames`` (copies superficielles re-typées, les
+    tables reçues ne sont jamais modifiées : entrées de nodes partagées), et les dtypes
+    obtenus, par colonne.
+    """
+    out = list(frames)
+    copied = [False] * len(out)
+    dtypes: Dict[str, pd.CategoricalDtype] = {}
+    for col in cols or CATEGORICAL_COLS:
+        holders = [i for i, df in enumerate(out) if col in df.columns]
+        if not holders or not all(isinstance(out[i][col].dtype, pd.CategoricalDtype) for i in holders):
+            continue
+
+        categories = out[holders[0]][col].cat.categories
+        for i in holders[1:]:
+            categories = categories.union(out[i][col].cat.categories)
+        dtype = pd.CategoricalDtype(categories.sort_values())
+
+        for i in holders:
+            # comparaison des modalités plutôt que des dtypes : l'égalité de dtypes
+            # catégoriels passe par un hachage complet des modalités
+            if not out[i][col].cat.categories.equals(dtype.categories):
+                if not copied[i]:
+                    out[i], copied[i] = out[i].copy(deep=False), True
+                out[i][col] = out[i][col].cat.set_categories(dtype.categories)
+        dtypes[col] = dtype
+    return out, dtypes
+
+
+def concat_keep_categories(parts: List[pd.DataFrame], dtypes: Dict[str, pd.CategoricalDtype]) -> pd.DataFrame:
+    """
+    ``pd.concat`` qui conserve l'encodage : une colonne absente d'une partie y est ajoutée
+    vide avec le dtype catégoriel commun, au lieu d'être complétée en object.
+    """
+    present = {col for part in parts for col in part.columns}
+    aligned = []
+    for part in parts:
+        missing = {
+            col: pd.Series(pd.NA, index=part.index, dtype=dtype)
+            for col, dtype in dtypes.items()
+            if col in present and col not in part.columns
+        }
+        part = part.assign(**missing) if missing else part
+        # concaténation des codes : pd.concat revérifierait les modalités de chaque partie
+        codes = {
+            col: part[col].cat.codes
+            for col, dtype in dtypes.items()
+            if col in part.columns
+            and isinstance(part[col].dtype, pd.CategoricalDtype)
+            and part[col].cat.categories.equals(dtype.categories)
+        }
+        aligned.append((part.assign(**codes) if codes else part, set(codes)))
+
+    encoded = set.intersection(*(cols for _, cols in aligned)) if aligned else set()
+    out = pd.concat(
+        [
+            part.assign(**{col: pd.Categorical.from_codes(part[col], dtype=dtypes[col]) for col in cols - encoded})
+            if cols - encoded else part
+            for part, cols in aligned
+        ],
+        ignore_index=True,
+    )
+    for col in encoded:
+        out[col] = pd.Categorical.from_codes(out[col].to_numpy(), dtype=dtypes[col])
+    return out
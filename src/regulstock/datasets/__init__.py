@@ -0,0 +1,17 @@
+"""Datasets Kedro spécifiques au projet (``type: regulstock.datasets.<Classe>`` dans le catalog)."""
+
+from .arrow_handoff_dataset import ArrowHandoffDataset
+from .arrow_sql_dataset import ArrowSQLQueryDataset
+from .chunked_csv_dataset import ChunkedCSVDataset
+from .partitioned_parquet_dataset import PartitionedParquetDataset
+from .pushdown_sql_dataset import PushdownSQLQueryDataset
+from .sql_dataset import PooledSQLQueryDataset
+
+__all__ = [
+    "ArrowHandoffDataset",
+    "ArrowSQLQueryDataset",
+    "ChunkedCSVDataset",
+    "PartitionedParquetDataset",
+    "PooledSQLQueryDataset",
+    "PushdownSQLQueryDataset",
+]
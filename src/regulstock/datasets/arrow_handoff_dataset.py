@@ -0,0 +1,118 @@
+"""
+``ArrowHandoffDataset`` : passage en mémoire d'un dataset intermédiaire, écriture en tâche de fond.
+
+Enveloppe le dataset parquet du catalog le temps d'un run (installé par ``ArrowHandoffHooks``) :
+  - ``save`` fige les données en table Arrow (immuable, partagée sans copie entre le
+    consommateur et l'écriture) et confie l'écriture parquet au thread du dataset ;
+  - ``load`` reconstruit le DataFrame depuis la table en mémoire, sans relire le disque ;
+  - ``wait`` attend la fin des écritures (fin de run) et relance leur éventuelle erreur.
+
+Un node consommateur reçoit donc son entrée dès que le producteur a terminé, pendant que
+le parquet s'écrit. Les lignes arrivent dans l'ordre de la relecture du dataset enveloppé
+(``sort_by`` dans chaque partie, sous-dossiers de partition dans l'ordre des chemins), les
+colonnes catégorielles avec des modalités triées : les sorties des nodes consommateurs sont
+celles d'un run sans handoff.
+Les ``node_columns`` du dataset enveloppé s'appliquent aussi à la table en mémoire.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+from kedro.io.core import AbstractDataset
+
+from regulstock.categoricals import sort_categories
+
+from .partitioned_parquet_dataset import _normalize_schema
+
+
+class ArrowHandoffDataset(AbstractDataset[pd.DataFrame, pd.DataFrame]):
+    """
+    Exemple :
+
+        handoff = ArrowHandoffDataset(catalog.get("m3_map"))
+        handoff.save(m3_map)        # rend la main avant la fin de l'écriture parquet
+        handoff.load()              # depuis la mémoire
+        handoff.wait()
+
+    Chaque ``save`` (un par lot d'un node générateur) est écrit dans l'ordre, par un seul
+    thread. Après ``release``, ou sans ``save`` dans le run, ``load`` lit le dataset enveloppé.
+    """
+
+    def __init__(self, dataset: AbstractDataset, metadata: Optional[Dict[str, Any]] = None) -> None:
+        self._dataset = dataset
+        self._tables: List[pa.Table] = []
+        self._writes: List[Future] = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="parquet-handoff")
+        self._lock = threading.Lock()
+        self._projection = threading.local()
+        self.write_seconds = 0.0
+        self.metadata = metadata
+
+    @property
+    def dataset(self) -> AbstractDataset:
+        return self._dataset
+
+    def _describe(self) -> Dict[str, Any]:
+        return {"dataset": self._dataset._describe(), "in_memory_parts": len(self._tables)}
+
+    def save(self, data: pd.DataFrame) -> None:
+        if hasattr(self._dataset, "to_table"):
+            table = self._dataset.to_table(data)
+        else:
+            table = _normalize_schema(pa.Table.from_pandas(data, preserve_index=False))
+        with self._lock:
+            self._tables.append(table)
+            self._writes.append(self._executor.submit(self._write, table))
+
+    def _write(self, table: pa.Table) -> None:
+        start = time.perf_counter()
+        if hasattr(self._dataset, "save_table"):
+            self._dataset.save_table(table)
+        else:
+            self._dataset.save(table.to_pandas())
+        self.write_seconds += time.perf_counter() - start
+
+    def project(self, node_name: str) -> None:
+        self._projection.node = node_name
+
+    def load(self) -> pd.DataFrame:
+        node_name, self._projection.node = getattr(self._projection, "node", None), None
+        with self._lock:
+            tables = list(self._tables)
+        if not tables:
+            self.wait()
+            if node_name is not None and hasattr(self._dataset, "project"):
+                self._dataset.project(node_name)
+            return self._dataset.load()
+
+        table = tables[0] if len(tables) == 1 else pa.concat_tables(tables, promote_options="permissive")
+        order = self._dataset.read_order(table) if hasattr(self._dataset, "read_order") else None
+        columns = self._dataset.columns_for(node_name) if node_name and hasattr(self._dataset, "columns_for") else None
+        if columns is not None:
+            table = table.select(columns)
+        if order is not None:
+            table = table.take(order)
+        return sort_categories(table.to_pandas())
+
+    def wait(self) -> None:
+        """Attend les écritures en cours ; relance la première erreur rencontrée."""
+        with self._lock:
+            writes, self._writes = self._writes, []
+        errors = [future.exception() for future in writes]
+        error = next((e for e in errors if e is not None), None)
+        if error is not None:
+            raise error
+
+    def _exists(self) -> bool:
+        return bool(self._tables) or self._dataset.exists()
+
+    def _release(self) -> None:
+        # plus de consommateur dans le run : la mémoire est rendue, l'écriture continue
+        with self._lock:
+            self._tables = []
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
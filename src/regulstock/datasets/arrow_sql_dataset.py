@@ -0,0 +1,149 @@
+"""
+``ArrowSQLQueryDataset`` : ``PooledSQLQueryDataset`` dont le résultat est lu en colonnes Arrow.
+
+``pandas.read_sql`` sur pyodbc construit un tuple Python par ligne puis convertit ces tuples
+en DataFrame : c'est l'essentiel du temps d'extraction. Ici le driver remplit directement
+des record batches Arrow :
+  - SQL Server (``mssql+pyodbc``) : ``arrow-odbc``, sur la chaîne ODBC de l'engine ;
+  - SQLite (``sqlite``) : ``adbc-driver-sqlite`` (tests, données locales).
+
+Le DataFrame renvoyé a des colonnes ``pd.ArrowDtype`` (aucun objet Python par valeur),
+normalisées telles quelles par ``standardize_m3`` / ``standardize_reflex`` (pyarrow.compute).
+Sans driver Arrow pour l'engine (module absent, autre dialecte), la lecture passe par
+``pandas.read_sql`` comme ``PooledSQLQueryDataset``.
+
+La requête est ``sql``, ou générée comme pour ``PushdownSQLQueryDataset`` à partir de
+``source`` / ``text_cols`` / ``sum_cols`` / ``null_cols`` / ``group_on``. Avec ``load_args.chunksize``,
+``load`` renvoie un itérateur de DataFrames d'au moins ``chunksize`` lignes (le dernier
+excepté), assemblés à partir des batches du driver.
+"""
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+import logging
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+from .pushdown_sql_dataset import NULL_SENTINELS, pushdown_sql
+from .sql_dataset import PooledSQLQueryDataset
+
+logger = logging.getLogger(__name__)
+
+# lignes par record batch demandées au driver
+BATCH_ROWS = 65_536
+
+
+def _odbc_reader(engine: Any, sql: str, batch_rows: int) -> pa.RecordBatchReader:
+    from arrow_odbc import read_arrow_batches_from_odbc
+
+    # chaîne ODBC construite par le dialecte pyodbc à partir de l'URL du credential
+    (connection_string, *_), _ = engine.dialect.create_connect_args(engine.url)
+    reader = read_arrow_batches_from_odbc(query=sql, connection_string=connection_string, batch_size=batch_rows)
+    return pa.RecordBatchReader.from_batches(reader.schema, reader)
+
+
+def _sqlite_reader(engine: Any, sql: str, batch_rows: int) -> pa.RecordBatchReader:
+    from adbc_driver_sqlite import dbapi
+
+    connection = dbapi.connect(engine.url.database)
+    cursor = connection.cursor()
+    cursor.adbc_statement.set_options(**{"adbc.sqlite.query.batch_rows": str(batch_rows)})
+    cursor.execute(sql)
+    reader = cursor.fetch_record_batch()
+
+    def batches() -> Iterator[pa.RecordBatch]:
+        # connexion fermée une fois le dernier batch lu
+        try:
+            yield from reader
+        finally:
+            cursor.close()
+            connection.close()
+
+    return pa.RecordBatchReader.from_batches(reader.schema, batches())
+
+
+# driver SQLAlchemy de l'engine -> lecture Arrow
+ARROW_DRIVERS: Dict[str, Callable[[Any, str, int], pa.RecordBatchReader]] = {
+    "pyodbc": _odbc_reader,
+    "pysqlite": _sqlite_reader,
+}
+
+
+def _to_pandas(table: pa.Table) -> pd.DataFrame:
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+class ArrowSQLQueryDataset(PooledSQLQueryDataset):
+    """
+    Exemple de catalog :
+
+        m3_po_dataset:
+          type: regulstock.datasets.ArrowSQLQueryDataset
+          credentials: wolfdb_M3_sql
+          sql: SELECT h.WHLO AS Depot, h.PUNO AS PO FROM m3.dbo.MPHEAD AS h
+
+        reflex_stock_dataset:
+          type: regulstock.datasets.ArrowSQLQueryDataset
+          credentials: wolfdb_REFLEX_sql
+          source: SELECT src.GECART AS SKU, src.GEQGEI AS Stock_en_VL FROM ...
+          text_cols: [SKU]
+          sum_cols: [Stock_en_VL]
+
+    ``fetch_path`` (``"arrow"`` ou ``"read_sql"``) indique le chemin de la dernière lecture.
+    """
+
+    def __init__(
+        self,
+        *,
+        sql: Optional[str] = None,
+        source: Optional[str] = None,
+        text_cols: Sequence[str] = (),
+        sum_cols: Sequence[str] = (),
+        null_cols: Sequence[str] = (),
+        null_sentinels: Sequence[str] = NULL_SENTINELS,
+        group_on: str = "raw",
+        batch_rows: int = BATCH_ROWS,
+        **kwargs: Any,
+    ) -> None:
+        if source is not None:
+            sql = pushdown_sql(source, text_cols, sum_cols, null_cols, null_sentinels, group_on)
+        super().__init__(sql=sql, **kwargs)
+        self._batch_rows = batch_rows
+        self.fetch_path: Optional[str] = None
+
+    def _reader(self) -> Optional[pa.RecordBatchReader]:
+        driver = ARROW_DRIVERS.get(self.engine.driver)
+        if driver is None:
+            return None
+        try:
+            return driver(self.engine, self._load_args["sql"], self._batch_rows)
+        except ImportError as error:
+            logger.info("Lecture Arrow indisponible (%s) : lecture par pandas.read_sql", error)
+            return None
+
+    def _fetch(self) -> Any:
+        start = time.perf_counter()
+        reader = self._reader()
+        self.fetch_path = "arrow" if reader is not None else "read_sql"
+        if reader is None:
+            return super()._fetch()
+
+        chunksize = self._load_args.get("chunksize")
+        if not chunksize:
+            data = _to_pandas(reader.read_all())
+            self._record(len(data), time.perf_counter() - start)
+            return data
+        return self._timed_chunks(self._chunks(reader, chunksize), time.perf_counter() - start)
+
+    @staticmethod
+    def _chunks(reader: pa.RecordBatchReader, chunksize: int) -> Iterator[pd.DataFrame]:
+        pending: List[pa.RecordBatch] = []
+        rows = 0
+        for batch in reader:
+            pending.append(batch)
+            rows += batch.num_rows
+            if rows >= chunksize:
+                yield _to_pandas(pa.Table.from_batches(pending, schema=reader.schema))
+                pending, rows = [], 0
+        if pending:
+            yield _to_pandas(pa.Table.from_batches(pending, schema=reader.schema))
@@ -0,0 +1,170 @@
+"""
+``ChunkedCSVDataset`` : un dossier de fichiers CSV numérotés, plafonnés en lignes et / ou en octets.
+
+Chaque ``save`` ajoute des lignes au fichier courant. Utilisé en sortie d'un node générateur,
+chaque lot est donc écrit dès qu'il est produit. Un fichier plein est fermé et le suivant
+ouvert, chacun avec sa propre ligne d'en-tête : l'import M3 reçoit des lots bornés, chargeables
+en parallèle.
+
+``manifest.json`` décrit les fichiers (nombre de lignes, taille, somme de contrôle de la
+colonne quantité, sha256) ; il est réécrit après chaque ``save``.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import hashlib
+import json
+import shutil
+
+import numpy as np
+import pandas as pd
+from kedro.io.core import AbstractDataset
+
+MANIFEST_FILE = "manifest.json"
+
+
+class ChunkedCSVDataset(AbstractDataset[pd.DataFrame, pd.DataFrame]):
+    """
+    Exemple de catalog :
+
+        stock_m3_rfx:
+          type: regulstock.datasets.ChunkedCSVDataset
+          filepath: data/05_model_input/API-MMS310MI.Update
+          columns: [CONO, WHLO, ITNO, WHSL, BANO, STQI, STAG, BREM, RSCD]
+          quantity_col: STQI
+          max_rows: 50000
+          max_bytes: 5000000
+
+    Fichiers ``<prefix>-00001.csv``, ``<prefix>-00002.csv``... (``prefix`` : nom du dossier
+    par défaut). Une ligne n'est jamais coupée : un fichier vide reçoit toujours au moins
+    une ligne, même si elle dépasse seule ``max_bytes``.
+    Le premier ``save`` d'une exécution vide le dossier des fichiers précédents.
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        columns: Sequence[str],
+        quantity_col: Optional[str] = None,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        prefix: Optional[str] = None,
+        load_args: Optional[Dict[str, Any]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self._filepath = Path(filepath)
+        self._columns = list(columns)
+        self._quantity_col = quantity_col
+        self._max_rows = max_rows
+        self._max_bytes = max_bytes
+        self._prefix = prefix or self._filepath.name
+        self._load_args = {"max_workers": 4, **(load_args or {})}
+        self._header = (",".join(self._columns) + "\n").encode()
+        self._files: Optional[List[Dict[str, Any]]] = None
+        self._open: Optional[Dict[str, Any]] = None
+        self.metadata = metadata
+
+    def _describe(self) -> Dict[str, Any]:
+        return {
+            "filepath": str(self._filepath),
+            "max_rows": self._max_rows,
+            "max_bytes": self._max_bytes,
+        }
+
+    # ===== écriture =====
+
+    def _new_file(self) -> Dict[str, Any]:
+        name = f"{self._prefix}-{len(self._files) + 1:05d}.csv"
+        (self._filepath / name).write_bytes(self._header)
+        entry = {"file": name, "rows": 0, "bytes": len(self._header), "quantity": 0}
+        self._files.append(entry)
+        self._open = {"entry": entry, "sha256": hashlib.sha256(self._header)}
+        return self._open
+
+    def _room(self, entry: Dict[str, Any], sizes: np.ndarray) -> int:
+        """Nombre de lignes (tailles ``sizes``) qui tiennent encore dans le fichier ``entry``."""
+        room = len(sizes)
+        if self._max_rows:
+            room = min(room, self._max_rows - entry["rows"])
+        if self._max_bytes:
+            fits = np.searchsorted(np.cumsum(sizes), self._max_bytes - entry["bytes"], side="right")
+            room = min(room, int(fits))
+        # jamais de fichier sans ligne : une ligne trop grosse part seule
+        return room if room > 0 or entry["rows"] else 1
+
+    def save(self, data: pd.DataFrame) -> None:
+        if self._files is None:
+            if self._filepath.exists():
+                shutil.rmtree(self._filepath)
+            self._filepath.mkdir(parents=True)
+            self._files, self._open = [], None
+
+        data = data[self._columns]
+        # lignes repérées par leurs fins dans le texte encodé (pas de saut de ligne dans les valeurs)
+        text = data.to_csv(index=False, header=False, lineterminator="\n").encode()
+        ends = np.flatnonzero(np.frombuffer(text, dtype=np.uint8) == ord("\n")) + 1
+        offsets = np.concatenate([[0], ends])
+        sizes = np.diff(offsets)
+        quantities = (
+            pd.to_numeric(data[self._quantity_col]).to_numpy()
+            if self._quantity_col
+            else np.zeros(len(sizes))
+        )
+
+        start = 0
+        while start < len(sizes):
+            current = self._open or self._new_file()
+            entry = current["entry"]
+            take = self._room(entry, sizes[start:])
+            if take == 0:
+                self._open = None
+                continue
+
+            chunk = text[offsets[start] : offsets[start + take]]
+            with open(self._filepath / entry["file"], "ab") as f:
+                f.write(chunk)
+            current["sha256"].update(chunk)
+            entry["rows"] += take
+            entry["bytes"] += len(chunk)
+            entry["quantity"] += quantities[start : start + take].sum().item()
+            entry["sha256"] = current["sha256"].hexdigest()
+            start += take
+
+        self._write_manifest()
+
+    def _write_manifest(self) -> None:
+        manifest = {
+            "columns": self._columns,
+            "quantity_col": self._quantity_col,
+            "rows": sum(entry["rows"] for entry in self._files),
+            "quantity": sum(entry["quantity"] for entry in self._files),
+            "files": self._files,
+        }
+        (self._filepath / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+
+    # ===== lecture =====
+
+    def manifest(self) -> Dict[str, Any]:
+        return json.loads((self._filepath / MANIFEST_FILE).read_text())
+
+    def load(self) -> pd.DataFrame:
+        """Relit tous les fichiers du manifest (en parallèle), dans l'ordre, en une seule table."""
+        files = [self._filepath / entry["file"] for entry in self.manifest()["files"]]
+        if not files:
+            return pd.DataFrame(columns=self._columns)
+
+        def read(path: Path) -> pd.DataFrame:
+            # valeurs lues telles qu'écrites (BANO vide reste "")
+            return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+        with ThreadPoolExecutor(max_workers=self._load_args["max_workers"]) as executor:
+            parts = list(executor.map(read, files))
+        return pd.concat(parts, ignore_index=True)
+
+    def iter_batches(self) -> Iterator[pd.DataFrame]:
+        """Relit les fichiers du manifest un par un (au plus ``max_rows`` lignes chacun), dans l'ordre."""
+        for entry in self.manifest()["files"]:
+            yield pd.read_csv(self._filepath / entry["file"], dtype=str, keep_default_na=False)
+
+    def _exists(self) -> bool:
+        return (self._filepath / MANIFEST_FILE).exists()
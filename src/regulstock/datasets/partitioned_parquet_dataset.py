@@ -0,0 +1,269 @@
+"""
+``PartitionedParquetDataset`` : un dossier de fichiers ``part-XXXXX.parquet``.
+
+Chaque ``save`` ajoute une partie. Utilisé en sortie d'un node générateur (extraction
+par lots), chaque lot est donc écrit dès qu'il est produit, sans jamais concaténer
+le résultat complet en mémoire. Le ``load`` relit le dossier comme une seule table.
+
+Avec ``partition_cols``, les parties sont rangées en sous-dossiers hive
+(``category=STOCK/depot=100/part-00000.parquet``) et ``sort_by`` trie les lignes de
+chaque partie. Les ``filters`` du ``load`` sont poussés au lecteur parquet : les
+sous-dossiers hors filtre ne sont pas ouverts et, dans un fichier, seuls les row groups
+dont les statistiques min / max peuvent correspondre sont lus.
+
+``node_columns`` restreint la lecture aux colonnes dont chaque node consommateur a besoin
+(appliqué par ``ColumnProjectionHooks``). Les fichiers sont lus en mémoire mappée, les
+colonnes catégorielles ré-encodées en dictionnaire côté Arrow (sans tableau d'objets
+Python intermédiaire) et la table convertie colonne par colonne en libérant ses buffers :
+le pic mémoire d'un ``load`` reste proche de la taille du DataFrame rendu.
+"""
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from kedro.io.core import AbstractDataset
+
+from regulstock.categoricals import sort_by_value, sort_categories
+
+# nom de dossier hive d'une valeur de partition nulle (convention pyarrow / Spark)
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+SCHEMA_FILE = "_common_metadata"
+
+
+def _normalize_schema(table: pa.Table) -> pa.Table:
+    """
+    Uniformise le schéma d'une partie pour que toutes les parties soient compatibles :
+      - colonne entièrement vide (type null) -> string
+      - dictionnaire -> indices int32 (pandas choisit int8/int16 selon le nb de modalités)
+    """
+    fields = []
+    for field in table.schema:
+        if pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        elif pa.types.is_dictionary(field.type):
+            field = field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+        fields.append(field)
+    return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+
+
+def _storage_schema(schema: pa.Schema) -> pa.Schema:
+    """
+    Schéma écrit dans les fichiers : les dictionnaires y sont stockés en valeurs simples
+    (parquet les encode quand même en dictionnaire), sinon pyarrow n'exploite pas les
+    statistiques des row groups pour filtrer ces colonnes.
+    """
+    return pa.schema(
+        [
+            field.with_type(field.type.value_type) if pa.types.is_dictionary(field.type) else field
+            for field in schema
+        ],
+        metadata=schema.metadata,
+    )
+
+
+def _partition_dir(keys: Sequence[str], values: Sequence[Any]) -> str:
+    return "/".join(
+        f"{key}={NULL_PARTITION if pd.isna(value) else quote(str(value), safe='')}"
+        for key, value in zip(keys, values)
+    )
+
+
+class PartitionedParquetDataset(AbstractDataset[pd.DataFrame, pd.DataFrame]):
+    """
+    Exemples de catalog :
+
+        m3_stock_parquet:
+          type: regulstock.datasets.PartitionedParquetDataset
+          filepath: data/01_raw/m3_stock
+
+        m3_map:
+          type: regulstock.datasets.PartitionedParquetDataset
+          filepath: data/02_intermediate/m3_map
+          partition_cols: [category, depot]
+          sort_by: [sku]
+
+        m3_map_depot_100:          # même dossier, lecture d'un seul dépôt
+          type: regulstock.datasets.PartitionedParquetDataset
+          filepath: data/02_intermediate/m3_map
+          partition_cols: [category, depot]
+          load_args:
+            filters: [[depot, "==", "100"]]
+            columns: [sku, lot, qty_m3]
+
+    Le premier ``save`` d'une exécution vide le dossier des parties précédentes.
+    Le schéma complet (dont les colonnes catégorielles) est conservé dans ``_common_metadata``.
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        partition_cols: Optional[List[str]] = None,
+        sort_by: Optional[List[str]] = None,
+        load_args: Optional[Dict[str, Any]] = None,
+        save_args: Optional[Dict[str, Any]] = None,
+        node_columns: Optional[Dict[str, List[str]]] = None,
+        memory_map: bool = True,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self._filepath = Path(filepath)
+        self._partition_cols = list(partition_cols or [])
+        self._sort_by = list(sort_by or [])
+        self._load_args = dict(load_args or {})
+        self._save_args = {"compression": "snappy", **(save_args or {})}
+        self._node_columns = {name: list(cols) for name, cols in (node_columns or {}).items()}
+        self._memory_map = memory_map
+        # projection du prochain load, par thread (ThreadRunner : plusieurs nodes à la fois)
+        self._projection = threading.local()
+        self._n_parts: Optional[int] = None
+        self.metadata = metadata
+
+    def _part_paths(self):
+        return sorted(self._filepath.rglob("part-*.parquet"))
+
+    def _describe(self) -> Dict[str, Any]:
+        return {
+            "filepath": str(self._filepath),
+            "partition_cols": self._partition_cols,
+            "sort_by": self._sort_by,
+            "load_args": self._load_args,
+            "save_args": self._save_args,
+            "node_columns": self._node_columns,
+        }
+
+    def columns_for(self, node_name: str) -> Optional[List[str]]:
+        return self._node_columns.get(node_name)
+
+    def project(self, node_name: str) -> None:
+        """Le prochain ``load`` de ce thread ne lit que les colonnes déclarées pour ``node_name``."""
+        self._projection.columns = self.columns_for(node_name)
+
+    def load(self) -> pd.DataFrame:
+        columns, self._projection.columns = getattr(self._projection, "columns", None), None
+        if columns is None:
+            return self.read(**self._load_args)
+        return self.read(**{**self._load_args, "columns": columns})
+
+    def read(
+        self,
+        filters: Optional[List[Sequence[Any]]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Lit le dossier, éventuellement filtré (format ``filters`` de ``pd.read_parquet`` :
+        ``[[col, op, valeur], ...]``) et restreint à ``columns``.
+        """
+        schema, dataset = self._arrow_dataset()
+        expression = pq.filters_to_expression(filters) if filters else None
+        table = dataset.to_table(filter=expression, columns=columns)
+
+        # ré-encode les colonnes catégorielles d'origine en dictionnaire Arrow : to_pandas
+        # les rend directement en ``category`` ; chaque partie ayant son propre dictionnaire,
+        # les modalités fusionnées sont retriées
+        if schema is not None:
+            for field in schema:
+                if pa.types.is_dictionary(field.type) and field.name in table.column_names:
+                    i = table.column_names.index(field.name)
+                    table = table.set_column(i, field.name, pc.dictionary_encode(table.column(i)))
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        del table
+        return sort_categories(df)
+
+    def iter_batches(self, columns: Optional[List[str]] = None, batch_rows: int = 1_000_000) -> Iterator[pd.DataFrame]:
+        """
+        Relit le dossier par lots d'au plus ``batch_rows`` lignes (colonnes texte en objets,
+        sans ré-encodage catégoriel) : la mémoire ne dépend pas de la taille de la table.
+        """
+        _, dataset = self._arrow_dataset()
+        for batch in dataset.to_batches(columns=columns, batch_size=batch_rows):
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def _arrow_dataset(self) -> Tuple[Optional[pa.Schema], ds.Dataset]:
+        """Schéma d'origine (``_common_metadata``) et dataset Arrow du dossier."""
+        schema_path = self._filepath / SCHEMA_FILE
+        schema = pq.read_schema(schema_path) if schema_path.exists() else None
+        storage = _storage_schema(schema) if schema is not None else None
+
+        partitioning = None
+        if self._partition_cols:
+            partition_schema = (
+                pa.schema([storage.field(col) for col in self._partition_cols])
+                if storage is not None
+                else pa.schema([(col, pa.string()) for col in self._partition_cols])
+            )
+            partitioning = ds.HivePartitioning(partition_schema, null_fallback=NULL_PARTITION)
+
+        dataset = ds.dataset(
+            self._filepath,
+            format="parquet",
+            schema=storage,
+            partitioning=partitioning,
+            filesystem=pafs.LocalFileSystem(use_mmap=self._memory_map),
+        )
+        return schema, dataset
+
+    def to_table(self, data: pd.DataFrame) -> pa.Table:
+        """Table Arrow d'une partie telle que ``save`` l'écrit (lignes triées selon ``sort_by``)."""
+        if self._sort_by:
+            data = sort_by_value(data, self._sort_by)
+        return _normalize_schema(pa.Table.from_pandas(data, preserve_index=False))
+
+    def read_order(self, table: pa.Table) -> Optional[np.ndarray]:
+        """
+        Indices remettant les lignes de parties issues de ``to_table`` (concaténées dans
+        l'ordre des ``save``) dans l'ordre de ``read`` : sous-dossiers de partition dans
+        l'ordre des chemins, puis parties. ``None`` sans ``partition_cols`` (ordre inchangé).
+        """
+        if not self._partition_cols:
+            return None
+        keys = table.select(self._partition_cols).to_pandas().astype(object)
+        groups = keys.groupby(self._partition_cols, dropna=False, sort=False).indices
+        folders = sorted(
+            (_partition_dir(self._partition_cols, values if isinstance(values, tuple) else (values,)) + "/", rows)
+            for values, rows in groups.items()
+        )
+        return np.concatenate([rows for _, rows in folders]) if folders else np.arange(0)
+
+    def save(self, data: pd.DataFrame) -> None:
+        self.save_table(self.to_table(data))
+
+    def save_table(self, table: pa.Table) -> None:
+        """Écrit une partie déjà convertie par ``to_table``, sans repasser par pandas."""
+        if self._n_parts is None:
+            if self._filepath.exists():
+                shutil.rmtree(self._filepath)
+            self._filepath.mkdir(parents=True)
+            self._n_parts = 0
+
+        if self._n_parts == 0:
+            pq.write_metadata(table.schema, self._filepath / SCHEMA_FILE)
+        table = table.cast(_storage_schema(table.schema))
+
+        name = f"part-{self._n_parts:05d}.parquet"
+        if not self._partition_cols:
+            pq.write_table(table, self._filepath / name, **self._save_args)
+        else:
+            keys = table.select(self._partition_cols).to_pandas().astype(object)
+            groups = keys.groupby(self._partition_cols, dropna=False, sort=True).indices
+            for values, rows in groups.items():
+                values = values if isinstance(values, tuple) else (values,)
+                folder = self._filepath / _partition_dir(self._partition_cols, values)
+                folder.mkdir(parents=True, exist_ok=True)
+                pq.write_table(
+                    table.take(rows).drop_columns(self._partition_cols),
+                    folder / name,
+                    **self._save_args,
+                )
+        self._n_parts += 1
+
+    def _exists(self) -> bool:
+        return bool(self._part_paths())
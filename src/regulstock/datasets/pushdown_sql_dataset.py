@@ -0,0 +1,104 @@
+"""
+``PushdownSQLQueryDataset`` : ``PooledSQLQueryDataset`` dont la requête est générée à partir
+d'une requête source (lignes brutes) et de la description des colonnes.
+
+Le nettoyage fait par ``standardize_m3`` / ``standardize_reflex`` est reporté dans la base :
+  - ``text_cols`` : blancs ASCII de début et de fin retirés (espace, tabulation, CR, LF...,
+    comme ``str.strip``), par ``LTRIM`` / ``RTRIM`` à deux arguments (SQLite, SQL Server 2022),
+  - ``null_cols`` : valeurs sentinelles (``''``, ``'N/A'``, ``'nan'``...) remplacées par NULL,
+  - ``sum_cols`` : sommées (NULL compté 0), groupées par les colonnes texte.
+
+``group_on`` choisit les valeurs groupées :
+  - ``"raw"`` (défaut) : valeurs brutes, comme les requêtes d'origine. Une ligne du résultat
+    est une ligne de stock adressable (pour M3 : dépôt, emplacement, lot, article, soit
+    WHLO / WHSL / BANO / ITNO du fichier STOCK_M3_RFX). Grouper sur les clés nettoyées
+    fusionnerait des lignes qui ne diffèrent que par des blancs ou une sentinelle de lot, et
+    l'allocation de ``generate_api_m3_rfx`` (plus gros stocks d'abord, ligne par ligne) ne
+    débiterait plus les mêmes lignes.
+  - ``"clean"`` : valeurs nettoyées, une ligne par clé standardisée. Pour Reflex, dont les
+    deux flux de réconciliation somment ``qty_reflex`` par (catégorie, lot, article) : avec
+    ``text_cols`` réduites à article / lot / qualité, la base renvoie déjà une ligne par
+    clé, que ``reflex_mapping_rules`` (qualité -> catégorie, Python) ne fait que regrouper.
+
+Appliqués à ce résultat, les nodes de standardisation n'ont plus rien à nettoyer.
+"""
+from typing import Any, Sequence
+
+from .sql_dataset import PooledSQLQueryDataset
+
+# mêmes sentinelles que les nodes de standardisation
+NULL_SENTINELS = ("", "None", "nan", "NaN", "N/A")
+# blancs ASCII retirés par str.strip / pyarrow.compute.utf8_trim_whitespace
+WHITESPACE = " \t\n\v\f\r"
+GROUP_ON = ("raw", "clean")
+
+
+def _literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def pushdown_sql(
+    source: str,
+    text_cols: Sequence[str],
+    sum_cols: Sequence[str],
+    null_cols: Sequence[str] = (),
+    null_sentinels: Sequence[str] = NULL_SENTINELS,
+    group_on: str = "raw",
+) -> str:
+    """
+    Requête d'extraction nettoyée et agrégée. ``source`` est une sous-requête sans
+    ``ORDER BY`` ni ``;`` final ; les colonnes de sortie gardent ses noms.
+    Syntaxe commune à SQL Server et SQLite : le ``GROUP BY`` porte sur les colonnes brutes
+    de ``source`` (``group_on="raw"``) ou sur les expressions de nettoyage du ``SELECT``
+    (``group_on="clean"``).
+    """
+    if group_on not in GROUP_ON:
+        raise ValueError(f"group_on={group_on!r} : attendu l'un de {GROUP_ON}")
+    sentinels = ", ".join(_literal(v) for v in null_sentinels)
+    whitespace = _literal(WHITESPACE)
+    keys = []
+    for col in text_cols:
+        expr = f"LTRIM(RTRIM(src.{col}, {whitespace}), {whitespace})"
+        if col in null_cols:
+            expr = f"CASE WHEN {expr} IN ({sentinels}) THEN NULL ELSE {expr} END"
+        keys.append((expr, col))
+
+    select = [f"{expr} AS {col}" for expr, col in keys]
+    select += [f"SUM(COALESCE(src.{col}, 0)) AS {col}" for col in sum_cols]
+    sql = f"SELECT {', '.join(select)} FROM ({source.strip().rstrip(';')}) AS src"
+    if keys:
+        group_by = [expr if group_on == "clean" else f"src.{col}" for expr, col in keys]
+        sql += f" GROUP BY {', '.join(group_by)}"
+    return sql
+
+
+class PushdownSQLQueryDataset(PooledSQLQueryDataset):
+    """
+    Exemple de catalog :
+
+        m3_stock_dataset:
+          type: regulstock.datasets.PushdownSQLQueryDataset
+          credentials: wolfdb_M3_sql
+          source: SELECT mit.ITNO AS SKU, mit.BANO AS Lot, mit.STQT AS Quantite FROM ...
+          text_cols: [SKU, Lot]
+          null_cols: [Lot]
+          sum_cols: [Quantite]
+          group_on: raw
+
+    Les autres options (``load_args.chunksize``, credentials...) sont celles de
+    ``PooledSQLQueryDataset``.
+    """
+
+    def __init__(
+        self,
+        *,
+        source: str,
+        text_cols: Sequence[str],
+        sum_cols: Sequence[str],
+        null_cols: Sequence[str] = (),
+        null_sentinels: Sequence[str] = NULL_SENTINELS,
+        group_on: str = "raw",
+        **kwargs: Any,
+    ) -> None:
+        sql = pushdown_sql(source, text_cols, sum_cols, null_cols, null_sentinels, group_on)
+        super().__init__(sql=sql, **kwargs)
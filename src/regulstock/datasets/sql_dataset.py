@@ -0,0 +1,92 @@
+"""
+``PooledSQLQueryDataset`` : ``pandas.SQLQueryDataset`` avec
+  - un engine SQLAlchemy (et donc un pool de connexions) par credential,
+  - la mesure du temps de fetch de chaque requête,
+  - un préchargement en tâche de fond (``prefetch``), utilisé par
+    ``ConcurrentExtractionHooks`` pour lancer les requêtes d'extraction en parallèle.
+"""
+from concurrent.futures import Executor, Future
+from typing import Any, Dict, Iterable, Iterator, Optional
+import logging
+import threading
+import time
+
+import pandas as pd
+from kedro_datasets.pandas import SQLQueryDataset
+
+logger = logging.getLogger(__name__)
+
+# options d'engine par défaut, surchargées par celles du credential (pool_size, ...)
+DEFAULT_ENGINE_ARGS = {"pool_pre_ping": True}
+# création d'engine : les prefetch de ``ConcurrentExtractionHooks`` tournent dans plusieurs threads
+_ENGINE_LOCK = threading.Lock()
+
+
+class PooledSQLQueryDataset(SQLQueryDataset):
+    """
+    Exemple de catalog :
+
+        reflex_stock_dataset:
+          type: regulstock.datasets.PooledSQLQueryDataset
+          credentials: wolfdb_REFLEX_sql
+          sql: SELECT ...
+
+    Les options du credential autres que ``con`` (``pool_size``, ``max_overflow``...)
+    sont passées à ``create_engine``. Deux datasets sur le même credential partagent l'engine
+    (cache ``SQLQueryDataset.engines``, par chaîne de connexion).
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._connection_args = {**DEFAULT_ENGINE_ARGS, **self._connection_args}
+        self._prefetched: Optional[Future] = None
+        self.fetch_stats: Dict[str, float] = {}
+
+    @property
+    def engine(self) -> Any:
+        """Engine du credential, créé une seule fois même si plusieurs threads le demandent."""
+        engines = type(self).engines
+        if self._connection_str not in engines:
+            with _ENGINE_LOCK:
+                if self._connection_str not in engines:
+                    self.create_connection(self._connection_str, self._connection_args)
+        return engines[self._connection_str]
+
+    def prefetch(self, executor: Executor) -> None:
+        """Lance la requête dans ``executor`` ; le prochain ``load`` en récupère le résultat."""
+        if self._prefetched is None:
+            self._prefetched = executor.submit(self._fetch)
+
+    def load(self) -> pd.DataFrame:
+        if self._prefetched is not None:
+            future, self._prefetched = self._prefetched, None
+            return future.result()
+        return self._fetch()
+
+    def _record(self, rows: int, seconds: float) -> None:
+        self.fetch_stats = {"rows": rows, "seconds": round(seconds, 3)}
+        logger.info("Fetch SQL %s : %d lignes en %.2fs", self._describe()["sql"][:60], rows, seconds)
+
+    def _fetch(self) -> Any:
+        start = time.perf_counter()
+        data = super().load()
+        if isinstance(data, pd.DataFrame):
+            self._record(len(data), time.perf_counter() - start)
+            return data
+        # load_args.chunksize : seul le temps passé à lire les lots est compté
+        return self._timed_chunks(data, time.perf_counter() - start)
+
+    def _timed_chunks(self, chunks: Iterable[pd.DataFrame], seconds: float) -> Iterator[pd.DataFrame]:
+        rows = 0
+        iterator = iter(chunks)
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                seconds += time.perf_counter() - start
+            rows += len(chunk)
+            yield chunk
+        self._record(rows, seconds)
@@ -0,0 +1,323 @@
+"""
+``regulstock diff`` : ce qui a changé depuis la régulation précédente.
+
+Pour ``corr_dataset``, ``m3_reliquat`` et ``stock_m3_rfx``, chaque ligne reçoit une empreinte
+de clé et une empreinte de contenu (``hash_pandas_object``), calculées lot par lot en relisant
+les sorties du run (row batches parquet, fichiers CSV) : seules les empreintes et les
+quantités restent en mémoire, jamais les tables. Confrontées par table de hachage
+(``Index.get_indexer``) à l'instantané du run précédent (``data/09_cache/diff/``), elles
+donnent en temps linéaire les clés ajoutées, supprimées et modifiées, et les écarts de quantité.
+
+L'instantané (clés, empreintes, quantités) est écrit au fil de la lecture ; les lignes
+d'exemple du rapport y sont relues. Une clé portée par plusieurs lignes est comparée sur la
+somme de ses quantités et de ses empreintes de contenu (indépendante de l'ordre des lignes).
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import logging
+import shutil
+import time
+
+import click
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from regulstock.datasets import ArrowHandoffDataset
+
+logger = logging.getLogger(__name__)
+
+# clés (une ligne par clé attendue) et quantités comparées, par dataset du catalog
+DIFF_DATASETS = {
+    "corr_dataset": {
+        "keys": ["sku", "lot", "category", "type"],
+        "quantities": ["qty_reflex", "stock_total_m3"],
+    },
+    "m3_reliquat": {"keys": ["sku_m3", "lot", "depot", "category"], "quantities": ["qty_m3"]},
+    "stock_m3_rfx": {"keys": ["WHLO", "ITNO", "WHSL", "BANO"], "quantities": ["STQI"]},
+}
+KEY_HASH = "_key_hash"
+CONTENT_HASH = "_content_hash"
+
+
+def _snapshot_schema(spec: Dict[str, List[str]]) -> pa.Schema:
+    return pa.schema(
+        [pa.field(k, pa.string()) for k in spec["keys"]]
+        + [pa.field(KEY_HASH, pa.uint64()), pa.field(CONTENT_HASH, pa.uint64())]
+        + [pa.field(q, pa.float64()) for q in spec["quantities"]]
+    )
+
+
+def snapshot_batch(df: pd.DataFrame, spec: Dict[str, List[str]]) -> pd.DataFrame:
+    """Clés (texte), empreintes de clé et de contenu et quantités d'un lot de lignes."""
+    keys = df[spec["keys"]].astype("string")
+    out = keys.copy()
+    out[KEY_HASH] = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    out[CONTENT_HASH] = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    for q in spec["quantities"]:
+        out[q] = pd.to_numeric(df[q], errors="coerce").fillna(0).to_numpy(dtype=float)
+    return out
+
+
+def _digest(key: np.ndarray, content: np.ndarray, quantities: np.ndarray) -> Dict[str, Any]:
+    """
+    Une entrée par clé : empreintes de contenu et quantités sommées sur ses lignes, et
+    position de sa première ligne dans l'instantané (lignes d'exemple).
+    """
+    codes, uniques = pd.factorize(key)
+    n_keys = len(uniques)
+    summed = np.zeros(n_keys, dtype=np.uint64)
+    np.add.at(summed, codes, content)
+    first = np.full(n_keys, len(codes), dtype=np.int64)
+    np.minimum.at(first, codes, np.arange(len(codes)))
+    return {
+        "rows": len(codes),
+        "key": np.asarray(uniques, dtype=np.uint64),
+        "content": summed,
+        "quantities": np.stack(
+            [np.bincount(codes, weights=q, minlength=n_keys) for q in quantities.T], axis=1
+        ),
+        "first_row": first,
+    }
+
+
+def _collect(tables: Iterable[pd.DataFrame], spec: Dict[str, List[str]]) -> Dict[str, Any]:
+    keys, contents, quantities = [], [], []
+    for df in tables:
+        keys.append(df[KEY_HASH].to_numpy(dtype=np.uint64))
+        contents.append(df[CONTENT_HASH].to_numpy(dtype=np.uint64))
+        quantities.append(df[spec["quantities"]].to_numpy(dtype=float))
+    if not keys:
+        return _digest(np.empty(0, np.uint64), np.empty(0, np.uint64), np.empty((0, len(spec["quantities"]))))
+    return _digest(np.concatenate(keys), np.concatenate(contents), np.concatenate(quantities))
+
+
+def write_snapshot(batches: Iterable[pd.DataFrame], spec: Dict[str, List[str]], path: Path) -> Dict[str, Any]:
+    """Écrit l'instantané de ``batches`` lot par lot dans ``path`` ; renvoie son empreinte par clé."""
+    schema = _snapshot_schema(spec)
+
+    def snapshots() -> Iterator[pd.DataFrame]:
+        with pq.ParquetWriter(path, schema) as writer:
+            for batch in batches:
+                snapshot = snapshot_batch(batch, spec)
+                writer.write_table(pa.Table.from_pandas(snapshot, schema=schema, preserve_index=False))
+                yield snapshot[[KEY_HASH, CONTENT_HASH, *spec["quantities"]]]
+
+    return _collect(snapshots(), spec)
+
+
+def read_snapshot(path: Path, spec: Dict[str, List[str]]) -> Dict[str, Any]:
+    """Empreinte par clé d'un instantané écrit par ``write_snapshot`` (sans relire les clés)."""
+    columns = [KEY_HASH, CONTENT_HASH, *spec["quantities"]]
+    batches = pq.ParquetFile(path).iter_batches(columns=columns)
+    return _collect((batch.to_pandas() for batch in batches), spec)
+
+
+def _rows_at(path: Path, columns: List[str], positions: np.ndarray) -> pd.DataFrame:
+    """Lignes ``positions`` de l'instantané, dans cet ordre, lues lot par lot."""
+    order = np.argsort(positions, kind="stable")
+    wanted = positions[order]
+    parts, offset = [], 0
+    pf = pq.ParquetFile(path)
+    for batch in pf.iter_batches(columns=columns):
+        lo, hi = np.searchsorted(wanted, [offset, offset + batch.num_rows])
+        if hi > lo:
+            parts.append(batch.take(pa.array(wanted[lo:hi] - offset)))
+        offset += batch.num_rows
+    schema = pa.schema([pf.schema_arrow.field(c) for c in columns])
+    rows = pa.Table.from_batches(parts, schema=schema).to_pandas()
+    return rows.iloc[np.argsort(order, kind="stable")].reset_index(drop=True)
+
+
+def _largest(values: np.ndarray, positions: np.ndarray, n: int) -> np.ndarray:
+    """Les ``n`` positions de plus grande valeur absolue (sélection linéaire puis tri des ``n``)."""
+    if len(positions) > n:
+        positions = positions[np.argpartition(-np.abs(values[positions]), n)[:n]]
+    return positions[np.argsort(-np.abs(values[positions]), kind="stable")]
+
+
+def _records(rows: pd.DataFrame) -> List[Dict[str, Any]]:
+    rows = rows.astype(object)
+    return rows.where(rows.notna(), None).to_dict("records")
+
+
+def _empty(spec: Dict[str, List[str]]) -> Dict[str, Any]:
+    return _digest(np.empty(0, np.uint64), np.empty(0, np.uint64), np.empty((0, len(spec["quantities"]))))
+
+
+def compare(
+    previous: Optional[Dict[str, Any]],
+    current: Dict[str, Any],
+    spec: Dict[str, List[str]],
+    previous_path: Optional[Path],
+    current_path: Path,
+    max_examples: int = 20,
+) -> Dict[str, Any]:
+    """
+    Clés ajoutées, supprimées et modifiées (même clé, contenu différent) entre deux
+    empreintes, écarts de quantité et lignes d'exemple (plus gros écarts sur la première
+    quantité). Sans ``previous`` (premier run), toutes les clés sont ajoutées.
+    """
+    quantities = spec["quantities"]
+    previous = previous if previous is not None else _empty(spec)
+
+    match = pd.Index(previous["key"]).get_indexer(current["key"])
+    matched = match >= 0
+    added = ~matched
+    removed = np.ones(len(previous["key"]), dtype=bool)
+    removed[match[matched]] = False
+    changed = np.zeros(len(current["key"]), dtype=bool)
+    changed[matched] = previous["content"][match[matched]] != current["content"][matched]
+
+    before = np.zeros_like(current["quantities"])
+    before[matched] = previous["quantities"][match[matched]]
+    delta = current["quantities"] - before
+
+    def totals(values: np.ndarray) -> Dict[str, float]:
+        return {q: round(float(v), 6) for q, v in zip(quantities, values.sum(axis=0))}
+
+    def examples(
+        path: Path, digest: Dict[str, Any], mask: np.ndarray, values: np.ndarray
+    ) -> Tuple[pd.DataFrame, np.ndarray]:
+        picked = _largest(values[:, 0], np.flatnonzero(mask), max_examples)
+        rows = _rows_at(path, spec["keys"], digest["first_row"][picked])
+        return rows, picked
+
+    added_rows, picked = examples(current_path, current, added, current["quantities"])
+    for i, q in enumerate(quantities):
+        added_rows[q] = current["quantities"][picked, i]
+    changed_rows, picked = examples(current_path, current, changed, delta)
+    for i, q in enumerate(quantities):
+        changed_rows[f"{q}_before"] = before[picked, i]
+        changed_rows[f"{q}_after"] = current["quantities"][picked, i]
+    if previous_path is not None:
+        removed_rows, picked = examples(previous_path, previous, removed, previous["quantities"])
+        for i, q in enumerate(quantities):
+            removed_rows[q] = previous["quantities"][picked, i]
+    else:
+        removed_rows = pd.DataFrame(columns=[*spec["keys"], *quantities])
+
+    return {
+        "rows": {"previous": previous["rows"], "current": current["rows"]},
+        "keys": {"previous": len(previous["key"]), "current": len(current["key"])},
+        "added": int(added.sum()),
+        "removed": int(removed.sum()),
+        "changed": int(changed.sum()),
+        "quantity_delta": {
+            "added": totals(current["quantities"][added]),
+            "removed": totals(-previous["quantities"][removed]),
+            "changed": totals(delta[changed]),
+            "total": {
+                q: round(float(v), 6)
+                for q, v in zip(quantities, current["quantities"].sum(axis=0) - previous["quantities"].sum(axis=0))
+            },
+        },
+        "examples": {
+            "added": _records(added_rows),
+            "removed": _records(removed_rows),
+            "changed": _records(changed_rows),
+        },
+    }
+
+
+def _batches(dataset: Any) -> Iterable[pd.DataFrame]:
+    """Lignes du dataset par lots si le dataset le permet, sinon en une fois."""
+    if isinstance(dataset, ArrowHandoffDataset):
+        # run avec ArrowHandoffHooks : le parquet doit être entièrement écrit
+        dataset.wait()
+        dataset = dataset.dataset
+    if hasattr(dataset, "iter_batches"):
+        return dataset.iter_batches()
+    return [dataset.load()]
+
+
+def diff_datasets(
+    datasets: Dict[str, Any],
+    state_dir: Path,
+    max_examples: int = 20,
+    update: bool = True,
+) -> Dict[str, Any]:
+    """
+    Rapport de différences de chaque dataset (``DIFF_DATASETS``) avec l'instantané de
+    ``state_dir``. Avec ``update``, les nouveaux instantanés remplacent les anciens
+    (dossier temporaire renommé : un diff interrompu garde l'état précédent).
+    """
+    tmp = state_dir.with_name(state_dir.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    meta_path = state_dir / "state.json"
+    previous_run = json.loads(meta_path.read_text(encoding="utf-8"))["generated_at"] if meta_path.exists() else None
+    report: Dict[str, Any] = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "previous_run": previous_run,
+        "datasets": {},
+    }
+
+    for name, dataset in datasets.items():
+        start = time.perf_counter()
+        spec = DIFF_DATASETS[name]
+        current_path, previous_path = tmp / f"{name}.parquet", state_dir / f"{name}.parquet"
+        current = write_snapshot(_batches(dataset), spec, current_path)
+        if not previous_path.exists():
+            previous_path = None
+        previous = read_snapshot(previous_path, spec) if previous_path is not None else None
+        report["datasets"][name] = compare(previous, current, spec, previous_path, current_path, max_examples)
+        logger.info("Diff %s : %.2fs", name, time.perf_counter() - start)
+
+    if update:
+        (tmp / "state.json").write_text(json.dumps({"generated_at": report["generated_at"]}), encoding="utf-8")
+        # datasets absents de ce run : leur instantané précédent est gardé
+        for name in DIFF_DATASETS:
+            kept = state_dir / f"{name}.parquet"
+            if name not in datasets and kept.exists():
+                shutil.copy2(kept, tmp / kept.name)
+        shutil.rmtree(state_dir, ignore_errors=True)
+        tmp.rename(state_dir)
+    else:
+        shutil.rmtree(tmp)
+    return report
+
+
+def write_report(report: Dict[str, Any], path: Path) -> List[str]:
+    """Écrit le rapport JSON ; renvoie son résumé, une ligne par dataset."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    lines = [f"Depuis le run du {report['previous_run'] or '(aucun)'} :"]
+    for name, result in report["datasets"].items():
+        deltas = ", ".join(f"{q} {v:+g}" for q, v in result["quantity_delta"]["total"].items())
+        lines.append(f"{name} : +{result['added']} / -{result['removed']} / ~{result['changed']} clé(s) ({deltas})")
+    return lines
+
+
+@click.command(name="diff")
+@click.option(
+    "--state-dir",
+    default="data/09_cache/diff",
+    show_default=True,
+    help="Instantanés du run précédent.",
+)
+@click.option(
+    "--report",
+    "report_path",
+    default="data/08_reporting/diff_report.json",
+    show_default=True,
+)
+@click.option(
+    "--examples", "max_examples", type=int, default=20, show_default=True, help="Lignes d'exemple par catégorie."
+)
+@click.option("--no-update", is_flag=True, help="Compare sans remplacer les instantanés.")
+@click.option("--env", default="local", show_default=True)
+def diff_command(state_dir: str, report_path: str, max_examples: int, no_update: bool, env: str) -> None:
+    """Clés ajoutées / supprimées / modifiées depuis le run précédent, avec écarts de quantité."""
+    from kedro.framework.session import KedroSession
+
+    with KedroSession.create(project_path=Path.cwd(), env=env) as session:
+        catalog = session.load_context().catalog
+        datasets = {name: catalog.get(name) for name in DIFF_DATASETS if catalog.exists(name)}
+        report = diff_datasets(datasets, Path(state_dir), max_examples, update=not no_update)
+
+    for line in write_report(report, Path(report_path)):
+        click.echo(line)
@@ -0,0 +1,515 @@
+"""Hooks du projet, enregistrés dans ``settings.py``."""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache, wraps
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+from kedro.framework.hooks import hook_impl
+from kedro.io import CatalogProtocol
+from kedro.pipeline import Pipeline
+from kedro.pipeline.node import Node
+
+from regulstock.datasets import ArrowHandoffDataset, PooledSQLQueryDataset
+from regulstock.diff import DIFF_DATASETS, diff_datasets, write_report
+
+logger = logging.getLogger(__name__)
+
+
+class ConcurrentExtractionHooks:
+    """
+    Lance en parallèle, dès le début du run, toutes les requêtes SQL
+    (``PooledSQLQueryDataset``) qui sont des entrées du pipeline exécuté.
+    Chaque node récupère ensuite le résultat de sa requête au moment du ``load`` :
+    la durée de l'extraction est celle de la requête la plus lente, pas la somme.
+    """
+
+    def __init__(self, max_workers: int = 4) -> None:
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._datasets: Dict[str, PooledSQLQueryDataset] = {}
+
+    @hook_impl
+    def before_pipeline_run(self, run_params: Dict[str, Any], pipeline: Pipeline, catalog: CatalogProtocol) -> None:
+        if "ParallelRunner" in str(run_params.get("runner", "")):
+            # les datasets sont envoyés aux sous-process : pas de préchargement partagé
+            return
+
+        self._datasets = {
+            name: dataset
+            for name in sorted(pipeline.inputs())
+            if isinstance(dataset := catalog.get(name), PooledSQLQueryDataset)
+        }
+        if not self._datasets:
+            return
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._max_workers, thread_name_prefix="sql-extraction"
+        )
+        for name, dataset in self._datasets.items():
+            logger.info("Lancement de la requête %s", name)
+            dataset.prefetch(self._executor)
+
+    @hook_impl
+    def after_pipeline_run(self, run_params: Dict[str, Any], pipeline: Pipeline, catalog: CatalogProtocol) -> None:
+        for name, dataset in self._datasets.items():
+            if dataset.fetch_stats:
+                logger.info(
+                    "Extraction %s : %d lignes en %.2fs",
+                    name,
+                    dataset.fetch_stats["rows"],
+                    dataset.fetch_stats["seconds"],
+                )
+        self._shutdown()
+
+    @hook_impl
+    def on_pipeline_error(self, error: Exception, run_params: Dict[str, Any], pipeline: Pipeline, catalog: CatalogProtocol) -> None:
+        self._shutdown()
+
+    def _shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._datasets = {}
+
+
+# ===== Cache des nodes =====
+
+CACHED_NODES = ("map_m3", "reconcile_reflex_m3")
+# bibliothèques dont la version peut changer le résultat des nodes
+CODE_DEPENDENCIES = ("numpy", "pandas", "polars", "pyarrow")
+
+
+def _hash_value(value: Any, digest: "hashlib._Hash") -> None:
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr(list(zip(value.columns, value.dtypes.astype(str)))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+    else:
+        # paramètres (dict / list / scalaires)
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+
+
+@lru_cache(maxsize=1)
+def code_fingerprint() -> str:
+    """
+    Empreinte du code exécuté par les nodes : toutes les sources du package ``regulstock``
+    (un node appelle des helpers d'autres modules : categoricals, polars_nodes, ...) et les
+    versions installées de ``CODE_DEPENDENCIES``. Calculée une fois par processus.
+    """
+    package = Path(__file__).parent
+    digest = hashlib.sha256()
+    for path in sorted(package.rglob("*.py")):
+        digest.update(path.relative_to(package).as_posix().encode())
+        digest.update(path.read_bytes())
+    for dist in CODE_DEPENDENCIES:
+        try:
+            digest.update(f"{dist}=={version(dist)}".encode())
+        except PackageNotFoundError:
+            digest.update(f"{dist} absent".encode())
+    return digest.hexdigest()
+
+
+def _node_fingerprint(node: Node, inputs: Dict[str, Any]) -> str:
+    """
+    Empreinte d'un node : ses entrées (données et paramètres), le nom de sa fonction et
+    ``code_fingerprint``, pour qu'une modification du code invalide le cache.
+    """
+    digest = hashlib.sha256(node.name.encode())
+    digest.update(f"{node.func.__module__}.{node.func.__qualname__}".encode())
+    digest.update(code_fingerprint().encode())
+    for name in sorted(inputs):
+        digest.update(name.encode())
+        _hash_value(inputs[name], digest)
+    return digest.hexdigest()[:32]
+
+
+class NodeCacheHooks:
+    """
+    Réutilise le résultat d'un node quand ni ses entrées ni ses paramètres n'ont changé.
+
+    Pour chaque node de ``nodes``, une empreinte des entrées est calculée avant l'exécution :
+      - si ``<cache_dir>/<node>/<empreinte>/`` existe, la fonction du node est remplacée
+        par la relecture des parquet stockés (hit),
+      - sinon le node tourne normalement et ses sorties sont stockées (miss).
+    Au-delà de ``max_bytes``, les entrées les moins récemment utilisées sont supprimées.
+    Le bilan hits / misses est loggé et écrit dans ``report_path`` en fin de run.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = "data/09_cache",
+        max_bytes: int = 2 * 1024**3,
+        nodes: Sequence[str] = CACHED_NODES,
+        report_path: Optional[str] = "data/08_reporting/node_cache.json",
+    ) -> None:
+        self._cache_dir = Path(cache_dir)
+        self._max_bytes = max_bytes
+        self._nodes = set(nodes)
+        self._report_path = Path(report_path) if report_path else None
+        self._original_funcs: Dict[str, Callable] = {}
+        self._pending: Dict[str, Path] = {}
+        self.report: Dict[str, Dict[str, str]] = {}
+
+    @hook_impl
+    def before_pipeline_run(self, run_params: Dict[str, Any], pipeline: Pipeline, catalog: CatalogProtocol) -> None:
+        self.report = {}
+
+    @hook_impl
+    def before_node_run(self, node: Node, catalog: CatalogProtocol, inputs: Dict[str, Any]) -> None:
+        if node.name not in self._nodes:
+            return
+
+        entry = self._cache_dir / node.name / _node_fingerprint(node, inputs)
+        if all((entry / f"{output}.parquet").exists() for output in node.outputs):
+            os.utime(entry)  # marque l'entrée comme récemment utilisée
+            self._original_funcs[node.name] = node.func
+            node.func = self._replay(node.func, entry, node.outputs)
+            self.report[node.name] = {"status": "hit", "fingerprint": entry.name}
+            logger.info("Cache node %s : hit (%s)", node.name, entry.name)
+        else:
+            self._pending[node.name] = entry
+            self.report[node.name] = {"status": "miss", "fingerprint": entry.name}
+            logger.info("Cache node %s : miss (%s)", node.name, entry.name)
+
+    @hook_impl
+    def after_node_run(self, node: Node, outputs: Dict[str, Any]) -> None:
+        self._restore(node)
+        entry = self._pending.pop(node.name, None)
+        if entry is None or not all(isinstance(outputs.get(o), pd.DataFrame) for o in node.outputs):
+            return
+
+        tmp = entry.with_name(entry.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for output in node.outputs:
+            outputs[output].to_parquet(tmp / f"{output}.parquet", engine="pyarrow", index=False)
+        shutil.rmtree(entry, ignore_errors=True)
+        tmp.rename(entry)
+        self._evict(keep=entry)
+
+    @hook_impl
+    def on_node_error(self, error: Exception, node: Node) -> None:
+        self._restore(node)
+        self._pending.pop(node.name, None)
+
+    @hook_impl
+    def after_pipeline_run(self, run_params: Dict[str, Any], pipeline: Pipeline, catalog: CatalogProtocol) -> None:
+        if not self.report:
+            return
+        hits = sum(r["status"] == "hit" for r in self.report.values())
+        logger.info("Cache des nodes : %d hit(s), %d miss(es)", hits, len(self.report) - hits)
+        if self._report_path is not None:
+            self._report_path.parent.mkdir(parents=True, exist_ok=True)
+            report = {"hits": hits, "misses": len(self.report) - hits, "nodes": self.report}
+            self._report_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    @staticmethod
+    def _replay(func: Callable, entry: Path, outputs: List[str]) -> Callable:
+        # wraps : Kedro lit la signature de la fonction pour lier les entrées nommées
+        @wraps(func)
+        def replay(*args: Any, **kwargs: Any) -> Any:
+            frames = [pd.read_parquet(entry / f"{o}.parquet", engine="pyarrow") for o in outputs]
+            return frames[0] if len(frames) == 1 else tuple(frames)
+
+        return replay
+
+    def _restore(self, node: Node) -> None:
+        func = self._original_funcs.pop(node.name, None)
+        if func is not None:
+            node.func = func
+
+    def _evict(self, keep: Path) -> None:
+        """
+        Supprime les entrées les moins récemment utilisées au-delà de ``max_bytes``
+        (jamais ``keep``, l'entrée qui vient d'être écrite).
+        """
+        entries = [
+            (entry.stat().st_mtime, sum(f.stat().st_size for f in entry.iterdir()), entry)
+            for entry in self._cache_dir.glob("*/*")
+            if entry.is_dir() and not entry.name.endswith(".tmp")
+        ]
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self._max_bytes:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            logger.info("Cache node : éviction de %s", entry)
+
+
+# ===== Projection des colonnes par node =====
+
+class ColumnProjectionHooks:
+    """
+    Avant chaque chargement, indique au dataset quel node le charge : un dataset qui
+    déclare des ``node_columns`` (``PartitionedParquetDataset``, ``ArrowHandoffDataset``)
+    ne lit alors que les colonnes de ce node.
+    """
+
+    def __init__(self) -> None:
+        self._catalog: Optional[CatalogProtocol] = None
+
+    @hook_impl
+    def before_pipeline_run(self, run_params: Dict[str, Any], pipeline: Pipeline, catalog: CatalogProtocol) -> None:
+        self._catalog = catalog
+
+    @hook_impl
+    def before_dataset_loaded(self, dataset_name: str, node: Node) -> None:
+        dataset = self._catalog.get(dataset_name) if self._catalog is not None else None
+        if hasattr(dataset, "project"):
+            dataset.project(node.name)
+
+    @hook_impl
+    def after_pipeline_run(self, run_params: Dict[str, Any], pipeline: Pipeline, catalog: CatalogProtocol) -> None:
+        self._catalog = None
+
+
+# ===== Passage en mémoire des datasets intermédiaires =====
+
+HANDOFF_DATASETS = (
+    "m3_stock_parquet",
+    "reflex_stock_parquet",
+    "m3_po_parquet",
+    "m3_map",
+    "reflex_map",
+    "corr_dataset",
+    "m3_reliquat",
+    "reflex_m3_regul",
+)
+
+
+class ArrowHandoffHooks:
+    """
+    Mode de run où les datasets intermédiaires (``data/01_raw`` à ``data/03_primary``) passent
+    d'un node à l'autre en mémoire (``ArrowHandoffDataset``) : le parquet est écrit en tâche
+    de fond, hors du chemin critique, et la fin du run attend les écritures.
+
+    Seuls les datasets produits par le pipeline exécuté sont enveloppés : une relance
+    partielle (``--from-nodes``, ``--pipeline processing``...) lit ses entrées en parquet.
+    Les datasets d'origine sont remis dans le catalog en fin de run.
+    """
+
+    def __init__(self, datasets: Sequence[str] = HANDOFF_DATASETS) -> None:
+        self._names = list(datasets)
+        self._wrapped: Dict[str, ArrowHandoffDataset] = {}
+
+    @hook_impl
+    def before_pipeline_run(self, run_params: Dict[str, Any], pipeline: Pipeline, catalog: CatalogProtocol) -> None:
+        if "ParallelRunner" in str(run_params.get("runner", "")):
+            # datasets envoyés aux sous-process : pas de mémoire partagée
+            return
+
+        produced = pipeline.all_outputs()
+        for name in self._names:
+            dataset = catalog.get(name)
+            if name in produced and dataset is not None:
+                self._wrapped[name] = ArrowHandoffDataset(dataset)
+                catalog[name] = self._wrapped[name]
+
+    @hook_impl
+    def after_pipeline_run(self, run_params: Dict[str, Any], pipeline: Pipeline, catalog: CatalogProtocol) -> None:
+        self._finish(catalog, raise_errors=True)
+
+    @hook_impl
+    def on_pipeline_error(self, error: Exception, run_params: Dict[str, Any], pipeline: Pipeline, catalog: CatalogProtocol) -> None:
+        self._finish(catalog, raise_errors=False)
+
+    def _finish(self, catalog: CatalogProtocol, raise_errors: bool) -> None:
+        wrapped, self._wrapped = self._wrapped, {}
+        first_error: Optional[Exception] = None
+        for name, handoff in wrapped.items():
+            try:
+                handoff.wait()
+                logger.info("Écriture de %s en tâche de fond : %.2fs", name, handoff.write_seconds)
+            except Exception as exc:  # relancée une fois le catalog restauré
+                logger.error("Écriture de %s en échec : %s", name, exc)
+                first_error = first_error or exc
+            handoff.close()
+            catalog[name] = handoff.dataset
+        if raise_errors and first_error is not None:
+            raise first_error
+
+
+class RunDiffHooks:
+    """
+    ``regulstock diff`` en fin de run : les sorties produites (``DIFF_DATASETS``) sont
+    comparées aux instantanés du run précédent, le rapport écrit dans ``report_path`` et
+    les instantanés remplacés. Un run en échec ne touche pas aux instantanés.
+    """
+
+    def __init__(
+        self,
+        state_dir: str = "data/09_cache/diff",
+        report_path: str = "data/08_reporting/diff_report.json",
+    ) -> None:
+        self._state_dir = Path(state_dir)
+        self._report_path = Path(report_path)
+
+    @hook_impl
+    def after_pipeline_run(self, run_params: Dict[str, Any], pipeline: Pipeline, catalog: CatalogProtocol) -> None:
+        produced = pipeline.all_outputs()
+        datasets = {name: catalog.get(name) for name in DIFF_DATASETS if name in produced}
+        if not datasets:
+            return
+        report = diff_datasets(datasets, self._state_dir)
+        for line in write_report(report, self._report_path):
+            logger.info(line)
+
+
+# ===== Profilage des nodes =====
+
+def _frame_stats(value: Any) -> Optional[Dict[str, float]]:
+    if not isinstance(value, pd.DataFrame):
+        return None
+    return {"rows": len(value), "mb": round(value.memory_usage(deep=True).sum() / 1024**2, 2)}
+
+
+class _StackSampler(threading.Thread):
+    """
+    Échantillonne la pile d'un thread toutes les ``interval`` secondes et compte les piles
+    au format « replié » (``racine;appelant;appelé N``) lu par flamegraph.pl / speedscope.
+    """
+
+    def __init__(self, thread_id: int, root: str, interval: float) -> None:
+        super().__init__(name="profiling-sampler", daemon=True)
+        self._thread_id = thread_id
+        self._root = root
+        self._interval = interval
+        self._stop_event = threading.Event()
+        self.stacks: Counter = Counter()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join([self._root, *reversed(names)])] += 1
+
+    def stop(self) -> Counter:
+        self._stop_event.set()
+        self.join()
+        return self.stacks
+
+
+class ProfilingHooks:
+    """
+    Profilage par node, activé par ``REGULSTOCK_PROFILE`` (voir ``settings.py``).
+
+    Pour chaque node : temps réel et CPU (tous threads), pic d'allocation ``tracemalloc``,
+    nombre de lignes et taille mémoire des DataFrames en entrée / sortie. Avec ``sampling``,
+    la pile du node est aussi échantillonnée. En fin de run, dans ``report_dir`` :
+      - ``profile-<horodatage>.json`` : le rapport complet,
+      - ``profile-<horodatage>.folded`` : piles repliées (``flamegraph.pl``, speedscope).
+    Les mesures mémoire ne sont fiables qu'avec un runner séquentiel.
+    """
+
+    def __init__(
+        self,
+        report_dir: str = "data/08_reporting",
+        sampling: bool = False,
+        interval: float = 0.005,
+    ) -> None:
+        self._report_dir = Path(report_dir)
+        self._sampling = sampling
+        self._interval = interval
+        self._started: Dict[str, Dict[str, Any]] = {}
+        self._stacks: Counter = Counter()
+        self._stop_tracing = False
+        self._run_start = 0.0
+        self.report: Dict[str, Any] = {}
+
+    @hook_impl
+    def before_pipeline_run(self, run_params: Dict[str, Any], pipeline: Pipeline, catalog: CatalogProtocol) -> None:
+        self._stop_tracing = not tracemalloc.is_tracing()
+        if self._stop_tracing:
+            tracemalloc.start()
+        self._stacks = Counter()
+        self._run_start = time.perf_counter()
+        self.report = {
+            "run_id": run_params.get("run_id") or run_params.get("session_id"),
+            "pipeline": run_params.get("pipeline_name"),
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "nodes": [],
+        }
+
+    @hook_impl
+    def before_node_run(self, node: Node, inputs: Dict[str, Any]) -> None:
+        sampler = None
+        if self._sampling:
+            sampler = _StackSampler(threading.get_ident(), node.name, self._interval)
+            sampler.start()
+        tracemalloc.reset_peak()
+        self._started[node.name] = {
+            "inputs": {name: stats for name, value in inputs.items() if (stats := _frame_stats(value))},
+            "memory": tracemalloc.get_traced_memory()[0],
+            "wall": time.perf_counter(),
+            "cpu": time.process_time(),
+            "sampler": sampler,
+        }
+
+    @hook_impl
+    def after_node_run(self, node: Node, outputs: Dict[str, Any]) -> None:
+        started = self._started.pop(node.name, None)
+        if started is None:
+            return
+        wall = time.perf_counter() - started["wall"]
+        cpu = time.process_time() - started["cpu"]
+        peak = tracemalloc.get_traced_memory()[1] - started["memory"]
+        if started["sampler"] is not None:
+            self._stacks.update(started["sampler"].stop())
+
+        self.report["nodes"].append(
+            {
+                "node": node.name,
+                "wall_s": round(wall, 4),
+                "cpu_s": round(cpu, 4),
+                "peak_mb": round(max(peak, 0) / 1024**2, 2),
+                "inputs": started["inputs"],
+                "outputs": {name: stats for name, value in outputs.items() if (stats := _frame_stats(value))},
+            }
+        )
+
+    @hook_impl
+    def on_node_error(self, error: Exception, node: Node) -> None:
+        started = self._started.pop(node.name, None)
+        if started is not None and started["sampler"] is not None:
+            started["sampler"].stop()
+
+    @hook_impl
+    def after_pipeline_run(self, run_params: Dict[str, Any], pipeline: Pipeline, catalog: CatalogProtocol) -> None:
+        if self._stop_tracing:
+            tracemalloc.stop()
+        self.report["wall_s"] = round(time.perf_counter() - self._run_start, 4)
+
+        self._report_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"profile-{datetime.now():%Y%m%d-%H%M%S}"
+        (self._report_dir / f"{stem}.json").write_text(json.dumps(self.report, indent=2), encoding="utf-8")
+        if self._stacks:
+            (self._report_dir / f"{stem}.folded").write_text(
+                "".join(f"{stack} {count}\n" for stack, count in sorted(self._stacks.items())),
+                encoding="utf-8",
+            )
+
+        for entry in sorted(self.report["nodes"], key=lambda e: -e["wall_s"]):
+            logger.info(
+                "Profil %s : %.2fs (CPU %.2fs), pic %.1f Mo",
+                entry["node"], entry["wall_s"], entry["cpu_s"], entry["peak_mb"],
+            )
+        logger.info("Rapport de profilage : %s", self._report_dir / f"{stem}.json")
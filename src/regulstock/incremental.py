@@ -0,0 +1,208 @@
+"""
+``regulstock incremental`` : preprocessing + réconciliation limités aux skus modifiés.
+
+Entre deux runs, seule une petite partie des skus change dans M3 ou Reflex. L'état du run
+précédent (``data/09_cache/incremental/``) garde une empreinte par sku de
+``m3_stock_parquet`` et ``reflex_stock_parquet`` ainsi que les sorties ``m3_map``,
+``reflex_map``, ``corr_dataset`` et ``m3_reliquat``. Au run suivant :
+  - les empreintes des nouvelles tables sont comparées à celles de l'état : un sku est à
+    recalculer si ses lignes (valeurs ou ordre) ont changé, ou s'il apparaît / disparaît ;
+  - seules les lignes de ces skus passent ``map_m3`` / ``map_reflex`` /
+    ``reconcile_reflex_m3`` (mêmes flux que le run complet) ;
+  - leurs lignes remplacent celles de l'état dans chaque sortie.
+
+L'unité de recalcul est le sku, pas la clé (sku, lot, category) : les flux sans lot
+agrègent toutes les lignes d'un sku, une modification de lot déplace donc des quantités
+entre flux du même sku. Comme pour l'exécution shardée, les sorties écrites par les
+datasets du catalog (triées par sku) sont identiques octet pour octet à un run complet.
+
+Un changement des paramètres, de la liste des PO, du schéma des tables ou du code (package
+``regulstock``, versions des bibliothèques : ``code_fingerprint``) invalide l'état : tout est
+recalculé.
+"""
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import logging
+import shutil
+import time
+
+import click
+import numpy as np
+import pandas as pd
+
+from regulstock.categoricals import unify_categories
+from regulstock.hooks import _hash_value, code_fingerprint
+from regulstock.sharding import _concat, _run_shard
+
+logger = logging.getLogger(__name__)
+
+INCREMENTAL_INPUTS = ("m3_stock_parquet", "reflex_stock_parquet", "m3_po_parquet")
+INCREMENTAL_OUTPUTS = ("m3_map", "reflex_map", "corr_dataset", "m3_reliquat")
+DIGESTED_INPUTS = {"m3": "m3_stock_parquet", "reflex": "reflex_stock_parquet"}
+
+
+def sku_digests(df: pd.DataFrame) -> pd.Series:
+    """
+    Empreinte uint64 par sku : somme des hachages de ses lignes, chacun combiné à la
+    position de la ligne parmi celles du sku (un changement d'ordre change l'empreinte).
+    """
+    codes, uniques = pd.factorize(df["sku"], use_na_sentinel=False)
+    counts = np.bincount(codes, minlength=len(uniques))
+    order = np.argsort(codes, kind="stable")
+    starts = np.cumsum(counts) - counts
+
+    position = np.empty(len(codes), dtype=np.uint64)
+    position[order] = np.arange(len(codes)) - np.repeat(starts, counts)
+    rows = pd.util.hash_pandas_object(df, index=False).to_numpy() ^ pd.util.hash_array(position)
+
+    digests = np.add.reduceat(rows[order], starts) if len(rows) else np.empty(0, dtype=np.uint64)
+    return pd.Series(digests, index=pd.Index(np.asarray(uniques, dtype=object).astype(str), name="sku"))
+
+
+def input_digests(inputs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Empreintes M3 / Reflex par sku (0 : sku absent de la table)."""
+    return pd.concat(
+        {side: sku_digests(inputs[name]) for side, name in DIGESTED_INPUTS.items()}, axis=1
+    ).fillna(0).astype(np.uint64)
+
+
+def changed_skus(previous: pd.DataFrame, current: pd.DataFrame) -> pd.Index:
+    """Skus dont l'empreinte M3 ou Reflex diffère entre les deux états."""
+    skus = previous.index.union(current.index)
+    before = previous.reindex(skus, fill_value=0).to_numpy()
+    after = current.reindex(skus, fill_value=0).to_numpy()
+    return skus[(before != after).any(axis=1)]
+
+
+def _fingerprint(inputs: Dict[str, pd.DataFrame], params: Dict[str, Any]) -> str:
+    """Tout ce qui, hors lignes des skus, influe sur les sorties."""
+    digest = hashlib.sha256(code_fingerprint().encode())
+    for key in ("m3_mapping_rules", "reflex_mapping_rules", "stock_reconciliation"):
+        _hash_value(params[key], digest)
+    # liste des PO : comparée aux lots de tous les skus
+    _hash_value(inputs["m3_po_parquet"], digest)
+    for name in DIGESTED_INPUTS.values():
+        digest.update(repr(list(zip(inputs[name].columns, inputs[name].dtypes.astype(str)))).encode())
+    return digest.hexdigest()[:32]
+
+
+def _used_categories(df: pd.DataFrame) -> pd.DataFrame:
+    return df.assign(
+        **{
+            col: df[col].cat.remove_unused_categories()
+            for col in df.columns
+            if isinstance(df[col].dtype, pd.CategoricalDtype)
+        }
+    )
+
+
+def _reconciled_categories(outputs: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Tables réconciliées re-typées sur l'union des modalités des deux maps, comme au run complet."""
+    _, dtypes = unify_categories([outputs["reflex_map"], outputs["m3_map"]])
+    out = dict(outputs)
+    for name in ("corr_dataset", "m3_reliquat"):
+        df = outputs[name]
+        out[name] = df.astype(
+            {
+                col: dtype
+                for col, dtype in dtypes.items()
+                if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype)
+            }
+        )
+    return out
+
+
+def run_incremental(
+    inputs: Dict[str, pd.DataFrame],
+    params: Dict[str, Any],
+    state: Optional[Dict[str, Any]] = None,
+) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Any]]:
+    """
+    Sorties ``INCREMENTAL_OUTPUTS`` et nouvel état. Sans état (ou état invalidé), run complet.
+    ``state`` : ``fingerprint``, ``digests`` (``input_digests``) et les sorties du run précédent.
+    """
+    fingerprint = _fingerprint(inputs, params)
+    digests = input_digests(inputs)
+
+    if state is None or state["fingerprint"] != fingerprint:
+        logger.info("Réconciliation incrémentale : pas d'état réutilisable, run complet")
+        result = _run_shard(inputs, params, regul=False)
+        outputs = {name: result[name] for name in INCREMENTAL_OUTPUTS}
+    else:
+        changed = changed_skus(state["digests"], digests)
+        logger.info("Réconciliation incrémentale : %d sku(s) à recalculer sur %d", len(changed), len(digests))
+        if len(changed):
+            subset = {name: inputs[name] for name in INCREMENTAL_INPUTS}
+            for name in DIGESTED_INPUTS.values():
+                subset[name] = inputs[name][inputs[name]["sku"].astype(str).isin(changed)].copy()
+            result = _run_shard(subset, params, regul=False)
+
+        outputs = {}
+        for name in INCREMENTAL_OUTPUTS:
+            previous = state[name]
+            if not len(changed):
+                outputs[name] = previous
+                continue
+            kept = previous[~previous["sku"].astype(str).isin(changed)]
+            if name in ("m3_map", "reflex_map"):
+                # modalités des skus recalculés ou disparus : celles du run, pas de l'état
+                kept = _used_categories(kept)
+            outputs[name] = _concat([kept, result[name]])
+        if len(changed):
+            outputs = _reconciled_categories(outputs)
+
+    return outputs, {"fingerprint": fingerprint, "digests": digests, **outputs}
+
+
+def load_state(state_dir: Path) -> Optional[Dict[str, Any]]:
+    """État écrit par ``save_state``, ``None`` s'il n'existe pas (encore)."""
+    meta = state_dir / "state.json"
+    if not meta.exists():
+        return None
+    state: Dict[str, Any] = json.loads(meta.read_text(encoding="utf-8"))
+    state["digests"] = pd.read_parquet(state_dir / "digests.parquet", engine="pyarrow")
+    for name in INCREMENTAL_OUTPUTS:
+        state[name] = pd.read_parquet(state_dir / f"{name}.parquet", engine="pyarrow")
+    return state
+
+
+def save_state(state_dir: Path, state: Dict[str, Any]) -> None:
+    """Écrit l'état dans un dossier temporaire puis le renomme : un run interrompu garde l'ancien."""
+    tmp = state_dir.with_name(state_dir.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    state["digests"].to_parquet(tmp / "digests.parquet", engine="pyarrow")
+    for name in INCREMENTAL_OUTPUTS:
+        state[name].to_parquet(tmp / f"{name}.parquet", engine="pyarrow", index=False)
+    (tmp / "state.json").write_text(json.dumps({"fingerprint": state["fingerprint"]}), encoding="utf-8")
+    shutil.rmtree(state_dir, ignore_errors=True)
+    tmp.rename(state_dir)
+
+
+@click.command(name="incremental")
+@click.option(
+    "--state-dir",
+    default="data/09_cache/incremental",
+    show_default=True,
+    help="État du run précédent (supprimer pour forcer un run complet).",
+)
+@click.option("--env", default="local", show_default=True)
+def incremental_command(state_dir: str, env: str) -> None:
+    """Preprocessing + réconciliation recalculés pour les seuls skus modifiés."""
+    from kedro.framework.session import KedroSession
+
+    with KedroSession.create(project_path=Path.cwd(), env=env) as session:
+        context = session.load_context()
+        catalog, params = context.catalog, context.params
+
+        inputs = {name: catalog.load(name) for name in INCREMENTAL_INPUTS}
+        start = time.perf_counter()
+        outputs, state = run_incremental(inputs, params, load_state(Path(state_dir)))
+        logger.info("Réconciliation incrémentale : %.2fs", time.perf_counter() - start)
+
+        for name, df in outputs.items():
+            catalog.save(name, df)
+            click.echo(f"{name} : {len(df)} ligne(s)")
+        save_state(Path(state_dir), state)
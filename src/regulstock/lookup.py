@@ -0,0 +1,77 @@
+"""
+``regulstock lookup --sku X [--lot Y]`` : lignes d'un article dans les tables
+réconciliées, sans charger les fichiers entiers.
+
+S'appuie sur les copies ``<table>_lookup`` écrites par le pipeline ``indexing``
+(triées par sku / lot) : seuls les row groups dont les statistiques min / max
+de ``sku`` encadrent l'article sont lus.
+"""
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import click
+import pandas as pd
+import pyarrow.parquet as pq
+
+LOOKUP_DATASETS = ("corr_dataset", "m3_reliquat", "m3_map", "reflex_map")
+
+
+def lookup_paths(conf_source: str = "conf", env: str = "local") -> Dict[str, str]:
+    """Chemins des index, lus dans le catalog (sans instancier de session Kedro)."""
+    from kedro.config import OmegaConfigLoader
+
+    catalog = OmegaConfigLoader(
+        conf_source=conf_source, base_env="base", default_run_env=env
+    )["catalog"]
+    return {name: catalog[f"{name}_lookup"]["filepath"] for name in LOOKUP_DATASETS}
+
+
+def _row_groups_for(pf: pq.ParquetFile, sku: str) -> List[int]:
+    md = pf.metadata
+    col = pf.schema_arrow.get_field_index("sku")
+    groups = []
+    for i in range(md.num_row_groups):
+        stats = md.row_group(i).column(col).statistics
+        if stats is None or not stats.has_min_max or stats.min <= sku <= stats.max:
+            groups.append(i)
+    return groups
+
+
+def lookup_table(path: str, sku: str, lot: Optional[str] = None) -> pd.DataFrame:
+    """Lignes de ``path`` pour ``sku`` (et ``lot`` si fourni)."""
+    pf = pq.ParquetFile(path)
+    df = pf.read_row_groups(_row_groups_for(pf, sku)).to_pandas()
+    mask = df["sku"].astype(object) == sku
+    if lot is not None and "lot" in df.columns:
+        mask &= df["lot"].astype(object) == lot
+    return df[mask.to_numpy(dtype=bool)].reset_index(drop=True)
+
+
+def lookup(sku: str, lot: Optional[str] = None, paths: Optional[Dict[str, str]] = None) -> Dict[str, pd.DataFrame]:
+    """Lignes de l'article dans chacune des tables indexées (absentes si l'index manque)."""
+    paths = paths or lookup_paths()
+    return {
+        name: lookup_table(path, sku, lot)
+        for name, path in paths.items()
+        if Path(path).exists()
+    }
+
+
+@click.command(name="lookup")
+@click.option("--sku", required=True, help="Article recherché.")
+@click.option("--lot", default=None, help="Lot recherché (optionnel).")
+@click.option("--env", default="local", show_default=True, help="Environnement de configuration.")
+@click.option("--conf-source", default="conf", show_default=True, help="Dossier de configuration.")
+def lookup_command(sku: str, lot: Optional[str], env: str, conf_source: str) -> None:
+    """Affiche les lignes d'un sku / lot dans corr_dataset, m3_reliquat, m3_map et reflex_map."""
+    paths = lookup_paths(conf_source, env)
+    results = lookup(sku, lot, paths)
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        for name in LOOKUP_DATASETS:
+            if name not in results:
+                click.echo(f"== {name} : index absent ({paths[name]}), lancer `kedro run --pipeline indexing`")
+                continue
+            df = results[name]
+            click.echo(f"== {name} : {len(df)} ligne(s)")
+            if not df.empty:
+                click.echo(df.to_string(index=False))
@@ -0,0 +1,185 @@
+"""
+Client des transactions MI de M3 (API REST ``m3api-rest/v2``), utilisé par le pipeline
+``submission`` pour envoyer les lignes STOCK_M3_RFX à ``MMS310MI/Update``.
+
+Les lignes sont envoyées par lots (une requête ``execute`` multi-transactions par lot),
+plusieurs lots à la fois sur une session HTTP dont le pool de connexions est dimensionné
+sur la concurrence.
+
+``Update`` n'est pas idempotent : un lot traité deux fois retire deux fois le stock. Un lot
+n'est donc renvoyé (délai exponentiel, au plus ``max_retries`` fois) que s'il n'a
+certainement pas été appliqué : connexion impossible, 429 ou 503. Après un délai de lecture
+dépassé, une connexion coupée, un autre 5xx ou une réponse illisible, ses lignes sont
+marquées ``UNKNOWN`` (à vérifier dans M3 avant tout renvoi) et il n'est pas renvoyé.
+Un autre 4xx (authentification, requête invalide) marque ses lignes en ``ERROR``.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+EXECUTE_PATH = "/m3api-rest/v2/execute"
+# réponses émises avant tout traitement du lot : renvoi sans risque de double retrait
+RETRY_STATUS = {429, 503}
+# requête rejetée par requests avant tout envoi
+INVALID_REQUEST = (requests.exceptions.InvalidURL, requests.exceptions.MissingSchema, requests.exceptions.InvalidSchema)
+
+OK, ERROR, UNKNOWN = "OK", "ERROR", "UNKNOWN"
+
+
+def _not_connected(exc: requests.RequestException) -> bool:
+    """Connexion jamais établie (délai de connexion, refus, DNS) : la requête n'est pas partie."""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(exc, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+class MIClient:
+    """
+    Exemple :
+
+        client = MIClient("https://m3.example", program="MMS310MI", transaction="Update")
+        log, summary = client.submit(stock_m3_rfx)
+
+    ``log`` : une ligne par ligne envoyée (colonnes d'origine + ``batch``, ``status``
+    OK / ERROR / UNKNOWN, ``error``, ``attempts``, ``latency_s`` du lot) ; ``summary`` :
+    débit et latences des lots.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        program: str = "MMS310MI",
+        transaction: str = "Update",
+        batch_size: int = 100,
+        max_workers: int = 8,
+        max_retries: int = 3,
+        backoff_s: float = 0.5,
+        timeout_s: float = 30.0,
+        auth: Optional[Tuple[str, str]] = None,
+    ) -> None:
+        self._url = base_url.rstrip("/") + EXECUTE_PATH
+        self._program = program
+        self._transaction = transaction
+        self._batch_size = batch_size
+        self._max_workers = max_workers
+        self._max_retries = max_retries
+        self._backoff_s = backoff_s
+        self._timeout_s = timeout_s
+
+        # une connexion gardée ouverte par worker
+        self.session = requests.Session()
+        self.session.auth = auth
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post(
+        self, records: Sequence[Dict[str, str]]
+    ) -> Tuple[List[Any], int, Optional[str], str]:
+        """
+        Résultats par transaction, nombre de tentatives et, si le lot n'a pas abouti, son
+        erreur et le statut de ses lignes (``ERROR`` : non appliqué, ``UNKNOWN`` : incertain).
+        """
+        body = {
+            "program": self._program,
+            "transactions": [{"transaction": self._transaction, "record": record} for record in records],
+        }
+        error = None
+        for attempt in range(1, self._max_retries + 2):
+            try:
+                response = self.session.post(self._url, json=body, timeout=self._timeout_s)
+            except INVALID_REQUEST as exc:
+                return [], attempt, f"{type(exc).__name__} : {exc}", ERROR
+            except requests.RequestException as exc:
+                if not _not_connected(exc):
+                    # délai de lecture, connexion coupée... : M3 a pu traiter le lot
+                    return [], attempt, f"{type(exc).__name__} : lot peut-être appliqué, non renvoyé", UNKNOWN
+                error = type(exc).__name__
+            else:
+                if response.status_code in RETRY_STATUS:
+                    error = f"HTTP {response.status_code}"
+                elif response.status_code >= 500:
+                    return [], attempt, f"HTTP {response.status_code} : lot peut-être appliqué, non renvoyé", UNKNOWN
+                elif response.status_code >= 400:
+                    # authentification, requête invalide : inutile d'insister
+                    return [], attempt, f"HTTP {response.status_code} : {response.text[:200]}", ERROR
+                else:
+                    try:
+                        results = response.json()["results"]
+                    except (ValueError, KeyError, TypeError):
+                        return [], attempt, "Réponse M3 sans résultats lisibles : lot peut-être appliqué", UNKNOWN
+                    return results if isinstance(results, list) else [], attempt, None, OK
+            if attempt <= self._max_retries:
+                time.sleep(self._backoff_s * 2 ** (attempt - 1))
+        return [], self._max_retries + 1, f"{error} après {self._max_retries + 1} tentative(s)", ERROR
+
+    def _submit_batch(self, batch: int, rows: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        # champs vides (BANO sans lot) non transmis
+        records = [{key: value for key, value in row.items() if value != ""} for row in rows]
+        start = time.perf_counter()
+        results, attempts, batch_error, batch_status = self._post(records)
+        latency = time.perf_counter() - start
+
+        log = []
+        for i, row in enumerate(rows):
+            if batch_error:
+                status, error = batch_status, batch_error
+            elif i < len(results) and isinstance(results[i], dict):
+                error = results[i].get("errorMessage") or ""
+                status = ERROR if error else OK
+            else:
+                # réponse plus courte que le lot : sort de la transaction inconnu
+                status, error = UNKNOWN, "Résultat absent de la réponse M3"
+            log.append(
+                {
+                    **row,
+                    "batch": batch,
+                    "status": status,
+                    "error": error,
+                    "attempts": attempts,
+                    "latency_s": round(latency, 4),
+                }
+            )
+        return log
+
+    def submit(self, rows: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """Envoie toutes les lignes de ``rows`` (valeurs transmises en texte)."""
+        records = rows.astype(str).to_dict("records")
+        batches = [records[i : i + self._batch_size] for i in range(0, len(records), self._batch_size)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            logs = list(executor.map(self._submit_batch, range(len(batches)), batches))
+        seconds = time.perf_counter() - start
+
+        log = pd.DataFrame(
+            [entry for batch_log in logs for entry in batch_log],
+            columns=[*rows.columns, "batch", "status", "error", "attempts", "latency_s"],
+        )
+        return log, _summary(log, len(batches), seconds)
+
+
+def _summary(log: pd.DataFrame, n_batches: int, seconds: float) -> Dict[str, Any]:
+    per_batch = log.drop_duplicates("batch")
+    latencies = per_batch["latency_s"].to_numpy(dtype=float)
+    status = log["status"].value_counts()
+    return {
+        "rows": len(log),
+        "ok": int(status.get(OK, 0)),
+        "errors": int(status.get(ERROR, 0)),
+        "unknown": int(status.get(UNKNOWN, 0)),
+        "batches": n_batches,
+        "retries": int((per_batch["attempts"] - 1).sum()),
+        "seconds": round(seconds, 3),
+        "rows_per_s": round(len(log) / seconds, 1) if seconds > 0 else None,
+        "latency_p50_s": round(float(np.percentile(latencies, 50)), 4) if len(latencies) else None,
+        "latency_p95_s": round(float(np.percentile(latencies, 95)), 4) if len(latencies) else None,
+        "latency_max_s": round(float(latencies.max()), 4) if len(latencies) else None,
+    }
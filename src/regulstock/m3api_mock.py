@@ -0,0 +1,119 @@
+"""
+Serveur local imitant l'endpoint ``m3api-rest/v2/execute`` de M3, pour les tests et les
+mesures de débit du pipeline ``submission`` sans toucher à un vrai M3.
+
+Chaque transaction ``Update`` est contrôlée comme le ferait MMS310MI sur l'essentiel
+(champs obligatoires, quantité entière strictement positive) ; la latence par requête et
+des réponses d'erreur périodiques (``fail_every``, statut ``fail_status``, 503 par défaut)
+sont réglables pour exercer les retries.
+
+    with serve_mock_m3(latency_s=0.01) as server:
+        MIClient(server.url).submit(rows)
+"""
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+import json
+import threading
+import time
+
+from regulstock.m3api import EXECUTE_PATH
+
+REQUIRED_FIELDS = ("CONO", "WHLO", "ITNO", "WHSL", "STQI")
+
+
+def _check_update(record: Dict[str, Any]) -> Optional[str]:
+    missing = [field for field in REQUIRED_FIELDS if not record.get(field)]
+    if missing:
+        return f"Champ(s) obligatoire(s) manquant(s) : {', '.join(missing)}"
+    try:
+        quantity = int(record["STQI"])
+    except ValueError:
+        return f"Quantité {record['STQI']!r} invalide"
+    if quantity <= 0:
+        return f"Quantité {quantity} invalide"
+    return None
+
+
+class MockM3Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency_s: float = 0.0, fail_every: int = 0, fail_status: int = 503) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency_s = latency_s
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.requests = 0
+        self.received: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockM3Server
+
+    def _reply(self, status: int, body: Dict[str, Any]) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path != EXECUTE_PATH:
+            return self._reply(404, {"message": f"Endpoint inconnu : {self.path}"})
+
+        with self.server.lock:
+            self.server.requests += 1
+            n_request = self.server.requests
+        if self.server.fail_every and n_request % self.server.fail_every == 0:
+            return self._reply(self.server.fail_status, {"message": "Service indisponible"})
+
+        time.sleep(self.server.latency_s)
+        results = []
+        for transaction in body["transactions"]:
+            error = _check_update(transaction["record"])
+            results.append(
+                {
+                    "transaction": transaction["transaction"],
+                    "records": [],
+                    **({"errorMessage": error} if error else {}),
+                }
+            )
+        with self.server.lock:
+            self.server.received.extend(
+                t["record"] for t, r in zip(body["transactions"], results) if "errorMessage" not in r
+            )
+
+        failed = sum("errorMessage" in r for r in results)
+        self._reply(
+            200,
+            {
+                "results": results,
+                "nrOfSuccessfulTransactions": len(results) - failed,
+                "nrOfFailedTransactions": failed,
+            },
+        )
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+@contextmanager
+def serve_mock_m3(latency_s: float = 0.0, fail_every: int = 0, fail_status: int = 503) -> Iterator[MockM3Server]:
+    """Démarre le serveur sur un port libre de 127.0.0.1, le temps du bloc ``with``."""
+    server = MockM3Server(latency_s=latency_s, fail_every=fail_every, fail_status=fail_status)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
@@ -12,5 +12,6 @@ def register_pipelines() -> dict[str, Pipeline]:
         A mapping from pipeline names to ``Pipeline`` objects.
     """
     pipelines = find_pipelines()
-    pipelines["__default__"] = sum(pipelines.values())
+    # l'envoi à M3 n'est jamais lancé par un simple `kedro run`
+    pipelines["__default__"] = sum(p for name, p in pipelines.items() if name != "submission")
     return pipelines
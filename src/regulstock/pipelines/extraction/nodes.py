@@ -1,55 +1,121 @@
+from typing import Iterable, Iterator, Union
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
-def standardize_m3(m3_df: pd.DataFrame) -> pd.DataFrame:
-    df = m3_df.rename(
-        columns={
-            "SKU": "sku_m3",
-            "WMS": "sku_wms",
-            "Depot": "depot",
-            "Type": "type",
-            "Emplacement": "category",
-            "Lot": "lot",
-            "Quantite": "qty_m3",
-        }
-    ).copy()
-
-    # normalisation des 2 colonnes SKU
-    df["sku_m3"] = df["sku_m3"].astype(str).str.strip()
-    df["sku_wms"] = df["sku_wms"].astype(str).str.strip()
-
-    # considère comme "vide" : NaN, None, '', 'nan', 'NaN'
-    wms_empty = df["sku_wms"].isin(["", "None", "nan", "NaN","N/A"]) | df["sku_wms"].isna()
+from regulstock.datasets.pushdown_sql_dataset import NULL_SENTINELS
+
+# ===== Normalisation des colonnes texte (Arrow) =====
+#
+# Les colonnes texte sont converties une fois en tableaux Arrow ; trim, sentinelles -> null
+# et encodage en catégories se font ensuite en pyarrow.compute, sans tableau d'objets
+# Python intermédiaire. Le résultat est celui de ``astype(str).str.strip()`` suivi de
+# ``to_categorical`` (voir ``old_nodes``).
+
+# blancs retirés par ``str.strip()``
+_WHITESPACE = "".join(c for c in map(chr, range(0x3001)) if c.isspace())
+_SENTINELS = pa.array(NULL_SENTINELS, type=pa.string())
+
+
+def _strip(s: pd.Series) -> pa.Array:
+    """Équivalent Arrow de ``s.astype(str).str.strip()``."""
+    values = None
+    if isinstance(s.dtype, pd.ArrowDtype) and pa.types.is_string(s.dtype.pyarrow_dtype):
+        # lecture Arrow (ArrowSQLQueryDataset) : données reprises sans conversion
+        values = pc.fill_null(pa.array(s), "None")
+    elif s.dtype == object:
+        try:
+            # str / None (cas des lectures SQL) : None -> "None" comme astype(str)
+            values = pc.fill_null(pa.array(s, type=pa.string(), from_pandas=False), "None")
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+    if values is None:
+        # autres valeurs (nombres, NaN, pd.NA...) : leur représentation Python
+        values = pa.array(s.astype(str), type=pa.string())
+    return pc.utf8_trim(values, characters=_WHITESPACE)
+
+
+def _quantity(s: pd.Series) -> pd.Series:
+    """``pd.to_numeric(s, errors="coerce").fillna(0)``, sans passer par NumPy objet pour une colonne Arrow."""
+    if isinstance(s.dtype, pd.ArrowDtype):
+        arrow_type = s.dtype.pyarrow_dtype
+        values = pa.array(s)
+        if pa.types.is_integer(arrow_type) and not values.null_count:
+            return pd.Series(values.to_numpy(), index=s.index, dtype=np.int64)
+        if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type):
+            # comme les Decimal / None de pyodbc : float, null -> 0
+            values = pc.fill_null(pc.cast(values, pa.float64()), 0.0)
+            return pd.Series(values.to_numpy(), index=s.index)
+        s = s.astype(object)
+    return pd.to_numeric(s, errors="coerce").fillna(0)
 
+
+def _null_sentinels(values: pa.Array) -> pa.Array:
+    return pc.if_else(pc.is_in(values, value_set=_SENTINELS), pa.scalar(None, pa.string()), values)
+
+
+def _categorical(values: pa.Array) -> pd.Categorical:
+    """Encodage ``category`` (modalités triées, null -> code -1) comme ``to_categorical``."""
+    uniques = pc.unique(values).drop_null()
+    uniques = uniques.take(pc.sort_indices(uniques))
+    codes = pc.fill_null(pc.index_in(values, value_set=uniques), -1)
+    categories = pd.Index(uniques.to_numpy(zero_copy_only=False), dtype=object)
+    return pd.Categorical.from_codes(codes.to_numpy(zero_copy_only=False), categories=categories)
+
+
+def standardize_m3(m3_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Stock M3 standardisé : codes sans blancs, ``sku`` = code WMS s'il est renseigné sinon
+    code M3, lot vide (``NULL_SENTINELS``) -> null, quantité numérique (0 si invalide).
+    """
+    sku_m3 = _strip(m3_df["SKU"])
+    sku_wms = _strip(m3_df["WMS"])
     # priorité WMS sinon SKU_M3
-    df["sku"] = df["sku_wms"].where(~wms_empty, df["sku_m3"])
+    sku = pc.if_else(pc.is_in(sku_wms, value_set=_SENTINELS), sku_m3, sku_wms)
 
-    # autres colonnes
-    df["depot"] = df["depot"].astype(str).str.strip()
-    df["category"] = df["category"].astype(str).str.strip()
-    df["lot"] = df["lot"].astype(str).str.strip()
-    df["type"] = df["type"].astype(str).str.strip()
-    df["qty_m3"] = pd.to_numeric(df["qty_m3"], errors="coerce").fillna(0)
+    columns = {
+        "sku": sku,
+        "sku_m3": sku_m3,
+        "lot": _null_sentinels(_strip(m3_df["Lot"])),
+        "depot": _strip(m3_df["Depot"]),
+        "category": _strip(m3_df["Emplacement"]),
+        "type": _strip(m3_df["Type"]),
+    }
+    df = pd.DataFrame({col: _categorical(values) for col, values in columns.items()}, index=m3_df.index)
+    df["qty_m3"] = _quantity(m3_df["Quantite"])
+    return df
 
-    df.loc[df["lot"].isin(["", "None", "nan", "NaN", "N/A"]), "lot"] = pd.NA
 
-    return df[["sku", "sku_m3", "lot", "depot", "category", "type", "qty_m3"]]
+def standardize_m3_chunks(
+    m3_data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+    """
+    Mode d'extraction par lots : si ``m3_stock_dataset`` est chargé avec
+    ``load_args.chunksize``, le dataset renvoie un itérateur de DataFrames.
+    Chaque lot est alors standardisé puis renvoyé au fil de l'eau (node générateur),
+    et Kedro l'écrit comme une partie de ``m3_stock_parquet`` avant de lire le suivant.
+    Sans ``chunksize``, comportement identique à ``standardize_m3``.
+    """
+    if isinstance(m3_data, pd.DataFrame):
+        return standardize_m3(m3_data)
+    return (standardize_m3(chunk) for chunk in m3_data)
 
 
 def standardize_reflex(reflex_df: pd.DataFrame) -> pd.DataFrame:
-    df = reflex_df.rename(
-        columns={
-            "SKU": "sku",
-            "Qualite_Origine": "qualite",
-            "Lot_1": "lot",
-            "Stock_en_VL": "qty_reflex",
-        }
-    ).copy()
-
-    df["sku"] = df["sku"].astype(str).str.strip()
-    df["qualite"] = df["qualite"].astype(str).str.strip()
-    df["lot"] = df["lot"].astype(str).str.strip()
-    df["qty_reflex"] = pd.to_numeric(df["qty_reflex"], errors="coerce").fillna(0)
-
-    df.loc[df["lot"].isin(["", "None", "nan", "NaN", "N/A"]), "lot"] = pd.NA
-
-    return df[["sku", "lot", "qualite", "qty_reflex"]]
+    columns = {
+        "sku": _strip(reflex_df["SKU"]),
+        "lot": _null_sentinels(_strip(reflex_df["Lot_1"])),
+        "qualite": _strip(reflex_df["Qualite_Origine"]),
+    }
+    df = pd.DataFrame({col: _categorical(values) for col, values in columns.items()}, index=reflex_df.index)
+    df["qty_reflex"] = _quantity(reflex_df["Stock_en_VL"])
+    return df
+
+
+def standardize_po(po_df: pd.DataFrame) -> pd.DataFrame:
+    columns = {"depot": _strip(po_df["Depot"]), "PO": _strip(po_df["PO"])}
+    return pd.DataFrame(
+        {col: values.to_numpy(zero_copy_only=False) for col, values in columns.items()}, index=po_df.index
+    )
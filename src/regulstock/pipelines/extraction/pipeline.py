@@ -1,6 +1,7 @@
 from kedro.pipeline import node, pipeline  # noqa
 from .nodes import (
-    standardize_m3,
+    standardize_m3_chunks,
+    standardize_po,
     standardize_reflex,
 )
 
@@ -8,7 +9,7 @@ def create_pipeline(**kwargs) -> pipeline:
     return pipeline(
         [
             node(
-                standardize_m3, 
+                standardize_m3_chunks, 
                 "m3_stock_dataset", 
                 outputs="m3_stock_parquet", 
                 name="standardize_m3",
@@ -19,6 +20,12 @@ def create_pipeline(**kwargs) -> pipeline:
                 "reflex_stock_parquet", 
                 name="standardize_reflex",
             ),
+            node(
+                standardize_po,
+                "m3_po_dataset",
+                "m3_po_parquet",
+                name="standardize_po",
+            ),
         ],
         tags= ['extraction']
     )
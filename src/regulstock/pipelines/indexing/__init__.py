@@ -0,0 +1,10 @@
+"""
+Pipeline 'indexing' : copies triées par sku / lot des tables consultées
+pendant les investigations (``regulstock lookup``).
+"""
+
+from .pipeline import create_pipeline
+
+__all__ = ["create_pipeline"]
+
+__version__ = "0.1"
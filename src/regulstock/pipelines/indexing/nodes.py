@@ -0,0 +1,17 @@
+"""
+Index sku / lot.
+
+Chaque table est réécrite triée par (sku, lot) en petits row groups : les statistiques
+min / max de ``sku`` dans le footer parquet deviennent un index, et ``regulstock lookup``
+ne lit que les row groups qui peuvent contenir le sku cherché.
+"""
+import pandas as pd
+
+from regulstock.categoricals import sort_by_value
+
+INDEX_KEYS = ["sku", "lot"]
+
+
+def build_lookup_index(df: pd.DataFrame) -> pd.DataFrame:
+    """Trie la table par (sku, lot), lots vides en fin de sku."""
+    return sort_by_value(df, INDEX_KEYS)
@@ -0,0 +1,20 @@
+from kedro.pipeline import Pipeline, node, pipeline
+
+from regulstock.lookup import LOOKUP_DATASETS
+
+from .nodes import build_lookup_index
+
+
+def create_pipeline(**kwargs) -> Pipeline:
+    return pipeline(
+        [
+            node(
+                func=build_lookup_index,
+                inputs=name,
+                outputs=f"{name}_lookup",
+                name=f"index_{name}",
+            )
+            for name in LOOKUP_DATASETS
+        ],
+        tags=["indexing"],
+    )
@@ -4,7 +4,9 @@ Fonctions :
 2. Création de la table des correctifs (champs : CONO,WHLO,ITNO,WHSL,BANO,STQI,STAG,BREM,RSCD)
 """
 from typing import Any, Dict, List
+import logging
 
+import numpy as np
 import pandas as pd
 
 # ========================================= Helpers =========================================
@@ -19,6 +21,74 @@ def _process_web_pos(
 
     return corr_df
 
+def _map_categorical(s: pd.Series, mapping: Dict[str, str], default: str) -> pd.Series:
+    """
+    ``s.map(mapping).fillna(default)`` en restant catégoriel : le mapping est appliqué
+    aux seules modalités, puis propagé aux lignes par les codes.
+    """
+    cat = s.astype("category")
+    mapped_cats = pd.Series(cat.cat.categories).map(mapping).fillna(default)
+    categories = pd.Index(mapped_cats.unique()).union([default])
+
+    # code -1 (valeur manquante) -> dernier élément, c'est-à-dire la modalité par défaut
+    new_codes = np.append(categories.get_indexer(mapped_cats), categories.get_loc(default))
+    out_codes = new_codes[cat.cat.codes.to_numpy()]
+
+    return pd.Series(pd.Categorical.from_codes(out_codes, categories=categories), index=s.index)
+
+
+UNMAPPED_M3 = "UNMAPPED_M3"
+
+
+def _compile_m3_rules(rules: List[Dict[str, Any]]) -> pd.Series:
+    """
+    Table de correspondance (depot, emplacement) -> category, compilée une fois à partir
+    de ``m3_mapping_rules``. Une même paire couverte par plusieurs règles garde la catégorie
+    de la première (first-match-wins).
+    """
+    table = pd.DataFrame(
+        [
+            (str(depot), str(rule["emplacement_eq"]), str(rule["category"]))
+            for rule in rules
+            for depot in rule["depot_in"]
+        ],
+        columns=["depot", "emplacement", "category"],
+    )
+    table = table.drop_duplicates(["depot", "emplacement"], keep="first")
+    return table.set_index(["depot", "emplacement"])["category"]
+
+
+def _apply_m3_rules(
+    depot: pd.Series,
+    emplacement: pd.Series,
+    table: pd.Series,
+    default: str,
+) -> pd.Series:
+    """
+    Applique la table compilée en restant catégoriel : une matrice modalité dépôt ×
+    modalité emplacement donne le code de la catégorie, puis chaque ligne est résolue
+    par indexation sur ses deux codes. Paires absentes de la table -> ``default``.
+    """
+    depot, emplacement = depot.astype("category"), emplacement.astype("category")
+    categories = pd.Index(table.unique()).union([default])
+    default_code = categories.get_loc(default)
+
+    depot_idx = depot.cat.categories.astype(str).get_indexer(table.index.get_level_values("depot"))
+    emplacement_idx = emplacement.cat.categories.astype(str).get_indexer(
+        table.index.get_level_values("emplacement")
+    )
+    known = (depot_idx >= 0) & (emplacement_idx >= 0)
+
+    # dernière ligne / colonne : code -1 (valeur manquante), donc la modalité par défaut
+    lookup = np.full(
+        (len(depot.cat.categories) + 1, len(emplacement.cat.categories) + 1), default_code, dtype=np.int64
+    )
+    lookup[depot_idx[known], emplacement_idx[known]] = categories.get_indexer(table.to_numpy()[known])
+    out_codes = lookup[depot.cat.codes.to_numpy(), emplacement.cat.codes.to_numpy()]
+
+    return pd.Series(pd.Categorical.from_codes(out_codes, categories=categories), index=depot.index)
+
+
 def _process_sms_sku(
     m3_df: pd.DataFrame,
 ) -> pd.DataFrame :
@@ -30,8 +100,22 @@ def _process_sms_sku(
 # ========================================= Preprocessing =========================================
 
 def map_m3(m3_df: pd.DataFrame, rules: List[Dict[str, Any]], pos_df : pd.DataFrame) -> pd.DataFrame:
+    """
+    Catégorie M3 selon ``m3_mapping_rules`` (depot_in + emplacement_eq -> category) :
+    en entrée, ``category`` porte l'emplacement M3 (``standardize_m3``) ; en sortie,
+    ``emplacement`` le conserve (WHSL du fichier STOCK_M3_RFX) et ``category`` reçoit la
+    catégorie de la première règle qui correspond, ``UNMAPPED_M3`` sinon.
+    """
+    df = m3_df.copy()
+    df["emplacement"] = df["category"]
+    df["category"] = _apply_m3_rules(
+        df["depot"], df["emplacement"], _compile_m3_rules(rules), UNMAPPED_M3
+    )
+    n_unmapped = int((df["category"] == UNMAPPED_M3).sum())
+    if n_unmapped:
+        logging.warning("map_m3 : %d ligne(s) sans règle de mapping (%s)", n_unmapped, UNMAPPED_M3)
 
-    sms_df = _process_sms_sku(m3_df)
+    sms_df = _process_sms_sku(df)
 
     mapped_df = _process_web_pos(sms_df, pos_df)
 
@@ -39,5 +123,5 @@ def map_m3(m3_df: pd.DataFrame, rules: List[Dict[str, Any]], pos_df : pd.DataFra
 
 def map_reflex(reflex_df: pd.DataFrame, mapping: Dict[str, str]) -> pd.DataFrame:
     df = reflex_df.copy()
-    df["category"] = df["qualite"].map(mapping).fillna("UNMAPPED_REFLEX")
+    df["category"] = _map_categorical(df["qualite"], mapping, "UNMAPPED_REFLEX")
     return df
\ No newline at end of file
@@ -18,7 +18,7 @@ def create_pipeline(**kwargs) -> pipeline:
             inputs=dict(
                 m3_df="m3_stock_parquet", 
                 rules="params:m3_mapping_rules",
-                pos_df='m3_po_dataset'
+                pos_df='m3_po_parquet'
             ),
             outputs="m3_map",
             name="map_m3",
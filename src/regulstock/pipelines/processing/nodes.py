@@ -1,130 +1,182 @@
-from typing import Any, Dict, List, Sequence
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 import logging
-import pandas as pd
 
+import numpy as np
+import pandas as pd
 
-def _build_stock_cols(df: pd.DataFrame, depots: Sequence[str]) -> pd.DataFrame:
-    for d in depots:
-        col = f"stock_{d}"
-        if col not in df.columns:
-            df[col] = 0
-    return df
+from regulstock.categoricals import concat_keep_categories, sort_categories, unify_categories
 
+from .polars_nodes import build_reflex_m3_wide_pl, compute_m3_reliquat_pl
 
-def _pivot_m3_wide(
-    m3: pd.DataFrame,
-    depots: Sequence[str],
-    group_cols: Sequence[str],
-    pivot_index: Sequence[str],
-    depot_col: str = "depot",
-    value_col: str = "qty_m3",
-) -> pd.DataFrame:
-    m3_agg = (
-        m3.groupby(list(group_cols), dropna=False)[value_col]
-        .sum()
-        .reset_index()
-    )
+ENGINES = ("pandas", "polars")
 
-    wide = (
-        m3_agg.pivot_table(
-            index=list(pivot_index),
-            columns=[depot_col],
-            values=value_col,
-            aggfunc="sum",
-            fill_value=0,
-        )
-        .reset_index()
-    )
 
-    wide = wide.rename(columns={d: f"stock_{d}" for d in depots if d in wide.columns})
-    return _build_stock_cols(wide, depots)
+def _get_engine(params: Dict[str, Any]) -> str:
+    engine = params.get("engine", "pandas")
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine={engine!r}, expected one of {ENGINES}")
+    return engine
 
 
-def _merge_fill_stock(
-    left: pd.DataFrame,
-    right: pd.DataFrame,
-    on: Sequence[str],
-    depots: Sequence[str],
-) -> pd.DataFrame:
-    out = left.merge(right, on=list(on), how="left")
-    for d in depots:
-        out[f"stock_{d}"] = out[f"stock_{d}"].fillna(0)
-    return out
+def _lot_masks(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Partition avec lot / sans lot, calculée une seule fois par table."""
+    has_lot = df["lot"].notna().to_numpy()
+    return {"with_lot": has_lot, "no_lot": ~has_lot}
 
 
-def _filter_by_lot_mode(df: pd.DataFrame, lot_mode: str) -> pd.DataFrame:
-    if lot_mode == "with_lot":
-        return df[df["lot"].notna()].copy()
-    if lot_mode == "no_lot":
-        return df[df["lot"].isna()].copy()
-    raise ValueError(f"Unknown lot_mode={lot_mode!r}")
+def _lot_mask(masks: Dict[str, np.ndarray], lot_mode: str) -> np.ndarray:
+    if lot_mode not in masks:
+        raise ValueError(f"Unknown lot_mode={lot_mode!r}")
+    return masks[lot_mode]
 
 
-def _prepare_reflex(reflex_map: pd.DataFrame, spec: Dict[str, Any]) -> pd.DataFrame:
-    df = _filter_by_lot_mode(reflex_map, spec["lot_mode"])
+def _prepare_reflex(reflex_map: pd.DataFrame, mask: np.ndarray, spec: Dict[str, Any]) -> pd.DataFrame:
+    df = reflex_map[mask]
 
     if spec.get("reflex_agg", False):
+        group_cols = list(spec["reflex_group_cols"])
         df = (
-            df.groupby(list(spec["reflex_group_cols"]), dropna=False)[spec.get("reflex_value_col", "qty_reflex")]
+            df.groupby(group_cols, dropna=False, observed=True)[spec.get("reflex_value_col", "qty_reflex")]
             .sum()
             .reset_index()
         )
-        df["lot"] = pd.NA  # comportement identique à ton code
+        # lot (flux sans lot) / qualite hors agrégation : vides, en gardant le dtype
+        # (catégoriel) de la colonne d'origine
+        for col in ("lot", "qualite"):
+            if col not in group_cols and col in reflex_map.columns:
+                df[col] = pd.Series(pd.NA, index=df.index, dtype=reflex_map[col].dtype)
 
     return df
 
 
-def _prepare_m3_wide(m3_filtered: pd.DataFrame, depots: Sequence[str], spec: Dict[str, Any]) -> pd.DataFrame:
-    df = _filter_by_lot_mode(m3_filtered, spec["lot_mode"])
-    return _pivot_m3_wide(
-        m3=df,
-        depots=depots,
-        group_cols=spec["m3_group_cols"],
-        pivot_index=spec["m3_pivot_index"],
-        depot_col=spec.get("m3_depot_col", "depot"),
-        value_col=spec.get("m3_value_col", "qty_m3"),
-    )
+def _key_codes(columns: Sequence[pd.Series]) -> Tuple[List[np.ndarray], int]:
+    """
+    Codes entiers d'une colonne clé, communs à plusieurs tables et croissants avec la
+    valeur (-1 pour une valeur nulle), et nombre de modalités. Colonnes catégorielles
+    alignées (``unify_categories``) : les codes existants, sans recalcul.
+    """
+    first = columns[0]
+    if isinstance(first.dtype, pd.CategoricalDtype) and all(
+        isinstance(c.dtype, pd.CategoricalDtype) and c.cat.categories.equals(first.cat.categories)
+        for c in columns[1:]
+    ):
+        return [c.cat.codes.to_numpy(np.int64) for c in columns], len(first.cat.categories)
+
+    codes, uniques = pd.factorize(np.concatenate([c.to_numpy(dtype=object) for c in columns]), sort=True)
+    bounds = np.cumsum([0] + [len(c) for c in columns])
+    return [codes[a:b].astype(np.int64) for a, b in zip(bounds[:-1], bounds[1:])], len(uniques)
+
+
+def _combined_keys(
+    frames: Sequence[pd.DataFrame],
+    keys: Sequence[str],
+    nulls_equal: bool = False,
+) -> List[np.ndarray]:
+    """
+    Une clé entière par ligne pour un groupe de colonnes, comparable entre les tables et
+    dans l'ordre lexicographique des valeurs. Une valeur nulle donne la clé -1, ou, avec
+    ``nulls_equal``, un code à part entière (les nulls se rejoignent, comme dans ``merge``).
+    Remplace les groupby / merge multi-colonnes sur catégories, pour lesquels pandas
+    recompare les dictionnaires de modalités à chaque appel.
+    """
+    bounds = np.cumsum([0] + [len(df) for df in frames])
+    combined = [np.zeros(len(df), dtype=np.int64) for df in frames]
+    nulls = [np.zeros(len(df), dtype=bool) for df in frames]
+    n_keys = 1
+    for col in keys:
+        codes, n = _key_codes([df[col] for df in frames])
+        # avec nulls_equal, le code 0 est réservé aux nulls
+        n = n + 1 if nulls_equal else max(n, 1)
+        if n_keys * n >= 2**62:
+            # recompacte avant de dépasser int64 (np.unique conserve l'ordre)
+            uniques, inverse = np.unique(np.concatenate(combined), return_inverse=True)
+            combined = [inverse[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+            n_keys = len(uniques)
+        for i, c in enumerate(codes):
+            nulls[i] |= c < 0
+            combined[i] = combined[i] * n + (c + 1 if nulls_equal else np.maximum(c, 0))
+        n_keys *= n
+    if nulls_equal:
+        return combined
+    return [np.where(null, -1, key) for key, null in zip(combined, nulls)]
+
+
+def _left_join_positions(left_key: np.ndarray, right_key: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Positions d'une jointure gauche sur clés entières, dans l'ordre de ``merge(how="left")`` :
+    lignes de gauche dans l'ordre, chacune suivie de ses correspondances à droite dans
+    l'ordre ; -1 à droite sans correspondance. Une clé -1 (nulle) ne correspond à rien.
+    """
+    order = np.argsort(right_key, kind="stable")
+    sorted_right = right_key[order]
+    start = np.searchsorted(sorted_right, left_key, side="left")
+    counts = np.searchsorted(sorted_right, left_key, side="right") - start
+    counts[left_key < 0] = 0
+
+    n_out = np.maximum(counts, 1)
+    left_rows = np.repeat(np.arange(len(left_key)), n_out)
+    offsets = np.arange(len(left_rows)) - np.repeat(np.cumsum(n_out) - n_out, n_out)
+    right_rows = np.full(len(left_rows), -1, dtype=np.int64)
+    matched = np.repeat(counts, n_out) > 0
+    right_rows[matched] = order[(np.repeat(start, n_out) + offsets)[matched]]
+    return left_rows, right_rows
 
 
 def _build_flow(
-    reflex_map: pd.DataFrame,
-    m3_filtered: pd.DataFrame,
+    reflex_part: pd.DataFrame,
+    reflex_key: np.ndarray,
+    m3_part: pd.DataFrame,
+    m3_key: np.ndarray,
+    depot_codes: np.ndarray,
     depots: Sequence[str],
     spec: Dict[str, Any],
-) -> pd.DataFrame:
-    logging.info(spec.get("name", "Building flow"))
-
-    reflex_part = _prepare_reflex(reflex_map, spec)
-    m3_wide = _prepare_m3_wide(m3_filtered, depots, spec)
-
-    return _merge_fill_stock(
-        left=reflex_part,
-        right=m3_wide,
-        on=spec["merge_on"],
-        depots=depots,
-    )
-
-
-def build_reflex_m3_wide_node(
-    reflex_map: pd.DataFrame,
-    m3_map: pd.DataFrame,
-    params: Dict[str, Any],
 ) -> pd.DataFrame:
     """
-    construit la table wide (réconciliation Reflex vs M3).
-    Paramètres attendus:
-      params["depots"]
-      params["wide_flows"]
+    Table wide d'un flux à partir de la jointure partagée (clés ``merge_on`` déjà codées) :
+      - stock M3 en matrice dense clé × dépôt (équivalent groupby + pivot_table, clés nulles
+        écartées) : un groupe par valeur de ``m3_pivot_index``, les dépôts en codes entiers
+        qui indexent directement les colonnes de la matrice ;
+      - jointure gauche Reflex -> M3 sur la clé entière de ``merge_on``.
     """
-    depots: List[str] = params["depots"]
-    flows: List[Dict[str, Any]] = params["wide_flows"]
+    pivot_index = list(spec["m3_pivot_index"])
+    merge_on = list(spec["merge_on"])
+    value_col = spec.get("m3_value_col", "qty_m3")
+
+    in_depots = depot_codes >= 0
+    m3 = m3_part.loc[in_depots, pivot_index + [value_col]]
+
+    # groupes M3 (pivot_index), triés comme le ferait groupby
+    (group_key,) = _combined_keys([m3], pivot_index)
+    kept = group_key >= 0
+    group_values, first_row, group_ids = np.unique(group_key[kept], return_index=True, return_inverse=True)
+    n_groups, n_depots = len(group_values), len(depots)
+    matrix = np.bincount(
+        group_ids * n_depots + depot_codes[in_depots][kept],
+        weights=m3[value_col].fillna(0).to_numpy(dtype=float)[kept],
+        minlength=n_groups * n_depots,
+    ).reshape(n_groups, n_depots)
+
+    group_rows = np.flatnonzero(kept)[first_row]
+    m3_wide = m3[pivot_index].iloc[group_rows].reset_index(drop=True)
+    for i, d in enumerate(depots):
+        m3_wide[f"stock_{d}"] = matrix[:, i]
+
+    # merge_on est inclus dans pivot_index : la clé de jointure d'un groupe est celle de sa 1re ligne
+    reflex_rows, wide_rows = _left_join_positions(reflex_key, m3_key[in_depots][group_rows])
+
+    out = reflex_part.iloc[reflex_rows].reset_index(drop=True)
+    matched = wide_rows >= 0
+    for col in m3_wide.columns.difference(merge_on, sort=False):
+        values = m3_wide[col].take(np.where(matched, wide_rows, 0)).reset_index(drop=True)
+        if col.startswith("stock_"):
+            out[col] = np.where(matched, values.to_numpy(), 0.0)
+        elif col not in out.columns:
+            out[col] = values.where(matched)
+    return out
 
-    m3_filtered = m3_map[m3_map["depot"].isin(depots)].copy()
 
-    out = pd.concat(
-        [_build_flow(reflex_map, m3_filtered, depots, spec) for spec in flows],
-        ignore_index=True,
-    )
+def _finalize_wide(parts: List[pd.DataFrame], depots: Sequence[str], dtypes: Dict[str, pd.CategoricalDtype]) -> pd.DataFrame:
+    out = concat_keep_categories(parts, dtypes)
 
     out["stock_total_m3"] = out[[f"stock_{d}" for d in depots]].sum(axis=1)
     out["ecart_rfx_m3"] = out["qty_reflex"] - out["stock_total_m3"]
@@ -144,13 +196,116 @@ def build_reflex_m3_wide_node(
     ]
 
 
-def _anti_merge_left_only(left: pd.DataFrame, right_keys: pd.DataFrame, on: Sequence[str]) -> pd.DataFrame:
-    tmp = left.merge(
-        right_keys.drop_duplicates(list(on)).assign(_in_reflex=True),
-        on=list(on),
-        how="left",
+def _finalize_reliquat(parts: List[pd.DataFrame], dtypes: Dict[str, pd.CategoricalDtype]) -> pd.DataFrame:
+    reliquat = concat_keep_categories(parts, dtypes)
+
+    reliquat["reliquat_reason"] = np.where(
+        reliquat["lot"].notna(), "NO_MATCH_WITH_LOT", "NO_MATCH_NO_LOT"
+    ).astype(object)
+
+    return reliquat[
+        ["sku_m3", "sku", "lot", "depot", "category", "qty_m3", "reliquat_reason"]
+    ]
+
+
+def _reconcile(
+    reflex_map: pd.DataFrame,
+    m3_map: pd.DataFrame,
+    params: Dict[str, Any],
+    wide: bool = True,
+    reliquat: bool = True,
+) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+    """
+    Réconciliation pandas : une jointure par lot_mode, partagée par les deux sorties.
+
+    Pour chaque flux, Reflex (éventuellement agrégé) et les lignes M3 du même lot_mode,
+    tous dépôts confondus, reçoivent une clé entière commune sur les colonnes de jointure.
+    De cette seule jointure sont tirés :
+      - la table wide (``wide_flows``) : M3 restreint aux dépôts cibles, agrégé et joint à Reflex,
+      - le reliquat (``reliquat_flows``) : lignes M3 dont la clé n'existe pas côté Reflex.
+    Un reliquat_flow sans wide_flow de même lot_mode et mêmes clés a sa propre jointure.
+    """
+    depots: List[str] = params["depots"]
+
+    (reflex_map, m3_map), dtypes = unify_categories([reflex_map, m3_map])
+    reflex_masks, m3_masks = _lot_masks(reflex_map), _lot_masks(m3_map)
+
+    # présence côté Reflex de chaque ligne M3, par (lot_mode, colonnes de jointure)
+    matches: Dict[Tuple[str, frozenset], np.ndarray] = {}
+    depot_codes: Dict[str, np.ndarray] = {}
+    wide_parts = []
+    for spec in params["wide_flows"] if wide else []:
+        logging.info(spec.get("name", "Building flow"))
+        m3_rows = _lot_mask(m3_masks, spec["lot_mode"])
+        m3_part = m3_map[m3_rows]
+        reflex_part = _prepare_reflex(reflex_map, _lot_mask(reflex_masks, spec["lot_mode"]), spec)
+        reflex_key, m3_key = _combined_keys([reflex_part, m3_part], spec["merge_on"], nulls_equal=True)
+        matches[(spec["lot_mode"], frozenset(spec["merge_on"]))] = np.isin(m3_key, reflex_key)
+
+        # code du dépôt dans ``depots`` (-1 hors dépôts cibles), par colonne dépôt utilisée
+        depot_col = spec.get("m3_depot_col", "depot")
+        if depot_col not in depot_codes:
+            depot_codes[depot_col] = pd.Categorical(m3_map[depot_col], categories=depots).codes.astype(np.int64)
+
+        wide_parts.append(
+            _build_flow(reflex_part, reflex_key, m3_part, m3_key, depot_codes[depot_col][m3_rows], depots, spec)
+        )
+
+    reliquat_parts = []
+    for spec in params["reliquat_flows"] if reliquat else []:
+        logging.info(spec["name"])
+        m3_rows = _lot_mask(m3_masks, spec["lot_mode"])
+        m3_part = m3_map[m3_rows]
+        matched = matches.get((spec["lot_mode"], frozenset(spec["key_cols"])))
+        if matched is None:
+            reflex_part = reflex_map[_lot_mask(reflex_masks, spec["lot_mode"])]
+            reflex_key, m3_key = _combined_keys([reflex_part, m3_part], spec["key_cols"], nulls_equal=True)
+            matched = np.isin(m3_key, reflex_key)
+        reliquat_parts.append(m3_part[~matched])
+
+    return (
+        _finalize_wide(wide_parts, depots, dtypes) if wide else None,
+        _finalize_reliquat(reliquat_parts, dtypes) if reliquat else None,
     )
-    return tmp[tmp["_in_reflex"].isna()].drop(columns=["_in_reflex"])
+
+
+def reconcile_reflex_m3_node(
+    reflex_map: pd.DataFrame,
+    m3_map: pd.DataFrame,
+    params: Dict[str, Any],
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Node Kedro : table wide (``corr_dataset``) et reliquat M3 (``m3_reliquat``)
+    tirés d'une même jointure Reflex / M3 par flux.
+    Paramètres attendus:
+      params["depots"]
+      params["wide_flows"]
+      params["reliquat_flows"]
+      params["engine"] (optionnel) : "pandas" (défaut) ou "polars"
+    """
+    if _get_engine(params) == "polars":
+        return (
+            build_reflex_m3_wide_pl(reflex_map, m3_map, params),
+            compute_m3_reliquat_pl(m3_map, reflex_map, params),
+        )
+    return _reconcile(reflex_map, m3_map, params)
+
+
+def build_reflex_m3_wide_node(
+    reflex_map: pd.DataFrame,
+    m3_map: pd.DataFrame,
+    params: Dict[str, Any],
+) -> pd.DataFrame:
+    """
+    construit la table wide (réconciliation Reflex vs M3) seule.
+    Paramètres attendus:
+      params["depots"]
+      params["wide_flows"]
+      params["engine"] (optionnel) : "pandas" (défaut) ou "polars"
+    """
+    if _get_engine(params) == "polars":
+        return build_reflex_m3_wide_pl(reflex_map, m3_map, params)
+    return _reconcile(reflex_map, m3_map, params, reliquat=False)[0]
 
 
 def compute_m3_reliquat_node(
@@ -159,31 +314,289 @@ def compute_m3_reliquat_node(
     params: Dict[str, Any],
 ) -> pd.DataFrame:
     """
-    Node Kedro : calcule le reliquat M3 (lignes sans match Reflex).
+    calcule le reliquat M3 (lignes sans match Reflex) seul.
     Paramètres attendus:
       params["reliquat_flows"]
+      params["engine"] (optionnel) : "pandas" (défaut) ou "polars"
     """
-    flows: List[Dict[str, Any]] = params["reliquat_flows"]
+    if _get_engine(params) == "polars":
+        return compute_m3_reliquat_pl(m3_map, reflex_map, params)
+    return _reconcile(reflex_map, m3_map, params, wide=False)[1]
 
-    m3 = m3_map.copy()
-    rfx = reflex_map.copy()
 
-    rfx_with_lot_keys = rfx[rfx["lot"].notna()][["sku", "lot", "category"]]
-    rfx_no_lot_keys = rfx[rfx["lot"].isna()][["sku", "category"]]
+# ========================================= Régulation =========================================
 
-    parts = []
-    for spec in flows:
-        logging.info(spec["name"])
-        m3_part = _filter_by_lot_mode(m3, spec["lot_mode"])
-        rfx_keys = rfx_with_lot_keys if spec["lot_mode"] == "with_lot" else rfx_no_lot_keys
-        parts.append(_anti_merge_left_only(m3_part, rfx_keys, on=spec["key_cols"]))
+def _rule_codes(index: pd.Index, values: Optional[Sequence[str]]) -> np.ndarray:
+    """Positions des valeurs d'une règle dans ``index`` ; toutes (dont nulle) si la règle n'en précise pas."""
+    if values is None:
+        return np.arange(len(index) + 1)
+    positions = index.get_indexer(list(values))
+    return positions[positions >= 0]
 
-    reliquat = pd.concat(parts, ignore_index=True)
 
-    reliquat["reliquat_reason"] = reliquat["lot"].apply(
-        lambda x: "NO_MATCH_WITH_LOT" if pd.notna(x) else "NO_MATCH_NO_LOT"
+def _compile_regul_rules(
+    rules: List[Dict[str, Any]],
+    depots: Sequence[str],
+    categories: pd.Index,
+    types: pd.Index,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Règles de régulation en deux tableaux :
+      - ``table`` (catégories + 1) × (types + 1) -> numéro de la première règle applicable
+        (-1 : aucune), la dernière ligne / colonne pour une valeur nulle ;
+      - ``chains`` (règles + 1) × longueur max : indices dans ``depots`` des dépôts à
+        débiter dans l'ordre (-1 : fin de chaîne), la dernière ligne pour « aucune règle ».
+    """
+    table = np.full((len(categories) + 1, len(types) + 1), -1, dtype=np.int64)
+    width = max([len(rule["depots"]) for rule in rules] + [1])
+    chains = np.full((len(rules) + 1, width), -1, dtype=np.int64)
+
+    depot_index = pd.Index(depots)
+    for i, rule in enumerate(rules):
+        chain = depot_index.get_indexer(list(rule["depots"]))
+        if (chain < 0).any():
+            raise ValueError(f"Règle de régul {rule!r} : dépôt absent de depots={list(depots)}")
+        if len(set(chain)) != len(chain):
+            raise ValueError(f"Règle de régul {rule!r} : dépôt répété")
+        chains[i, : len(chain)] = chain
+
+    # de la dernière à la première : la première règle applicable l'emporte
+    for i, rule in reversed(list(enumerate(rules))):
+        rows = _rule_codes(categories, rule.get("categories"))
+        cols = _rule_codes(types, rule.get("types"))
+        table[np.ix_(rows, cols)] = i
+    return table, chains
+
+
+def _waterfall(stock: np.ndarray, surplus: np.ndarray, chains: np.ndarray) -> np.ndarray:
+    """
+    Retraits par ligne × dépôt : le surplus de chaque ligne est pris sur les dépôts de sa
+    chaîne, dans l'ordre, sans dépasser le stock de chaque dépôt. Une passe vectorisée par
+    rang dans la chaîne : coût en lignes × longueur de chaîne, quel que soit le nombre de règles.
+    """
+    n_rows = len(surplus)
+    regul = np.zeros_like(stock)
+    rows = np.arange(n_rows)
+    remaining = surplus.copy()
+    for rank in range(chains.shape[1]):
+        depot = chains[:, rank]
+        active = depot >= 0
+        available = np.where(active, stock[rows, np.maximum(depot, 0)], 0.0)
+        taken = np.minimum(remaining, np.maximum(available, 0.0))
+        regul[rows[active], depot[active]] = taken[active]
+        remaining -= taken
+    return regul
+
+
+def compute_m3_regul_node(corr_dataset: pd.DataFrame, params: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Node Kedro : quantités à retirer de chaque dépôt M3 (``regul_<depot>``) pour aligner M3
+    sur Reflex, à partir de la table wide. Seul l'excédent M3 est régulé :
+        écart = max(stock_total_m3 - qty_reflex, 0)
+    Chaque ligne suit la première règle de ``params["rules"]`` dont ``categories`` et
+    ``types`` (optionnels : toutes les valeurs) contiennent les siennes, et débite les
+    ``depots`` de la règle dans l'ordre. Sans règle applicable, rien n'est retiré.
+    Paramètres attendus:
+      params["depots"] : colonnes regul_<depot> produites
+      params["rules"]  : [{categories, types, depots}, ...]
+    Colonnes ajoutées : regul_<depot>, regul_total, stock_total_m3_apres_regul,
+    ecart_rfx_m3_apres_regul.
+    """
+    depots: List[str] = list(params["depots"])
+
+    stock = np.zeros((len(corr_dataset), len(depots)))
+    for i, depot in enumerate(depots):
+        col = f"stock_{depot}"
+        if col in corr_dataset.columns:
+            stock[:, i] = pd.to_numeric(corr_dataset[col], errors="coerce").fillna(0).to_numpy(dtype=float)
+        else:
+            logging.warning("compute_m3_regul : pas de colonne %s dans corr_dataset, stock pris à 0", col)
+
+    category = corr_dataset["category"].astype("category")
+    item_type = corr_dataset["type"].astype("category")
+    table, chains = _compile_regul_rules(
+        params["rules"], depots, category.cat.categories, item_type.cat.categories
     )
+    # code -1 (valeur nulle) -> dernière ligne / colonne de la table
+    cat_codes = category.cat.codes.to_numpy(np.int64) % (len(category.cat.categories) + 1)
+    type_codes = item_type.cat.codes.to_numpy(np.int64) % (len(item_type.cat.categories) + 1)
+    rule_ids = table[cat_codes, type_codes]
+
+    total = pd.to_numeric(corr_dataset["stock_total_m3"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    reflex = pd.to_numeric(corr_dataset["qty_reflex"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    surplus = np.maximum(total - reflex, 0.0)
+
+    # rule_ids = -1 : dernière ligne de chains, vide
+    regul = _waterfall(stock, surplus, chains[rule_ids])
+
+    out = corr_dataset.copy()
+    for i, depot in enumerate(depots):
+        out[f"regul_{depot}"] = regul[:, i]
+    out["regul_total"] = regul.sum(axis=1)
+    out["stock_total_m3_apres_regul"] = total - out["regul_total"].to_numpy()
+    out["ecart_rfx_m3_apres_regul"] = reflex - out["stock_total_m3_apres_regul"].to_numpy()
+    return out
 
-    return reliquat[
-        ["sku_m3", "sku", "lot", "depot", "category", "qty_m3", "reliquat_reason"]
-    ]
+
+# ========================================= Génération STOCK_M3_RFX =========================================
+
+STOCK_M3_RFX_COLUMNS = ["CONO", "WHLO", "ITNO", "WHSL", "BANO", "STQI", "STAG", "BREM", "RSCD"]
+
+_ALLOC_KEYS = ["sku", "lot", "category", "depot"]
+
+
+def _melt_regul(regul_df: pd.DataFrame, row_ids: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """
+    Passe la table de régul au format long : une ligne par (sku, lot, category, depot)
+    avec une quantité à retirer strictement positive, dans l'ordre (colonne de régul, ligne).
+    ``_regul_id`` suit cet ordre ; ``row_ids`` (position des lignes dans la table complète)
+    le rend comparable entre morceaux d'une même table (exécution shardée).
+    """
+    for col in ["sku", "lot", "category"]:
+        if col not in regul_df.columns:
+            raise ValueError(f"reflex_m3_regul doit contenir une colonne {col!r}")
+
+    regul_cols: List[str] = [c for c in regul_df.columns if c.startswith("regul_")]
+    if not regul_cols:
+        raise ValueError("Aucune colonne de régulation trouvée (attendu: 'regul_100', 'regul_150', ...)")
+
+    regul_long = regul_df.melt(
+        id_vars=["sku", "lot", "category"],
+        value_vars=regul_cols,
+        var_name="regul_depot",
+        value_name="qty_regul",
+    )
+    regul_long["depot"] = regul_long["regul_depot"].str.replace("regul_", "", regex=False)
+    regul_long["qty_regul"] = pd.to_numeric(regul_long["qty_regul"], errors="coerce").fillna(0)
+    # melt empile les colonnes : (rang de la colonne, ligne) en un entier croissant
+    rows = np.arange(len(regul_df), dtype=np.int64) if row_ids is None else np.asarray(row_ids, dtype=np.int64)
+    regul_long["_regul_id"] = (np.repeat(np.arange(len(regul_cols), dtype=np.int64), len(rows)) << 32) + np.tile(
+        rows, len(regul_cols)
+    )
+
+    return regul_long[regul_long["qty_regul"] > 0]
+
+
+def _normalize_alloc_keys(df: pd.DataFrame) -> pd.DataFrame:
+    # clés catégorielles ; lot = NA autorisé : les clés NA se rejoignent entre elles lors du merge
+    for col in _ALLOC_KEYS:
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            values = df[col] if col == "lot" else df[col].astype(str).str.strip()
+            df[col] = values.astype("category")
+    return df
+
+
+def _allocate_regul(regul_long: pd.DataFrame, m3: pd.DataFrame) -> pd.DataFrame:
+    """
+    Répartit chaque quantité à retirer sur les lignes M3 de son groupe
+    (sku, lot, category, depot), en vidant d'abord les plus gros stocks. À stock égal,
+    l'ordre (sku_m3, emplacement) départage : le résultat ne dépend pas de l'ordre des
+    lignes de ``m3`` (relecture parquet par partition ou handoff en mémoire).
+    """
+    candidates = regul_long[[*_ALLOC_KEYS, "qty_regul", "_regul_id"]].merge(
+        m3[[*_ALLOC_KEYS, "sku_m3", "emplacement", "qty_m3"]],
+        on=_ALLOC_KEYS,
+        how="inner",
+    )
+    candidates = candidates.sort_values(
+        ["_regul_id", "qty_m3", "sku_m3", "emplacement"],
+        ascending=[True, False, True, True],
+        kind="stable",
+    )
+
+    # stock déjà consommé par les lignes précédentes du même groupe
+    deja_pris = candidates.groupby("_regul_id", sort=False)["qty_m3"].cumsum() - candidates["qty_m3"]
+    restant = candidates["qty_regul"] - deja_pris
+    candidates["STQI"] = np.minimum(candidates["qty_m3"], restant)
+
+    return candidates[candidates["STQI"] > 0]
+
+
+def _allocations(
+    reflex_m3_regul: pd.DataFrame,
+    m3_map: pd.DataFrame,
+    row_ids: Optional[np.ndarray] = None,
+) -> pd.DataFrame:
+    """Lignes M3 débitées, triées par (_regul_id, qty_m3 décroissant, sku_m3, emplacement)."""
+    regul_long = _normalize_alloc_keys(_melt_regul(reflex_m3_regul, row_ids))
+
+    # emplacement réel M3 (WHSL) : ``category`` est la catégorie issue de m3_mapping_rules
+    if "emplacement" not in m3_map.columns:
+        raise ValueError("m3_map doit contenir une colonne 'emplacement' (map_m3)")
+    m3 = m3_map[[*_ALLOC_KEYS, "sku_m3", "emplacement", "qty_m3"]].copy()
+    # modalités triées : le départage sur les codes suit l'ordre des valeurs
+    m3 = sort_categories(_normalize_alloc_keys(m3))
+    m3["qty_m3"] = pd.to_numeric(m3["qty_m3"], errors="coerce").fillna(0)
+    m3 = m3[m3["qty_m3"] > 0]
+    (regul_long, m3), _ = unify_categories([regul_long, m3], _ALLOC_KEYS)
+
+    return _allocate_regul(regul_long, m3)
+
+
+def _format_stock_m3_rfx(alloc: pd.DataFrame) -> pd.DataFrame:
+    if alloc.empty:
+        return pd.DataFrame(columns=STOCK_M3_RFX_COLUMNS)
+
+    return pd.DataFrame(
+        {
+            "CONO": 100,
+            "WHLO": alloc["depot"].astype(str),
+            "ITNO": alloc["sku_m3"].astype(str),
+            "WHSL": alloc["emplacement"].astype(str),
+            "BANO": alloc["lot"].astype(object).fillna("").astype(str),
+            "STQI": alloc["STQI"].astype(int),
+            "STAG": 2,
+            "BREM": "ECART",
+            "RSCD": "X01",
+        }
+    ).reset_index(drop=True)
+
+
+def generate_api_m3_rfx(
+    reflex_m3_regul: pd.DataFrame,
+    m3_map: pd.DataFrame,
+) -> pd.DataFrame:
+    """
+    Génère le fichier d'updates M3 au format STOCK_M3_RFX
+    (CONO, WHLO, ITNO, WHSL, BANO, STQI, STAG, BREM, RSCD).
+
+    Pour chaque (sku, lot, category, depot) où la régul est > 0, la quantité est
+    répartie sur les lignes M3 détaillées en commençant par les plus gros stocks,
+    sans jamais dépasser le stock disponible.
+    Version ensembliste : une jointure sur la clé, un tri par qty_m3 décroissant
+    dans chaque groupe puis une somme cumulée, au lieu d'un scan de M3 par groupe.
+    """
+    return _format_stock_m3_rfx(_allocations(reflex_m3_regul, m3_map))
+
+
+# lignes STOCK_M3_RFX formatées par lot émis (colonnes texte : l'essentiel de la mémoire)
+API_CHUNK_ROWS = 100_000
+
+
+def _require_valid(validation_report: Dict[str, Any]) -> None:
+    """Refuse la génération de STOCK_M3_RFX si le rapport de validation signale des violations."""
+    if validation_report["status"] != "ok":
+        failed = {name: c["violations"] for name, c in validation_report["checks"].items() if c["violations"]}
+        raise ValueError(f"Sorties invalides, fichier STOCK_M3_RFX non généré : {failed}")
+
+
+def generate_api_m3_rfx_chunks(
+    reflex_m3_regul: pd.DataFrame,
+    m3_map: pd.DataFrame,
+    chunk_rows: int = API_CHUNK_ROWS,
+    validation_report: Optional[Dict[str, Any]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Node générateur : mêmes lignes que ``generate_api_m3_rfx``, émises par lots de
+    ``chunk_rows``. L'allocation est calculée en une fois (codes catégoriels), seul le
+    formatage en colonnes texte est fait lot par lot ; chaque lot est écrit par le dataset
+    de sortie (``ChunkedCSVDataset``) avant que le suivant soit produit.
+    Au moins un lot (éventuellement vide) est émis, pour que la sortie soit toujours réécrite.
+    Avec ``validation_report`` (node ``validate_regul_outputs``), aucun lot n'est émis si
+    le rapport signale des violations : le fichier précédent n'est pas remplacé.
+    """
+    if validation_report is not None:
+        _require_valid(validation_report)
+    alloc = _allocations(reflex_m3_regul, m3_map)
+    for start in range(0, max(len(alloc), 1), chunk_rows):
+        yield _format_stock_m3_rfx(alloc.iloc[start : start + chunk_rows])
@@ -1,30 +1,51 @@
 from kedro.pipeline import Pipeline, node, pipeline
 
-from .nodes import build_reflex_m3_wide_node, compute_m3_reliquat_node
+from .nodes import compute_m3_regul_node, generate_api_m3_rfx_chunks, reconcile_reflex_m3_node
+from .validation_nodes import validate_regul_outputs
 
 
 def create_pipeline(**kwargs) -> Pipeline:
     return pipeline(
         [
             node(
-                func=build_reflex_m3_wide_node,
+                func=reconcile_reflex_m3_node,
                 inputs=dict(
                     reflex_map="reflex_map",
                     m3_map="m3_map",
                     params="params:stock_reconciliation",
                 ),
-                outputs="corr_dataset",
-                name="build_reflex_m3_wide",
+                outputs=["corr_dataset", "m3_reliquat"],
+                name="reconcile_reflex_m3",
             ),
             node(
-                func=compute_m3_reliquat_node,
+                func=compute_m3_regul_node,
                 inputs=dict(
+                    corr_dataset="corr_dataset",
+                    params="params:stock_regulation",
+                ),
+                outputs="reflex_m3_regul",
+                name="compute_m3_regul",
+            ),
+            node(
+                func=validate_regul_outputs,
+                inputs=dict(
+                    corr_dataset="corr_dataset",
+                    reflex_m3_regul="reflex_m3_regul",
                     m3_map="m3_map",
-                    reflex_map="reflex_map",
-                    params="params:stock_reconciliation",
+                    params="params:output_validation",
+                ),
+                outputs="validation_report",
+                name="validate_regul_outputs",
+            ),
+            node(
+                func=generate_api_m3_rfx_chunks,
+                inputs=dict(
+                    reflex_m3_regul="reflex_m3_regul",
+                    m3_map="m3_map",
+                    validation_report="validation_report",
                 ),
-                outputs="m3_reliquat",
-                name="compute_m3_reliquat",
+                outputs="stock_m3_rfx",
+                name="generate_api_m3_rfx",
             ),
         ]
     )
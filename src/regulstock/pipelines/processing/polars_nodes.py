@@ -0,0 +1,167 @@
+"""
+Backend Polars des nodes de réconciliation (``engine: polars`` dans ``params:stock_reconciliation``).
+
+Mêmes specs ``wide_flows`` / ``reliquat_flows`` que la version pandas de ``nodes.py``,
+exécutées en requêtes lazy Polars (multi-cœur + optimiseur de requêtes).
+Les sorties sont reconverties en pandas, identiques à celles du backend pandas.
+"""
+from typing import Any, Dict, List, Sequence
+import logging
+
+import pandas as pd
+import polars as pl
+
+from regulstock.categoricals import unify_categories
+
+
+def _to_lazy(df: pd.DataFrame) -> pl.LazyFrame:
+    # les clés catégorielles sont jointes en String, puis ré-encodées en sortie
+    return pl.from_pandas(df).lazy().with_columns(pl.col(pl.Categorical).cast(pl.String))
+
+
+def _to_pandas(lf: pl.LazyFrame, dtypes: Dict[str, pd.CategoricalDtype]) -> pd.DataFrame:
+    out = lf.collect().to_pandas()
+    for col, dtype in dtypes.items():
+        if col in out.columns:
+            out[col] = pd.Categorical(out[col], dtype=dtype)
+    return out
+
+
+def _filter_by_lot_mode(lf: pl.LazyFrame, lot_mode: str) -> pl.LazyFrame:
+    if lot_mode == "with_lot":
+        return lf.filter(pl.col("lot").is_not_null())
+    if lot_mode == "no_lot":
+        return lf.filter(pl.col("lot").is_null())
+    raise ValueError(f"Unknown lot_mode={lot_mode!r}")
+
+
+def _prepare_reflex(reflex: pl.LazyFrame, spec: Dict[str, Any]) -> pl.LazyFrame:
+    lf = _filter_by_lot_mode(reflex, spec["lot_mode"])
+
+    if spec.get("reflex_agg", False):
+        group_cols = list(spec["reflex_group_cols"])
+        value_col = spec.get("reflex_value_col", "qty_reflex")
+        lf = lf.group_by(group_cols).agg(pl.col(value_col).sum()).sort(group_cols, nulls_last=True)
+        # lot (flux sans lot) / qualite hors agrégation : vides
+        lf = lf.with_columns(
+            [pl.lit(None, dtype=pl.String).alias(col) for col in ("lot", "qualite") if col not in group_cols]
+        )
+
+    return lf
+
+
+def _prepare_m3_wide(m3_filtered: pl.LazyFrame, depots: Sequence[str], spec: Dict[str, Any]) -> pl.LazyFrame:
+    """
+    Équivalent du groupby + pivot_table pandas : une agrégation conditionnelle par dépôt.
+    Les clés nulles sont écartées, comme le fait pivot_table.
+    """
+    pivot_index = list(spec["m3_pivot_index"])
+    depot_col = spec.get("m3_depot_col", "depot")
+    value_col = spec.get("m3_value_col", "qty_m3")
+
+    lf = _filter_by_lot_mode(m3_filtered, spec["lot_mode"])
+    return (
+        lf.drop_nulls(pivot_index)
+        .group_by(pivot_index)
+        .agg(
+            [
+                pl.col(value_col).filter(pl.col(depot_col) == d).sum().alias(f"stock_{d}")
+                for d in depots
+            ]
+        )
+        .sort(pivot_index)
+    )
+
+
+def _build_flow(
+    reflex: pl.LazyFrame,
+    m3_filtered: pl.LazyFrame,
+    depots: Sequence[str],
+    spec: Dict[str, Any],
+) -> pl.LazyFrame:
+    logging.info(spec.get("name", "Building flow"))
+
+    reflex_part = _prepare_reflex(reflex, spec)
+    m3_wide = _prepare_m3_wide(m3_filtered, depots, spec)
+
+    return reflex_part.join(
+        m3_wide,
+        on=list(spec["merge_on"]),
+        how="left",
+        nulls_equal=True,
+        maintain_order="left_right",
+    ).with_columns([pl.col(f"stock_{d}").fill_null(0) for d in depots])
+
+
+def build_reflex_m3_wide_pl(
+    reflex_map: pd.DataFrame,
+    m3_map: pd.DataFrame,
+    params: Dict[str, Any],
+) -> pd.DataFrame:
+    depots: List[str] = params["depots"]
+    flows: List[Dict[str, Any]] = params["wide_flows"]
+    stock_cols = [f"stock_{d}" for d in depots]
+
+    (reflex_map, m3_map), dtypes = unify_categories([reflex_map, m3_map])
+    reflex = _to_lazy(reflex_map)
+    m3_filtered = _to_lazy(m3_map).filter(pl.col("depot").is_in(depots))
+
+    out = (
+        pl.concat(
+            [_build_flow(reflex, m3_filtered, depots, spec) for spec in flows],
+            how="diagonal_relaxed",
+        )
+        .with_columns(pl.sum_horizontal(stock_cols).alias("stock_total_m3"))
+        .with_columns((pl.col("qty_reflex") - pl.col("stock_total_m3")).alias("ecart_rfx_m3"))
+        .select(
+            [
+                "sku",
+                "lot",
+                "qualite",
+                "type",
+                "category",
+                "qty_reflex",
+                *stock_cols,
+                "stock_total_m3",
+                "ecart_rfx_m3",
+            ]
+        )
+    )
+
+    return _to_pandas(out, dtypes)
+
+
+def compute_m3_reliquat_pl(
+    m3_map: pd.DataFrame,
+    reflex_map: pd.DataFrame,
+    params: Dict[str, Any],
+) -> pd.DataFrame:
+    flows: List[Dict[str, Any]] = params["reliquat_flows"]
+
+    (m3_map, reflex_map), dtypes = unify_categories([m3_map, reflex_map])
+    m3 = _to_lazy(m3_map)
+    rfx = _to_lazy(reflex_map)
+
+    parts = []
+    for spec in flows:
+        logging.info(spec["name"])
+        key_cols = list(spec["key_cols"])
+        rfx_keys = _filter_by_lot_mode(rfx, spec["lot_mode"]).select(key_cols).unique()
+        parts.append(
+            _filter_by_lot_mode(m3, spec["lot_mode"]).join(
+                rfx_keys, on=key_cols, how="anti", nulls_equal=True, maintain_order="left"
+            )
+        )
+
+    reliquat = (
+        pl.concat(parts, how="diagonal_relaxed")
+        .with_columns(
+            pl.when(pl.col("lot").is_not_null())
+            .then(pl.lit("NO_MATCH_WITH_LOT"))
+            .otherwise(pl.lit("NO_MATCH_NO_LOT"))
+            .alias("reliquat_reason")
+        )
+        .select(["sku_m3", "sku", "lot", "depot", "category", "qty_m3", "reliquat_reason"])
+    )
+
+    return _to_pandas(reliquat, dtypes)
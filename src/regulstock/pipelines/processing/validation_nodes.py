@@ -0,0 +1,187 @@
+"""
+Contrôles des sorties de la réconciliation avant l'écriture du fichier STOCK_M3_RFX.
+
+Chaque contrôle est une passe vectorisée sur les colonnes (clés entières, bincount,
+masques NumPy), sans groupby pandas ni boucle Python sur les lignes :
+  - ``schema`` : colonnes attendues présentes, quantités numériques ;
+  - ``negative_quantity`` : aucune quantité Reflex ni régul négative (le stock M3 peut
+    l'être, ligne par ligne dans ``m3_map`` comme agrégé dans ``corr_dataset``) ;
+  - ``regul_total_mismatch`` : ``regul_total`` = somme des ``regul_<depot>`` ;
+  - ``removal_exceeds_stock`` : par (sku, lot, depot), retraits demandés <= stock M3
+    (somme des ``qty_m3`` positives, seules débitées par l'allocation) ;
+  - ``duplicate_corr_key`` : clés de ``corr_dataset`` uniques (une clé en double compte
+    deux fois le même stock M3).
+
+Le rapport donne, par contrôle, le nombre de violations et quelques lignes d'exemple.
+``generate_api_m3_rfx`` refuse de produire le fichier si le rapport n'est pas ``ok``.
+"""
+from typing import Any, Dict, List, Sequence
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from .nodes import _combined_keys
+
+DEFAULT_CORR_KEYS = ["sku", "lot", "category", "type"]
+
+REQUIRED_COLUMNS = {
+    "corr_dataset": ["sku", "lot", "category", "qty_reflex", "stock_total_m3"],
+    "reflex_m3_regul": ["sku", "lot", "category", "regul_total"],
+    "m3_map": ["sku", "lot", "depot", "qty_m3"],
+}
+
+
+def _regul_depots(regul: pd.DataFrame) -> List[str]:
+    return [c[len("regul_"):] for c in regul.columns if c.startswith("regul_") and c != "regul_total"]
+
+
+def _quantity_columns(table: str, df: pd.DataFrame) -> List[str]:
+    if table == "corr_dataset":
+        stocks = [c for c in df.columns if c.startswith("stock_") and c != "stock_total_m3"]
+        return ["qty_reflex", "stock_total_m3", *stocks]
+    if table == "reflex_m3_regul":
+        return [c for c in df.columns if c.startswith("regul_")]
+    return ["qty_m3"]
+
+
+def _is_m3_stock(col: str) -> bool:
+    return col == "qty_m3" or col.startswith("stock_")
+
+
+def _records(df: pd.DataFrame, positions: np.ndarray, cols: Sequence[str]) -> List[Dict[str, Any]]:
+    sample = df.iloc[positions][list(cols)].astype(object)
+    return sample.where(sample.notna(), None).to_dict("records")
+
+
+def _check_schema(tables: Dict[str, pd.DataFrame], corr_keys: Sequence[str]) -> Dict[str, Any]:
+    problems = []
+    for table, df in tables.items():
+        required = list(REQUIRED_COLUMNS[table])
+        if table == "corr_dataset":
+            required += [k for k in corr_keys if k not in required]
+        for col in required:
+            if col not in df.columns:
+                problems.append({"table": table, "column": col, "problem": "colonne absente"})
+        for col in _quantity_columns(table, df):
+            if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+                problem = f"type {df[col].dtype} non numérique"
+                problems.append({"table": table, "column": col, "problem": problem})
+    if not _regul_depots(tables["reflex_m3_regul"]):
+        problems.append({"table": "reflex_m3_regul", "column": "regul_<depot>", "problem": "colonne absente"})
+    return {"violations": len(problems), "examples": problems}
+
+
+def _check_negative(tables: Dict[str, pd.DataFrame], tolerance: float, max_examples: int) -> Dict[str, Any]:
+    violations, examples = 0, []
+    for table, df in tables.items():
+        for col in _quantity_columns(table, df):
+            if _is_m3_stock(col):
+                # stock M3 négatif possible (ligne non débitée par l'allocation) : même
+                # règle pour qty_m3 et pour les stock_<depot> / stock_total_m3 qui l'agrègent
+                continue
+            negative = df[col].to_numpy(dtype=float, na_value=0.0) < -tolerance
+            count = int(negative.sum())
+            if count:
+                violations += count
+                positions = np.flatnonzero(negative)[: max(max_examples - len(examples), 0)]
+                examples += [
+                    {"table": table, "column": col, **row}
+                    for row in _records(df, positions, ["sku", "lot", "category", col])
+                ]
+    return {"violations": violations, "examples": examples}
+
+
+def _check_regul_total(regul: pd.DataFrame, tolerance: float, max_examples: int) -> Dict[str, Any]:
+    regul_cols = [f"regul_{d}" for d in _regul_depots(regul)]
+    total = regul[regul_cols].to_numpy(dtype=float, na_value=0.0).sum(axis=1)
+    mismatch = np.abs(regul["regul_total"].to_numpy(dtype=float, na_value=0.0) - total) > tolerance
+    positions = np.flatnonzero(mismatch)[:max_examples]
+    examples = _records(regul, positions, ["sku", "lot", "category", "regul_total"])
+    for row, pos in zip(examples, positions):
+        row["sum_regul_depots"] = float(total[pos])
+    return {"violations": int(mismatch.sum()), "examples": examples}
+
+
+def _check_removals(
+    regul: pd.DataFrame, m3_map: pd.DataFrame, tolerance: float, max_examples: int
+) -> Dict[str, Any]:
+    """
+    Une clé entière (sku, lot) commune aux deux tables, combinée au dépôt : retraits et
+    stock sont sommés par ``bincount`` sur les mêmes identifiants de groupe.
+    """
+    depots = _regul_depots(regul)
+    regul_key, m3_key = _combined_keys([regul, m3_map], ["sku", "lot"], nulls_equal=True)
+
+    removals = regul[[f"regul_{d}" for d in depots]].to_numpy(dtype=float, na_value=0.0)
+    rows, cols = np.nonzero(removals > 0)
+    m3_depot = pd.Categorical(m3_map["depot"], categories=depots).codes.astype(np.int64)
+    held = m3_depot >= 0
+
+    keys = np.concatenate([regul_key[rows] * len(depots) + cols, m3_key[held] * len(depots) + m3_depot[held]])
+    uniques, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    removed = np.bincount(inverse[: len(rows)], weights=removals[rows, cols], minlength=len(uniques))
+    qty = np.maximum(pd.to_numeric(m3_map["qty_m3"], errors="coerce").fillna(0).to_numpy(dtype=float), 0.0)
+    stock = np.bincount(inverse[len(rows):], weights=qty[held], minlength=len(uniques))
+
+    exceeds = removed > stock + tolerance
+    # un groupe en dépassement a au moins un retrait : sa 1re occurrence est côté régul
+    groups = np.flatnonzero(exceeds)[:max_examples]
+    examples = _records(regul, rows[first[groups]], ["sku", "lot"])
+    for row, group in zip(examples, groups):
+        row.update(
+            depot=depots[cols[first[group]]],
+            removed=float(removed[group]),
+            qty_m3=float(stock[group]),
+        )
+    return {"violations": int(exceeds.sum()), "examples": examples}
+
+
+def _check_duplicates(corr: pd.DataFrame, keys: Sequence[str], max_examples: int) -> Dict[str, Any]:
+    (key,) = _combined_keys([corr], keys, nulls_equal=True)
+    duplicated = pd.Series(key).duplicated(keep=False).to_numpy()
+    positions = np.flatnonzero(duplicated)[:max_examples]
+    return {"violations": int(duplicated.sum()), "examples": _records(corr, positions, keys)}
+
+
+def validate_regul_outputs(
+    corr_dataset: pd.DataFrame,
+    reflex_m3_regul: pd.DataFrame,
+    m3_map: pd.DataFrame,
+    params: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Node Kedro : rapport de validation (``status`` ok / failed, violations et exemples par contrôle).
+    Paramètres attendus:
+      params["tolerance"]    : écart toléré sur les quantités
+      params["max_examples"] : lignes d'exemple par contrôle
+      params["corr_keys"]    : clé unique de corr_dataset (défaut : sku, lot, category, type)
+    """
+    start = time.perf_counter()
+    tolerance = float(params.get("tolerance", 1e-6))
+    max_examples = int(params.get("max_examples", 20))
+    corr_keys = list(params.get("corr_keys", DEFAULT_CORR_KEYS))
+    tables = {"corr_dataset": corr_dataset, "reflex_m3_regul": reflex_m3_regul, "m3_map": m3_map}
+
+    checks = {"schema": _check_schema(tables, corr_keys)}
+    # schéma invalide : les autres contrôles n'ont pas de sens
+    if not checks["schema"]["violations"]:
+        checks["negative_quantity"] = _check_negative(tables, tolerance, max_examples)
+        checks["regul_total_mismatch"] = _check_regul_total(reflex_m3_regul, tolerance, max_examples)
+        checks["removal_exceeds_stock"] = _check_removals(reflex_m3_regul, m3_map, tolerance, max_examples)
+        checks["duplicate_corr_key"] = _check_duplicates(corr_dataset, corr_keys, max_examples)
+
+    violations = sum(check["violations"] for check in checks.values())
+    for name, check in checks.items():
+        if check["violations"]:
+            logging.warning("Validation %s : %d violation(s)", name, check["violations"])
+
+    return {
+        "status": "ok" if not violations else "failed",
+        "violations": violations,
+        "rows": {name: len(df) for name, df in tables.items()},
+        "seconds": round(time.perf_counter() - start, 3),
+        "checks": checks,
+    }
+
@@ -0,0 +1,10 @@
+"""
+Pipeline 'submission' : envoi des lignes STOCK_M3_RFX à la transaction MMS310MI/Update.
+Hors du pipeline par défaut : ``kedro run --pipeline submission``.
+"""
+
+from .pipeline import create_pipeline
+
+__all__ = ["create_pipeline"]
+
+__version__ = "0.1"
@@ -0,0 +1,51 @@
+"""
+Envoi direct des updates de stock à M3 (au lieu du dépôt manuel du CSV).
+"""
+from typing import Any, Dict, Optional, Tuple
+import logging
+import os
+
+import pandas as pd
+
+from regulstock.m3api import MIClient
+
+# identifiants de l'API M3, lus dans l'environnement (jamais dans les paramètres)
+USER_ENV, PASSWORD_ENV = "M3_API_USER", "M3_API_PASSWORD"
+
+
+def _auth() -> Optional[Tuple[str, str]]:
+    """Identifiants de l'environnement ; aucun des deux : pas d'authentification."""
+    user, password = os.environ.get(USER_ENV), os.environ.get(PASSWORD_ENV)
+    if user is None and password is None:
+        return None
+    if not user or not password:
+        missing = PASSWORD_ENV if user else USER_ENV
+        raise ValueError(f"{USER_ENV} et {PASSWORD_ENV} doivent être définis ensemble : {missing} manquant")
+    return user, password
+
+
+def submit_stock_m3_rfx(stock_m3_rfx: pd.DataFrame, params: Dict[str, Any]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Poste chaque ligne STOCK_M3_RFX à ``params["program"]`` / ``params["transaction"]``.
+    Paramètres attendus:
+      params["base_url"]
+      params["program"], params["transaction"]
+      params["batch_size"], params["max_workers"], params["max_retries"],
+      params["backoff_s"], params["timeout_s"] (optionnels)
+    Renvoie le journal ligne à ligne et le bilan (débit, latences, erreurs).
+    """
+    client = MIClient(auth=_auth(), **params)
+    log, summary = client.submit(stock_m3_rfx)
+
+    logging.info(
+        "MMS310MI : %d ligne(s) envoyée(s), %d erreur(s), %.1f lignes/s",
+        summary["rows"], summary["errors"], summary["rows_per_s"] or 0,
+    )
+    if summary["errors"]:
+        logging.warning("MMS310MI : %d ligne(s) rejetée(s), voir submission_log", summary["errors"])
+    if summary["unknown"]:
+        logging.warning(
+            "MMS310MI : %d ligne(s) au sort inconnu (status UNKNOWN), à vérifier dans M3 avant tout renvoi",
+            summary["unknown"],
+        )
+    return log, summary
@@ -0,0 +1,17 @@
+from kedro.pipeline import Pipeline, node, pipeline
+
+from .nodes import submit_stock_m3_rfx
+
+
+def create_pipeline(**kwargs) -> Pipeline:
+    return pipeline(
+        [
+            node(
+                func=submit_stock_m3_rfx,
+                inputs=dict(stock_m3_rfx="stock_m3_rfx", params="params:m3_api"),
+                outputs=["submission_log", "submission_summary"],
+                name="submit_stock_m3_rfx",
+            ),
+        ],
+        tags=["submission"],
+    )
@@ -3,10 +3,38 @@ from the Kedro defaults. For further information, including these default values
 https://docs.kedro.org/en/stable/kedro_project_setup/settings.html."""
 
 # Instantiated project hooks.
-# For example, after creating a hooks.py and defining a ProjectHooks class there, do
-# from regulstock.hooks import ProjectHooks
 # Hooks are executed in a Last-In-First-Out (LIFO) order.
-# HOOKS = (ProjectHooks(),)
+import os
+
+from regulstock.hooks import (
+    ArrowHandoffHooks,
+    ColumnProjectionHooks,
+    ConcurrentExtractionHooks,
+    NodeCacheHooks,
+    ProfilingHooks,
+    RunDiffHooks,
+)
+
+HOOKS = (
+    ConcurrentExtractionHooks(),
+    ColumnProjectionHooks(),
+    NodeCacheHooks(cache_dir="data/09_cache", max_bytes=2 * 1024**3),
+)
+
+# profilage par node, à la demande : REGULSTOCK_PROFILE=1 kedro run
+# (REGULSTOCK_PROFILE=sampling pour échantillonner aussi les piles -> flamegraph)
+if os.environ.get("REGULSTOCK_PROFILE"):
+    HOOKS += (ProfilingHooks(sampling=os.environ["REGULSTOCK_PROFILE"] == "sampling"),)
+
+# diff des sorties avec le run précédent (data/08_reporting/diff_report.json) :
+# REGULSTOCK_DIFF=1 kedro run
+if os.environ.get("REGULSTOCK_DIFF"):
+    HOOKS += (RunDiffHooks(),)
+
+# datasets intermédiaires passés en mémoire, parquet écrit en tâche de fond :
+# REGULSTOCK_HANDOFF=1 kedro run
+if os.environ.get("REGULSTOCK_HANDOFF"):
+    HOOKS += (ArrowHandoffHooks(),)
 
 # Installed plugins for which to disable hook auto-registration.
 # DISABLE_HOOKS_FOR_PLUGINS = ("kedro-viz",)
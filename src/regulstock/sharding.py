@@ -0,0 +1,187 @@
+"""
+``regulstock sharded --shards N`` : preprocessing + processing en N morceaux indépendants.
+
+Chaque sku se réconcilie seul (toutes les jointures sont sur ``sku``) : les entrées sont
+réparties par hachage du sku, chaque morceau passe ``map_m3`` / ``map_reflex`` /
+``reconcile_reflex_m3`` / ``compute_m3_regul`` / allocation STOCK_M3_RFX dans un pool de
+processus, puis les sorties sont recollées dans l'ordre des morceaux.
+
+Les lignes d'un même sku gardent leur ordre relatif, et les colonnes catégorielles gardent
+les modalités de la table complète : une fois écrites par les datasets du catalog (triées
+par sku), les sorties sont identiques octet pour octet quel que soit N. ``--shards 1`` est
+l'exécution mono-processus de référence. ``reflex_m3_regul`` est remise dans l'ordre où
+``compute_m3_regul`` lit ``corr_dataset`` dans un ``kedro run`` (``REGUL_ORDER``), et les
+lignes STOCK_M3_RFX dans l'ordre global de cette table (``_regul_id``) avant formatage.
+Comme dans le pipeline, ``validate_regul_outputs`` contrôle les tables complètes : en cas
+de violation, le rapport est écrit et le fichier STOCK_M3_RFX précédent est conservé.
+
+La liste des PO n'a pas de sku (elle est comparée aux lots) : elle est envoyée entière à
+chaque morceau.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import logging
+import time
+
+import click
+import numpy as np
+import pandas as pd
+
+from regulstock.categoricals import concat_keep_categories, sort_by_value, unify_categories
+from regulstock.pipelines.preprocessing.nodes import map_m3, map_reflex
+from regulstock.pipelines.processing.nodes import (
+    _allocations,
+    _format_stock_m3_rfx,
+    _require_valid,
+    compute_m3_regul_node,
+    reconcile_reflex_m3_node,
+)
+from regulstock.pipelines.processing.validation_nodes import validate_regul_outputs
+
+logger = logging.getLogger(__name__)
+
+SHARDED_INPUTS = ("m3_stock_parquet", "reflex_stock_parquet", "m3_po_parquet")
+SHARDED_OUTPUTS = ("m3_map", "reflex_map", "corr_dataset", "m3_reliquat", "reflex_m3_regul", "stock_m3_rfx")
+# ordre de relecture de corr_dataset (partition_cols puis sort_by du catalog) : celui des
+# lignes de reflex_m3_regul dans un kedro run
+REGUL_ORDER = ["category", "sku"]
+# _regul_id : (rang de la colonne de régul << 32) + ligne (cf. _melt_regul)
+_ROW_MASK = (1 << 32) - 1
+
+
+def shard_ids(sku: pd.Series, n_shards: int) -> np.ndarray:
+    """
+    Morceau de chaque ligne : hachage stable (indépendant du processus) de la valeur du sku.
+    Sur une colonne catégorielle, seules les modalités sont hachées.
+    """
+    if isinstance(sku.dtype, pd.CategoricalDtype):
+        hashes = pd.util.hash_array(sku.cat.categories.astype(str).to_numpy(dtype=object))
+        codes = sku.cat.codes.to_numpy()
+        # sku manquant : morceau 0
+        return np.where(codes >= 0, hashes[codes] % n_shards, 0).astype(np.int64)
+    hashes = pd.util.hash_array(sku.astype(str).to_numpy(dtype=object))
+    return np.where(sku.notna().to_numpy(), hashes % n_shards, 0).astype(np.int64)
+
+
+def split_by_sku(df: pd.DataFrame, n_shards: int) -> List[pd.DataFrame]:
+    """Un morceau par shard, lignes dans l'ordre d'origine, dtypes (modalités) conservés."""
+    if n_shards == 1:
+        return [df]
+    ids = shard_ids(df["sku"], n_shards)
+    return [df[ids == shard] for shard in range(n_shards)]
+
+
+def _run_shard(shard: Dict[str, Any], params: Dict[str, Any], regul: bool = True) -> Dict[str, pd.DataFrame]:
+    """
+    Nodes du run complet sur un morceau. Avec ``regul``, aussi ``compute_m3_regul`` et
+    l'allocation STOCK_M3_RFX, dont ``_regul_id`` repère les lignes du ``reflex_m3_regul``
+    du morceau (renumérotées par ``run_sharded``).
+    """
+    m3_map = map_m3(shard["m3_stock_parquet"], params["m3_mapping_rules"], shard["m3_po_parquet"])
+    reflex_map = map_reflex(shard["reflex_stock_parquet"], params["reflex_mapping_rules"])
+    corr_dataset, m3_reliquat = reconcile_reflex_m3_node(reflex_map, m3_map, params["stock_reconciliation"])
+
+    out = {
+        "m3_map": m3_map,
+        "reflex_map": reflex_map,
+        "corr_dataset": corr_dataset,
+        "m3_reliquat": m3_reliquat,
+    }
+    if regul:
+        out["reflex_m3_regul"] = compute_m3_regul_node(corr_dataset, params["stock_regulation"])
+        out["allocations"] = _allocations(out["reflex_m3_regul"], m3_map)
+    return out
+
+
+def _concat(parts: List[pd.DataFrame]) -> pd.DataFrame:
+    parts, dtypes = unify_categories(parts)
+    return concat_keep_categories(parts, dtypes).reset_index(drop=True)
+
+
+def _regul_ranks(regul: pd.DataFrame) -> np.ndarray:
+    """Rang de chaque ligne dans l'ordre ``REGUL_ORDER`` (tri stable sur les valeurs)."""
+    rows = regul[REGUL_ORDER].assign(_row=np.arange(len(regul), dtype=np.int64))
+    order = sort_by_value(rows, REGUL_ORDER)["_row"].to_numpy()
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order), dtype=np.int64)
+    return ranks
+
+
+def run_sharded(
+    inputs: Dict[str, pd.DataFrame],
+    params: Dict[str, Any],
+    n_shards: int,
+    max_workers: Optional[int] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Sorties ``SHARDED_OUTPUTS`` calculées morceau par morceau, et ``validation_report``
+    (``validate_regul_outputs`` sur les tables recollées). ``n_shards=1`` : tout dans le
+    processus courant.
+    """
+    m3_shards = split_by_sku(inputs["m3_stock_parquet"], n_shards)
+    reflex_shards = split_by_sku(inputs["reflex_stock_parquet"], n_shards)
+    shards = [
+        {
+            "m3_stock_parquet": m3,
+            "reflex_stock_parquet": reflex,
+            "m3_po_parquet": inputs["m3_po_parquet"],
+        }
+        for m3, reflex in zip(m3_shards, reflex_shards)
+    ]
+    # morceaux vides (plus de shards que de skus) : rien à calculer
+    shards = [s for s in shards if len(s["m3_stock_parquet"]) or len(s["reflex_stock_parquet"])] or shards[:1]
+
+    if n_shards == 1:
+        results = [_run_shard(s, params) for s in shards]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_run_shard, shards, [params] * len(shards)))
+
+    outputs = {name: _concat([r[name] for r in results]) for name in SHARDED_OUTPUTS if name in results[0]}
+
+    # lignes de régul (et _regul_id des allocations) renumérotées dans l'ordre d'un kedro run
+    ranks = _regul_ranks(outputs["reflex_m3_regul"])
+    outputs["reflex_m3_regul"] = outputs["reflex_m3_regul"].iloc[np.argsort(ranks, kind="stable")].reset_index(drop=True)
+    offsets = np.cumsum([0] + [len(r["reflex_m3_regul"]) for r in results[:-1]])
+    allocations = []
+    for offset, result in zip(offsets, results):
+        alloc = result["allocations"]
+        ids = alloc["_regul_id"].to_numpy()
+        alloc = alloc.assign(_regul_id=(ids & ~_ROW_MASK) + ranks[offset + (ids & _ROW_MASK)])
+        allocations.append(alloc)
+    allocations = _concat(allocations).sort_values("_regul_id", kind="stable")
+    outputs["stock_m3_rfx"] = _format_stock_m3_rfx(allocations)
+    outputs["validation_report"] = validate_regul_outputs(
+        outputs["corr_dataset"], outputs["reflex_m3_regul"], outputs["m3_map"], params["output_validation"]
+    )
+    return outputs
+
+
+@click.command(name="sharded")
+@click.option("--shards", "n_shards", type=int, required=True, help="Nombre de morceaux (par sku).")
+@click.option("--workers", "max_workers", type=int, default=None, help="Processus (défaut : nb de cœurs).")
+@click.option("--env", default="local", show_default=True)
+def sharded_command(n_shards: int, max_workers: Optional[int], env: str) -> None:
+    """Preprocessing + processing répartis par sku sur un pool de processus."""
+    from kedro.framework.session import KedroSession
+
+    with KedroSession.create(project_path=Path.cwd(), env=env) as session:
+        context = session.load_context()
+        catalog, params = context.catalog, context.params
+
+        inputs = {name: catalog.load(name) for name in SHARDED_INPUTS}
+        start = time.perf_counter()
+        outputs = run_sharded(inputs, params, n_shards, max_workers)
+        logger.info("Exécution shardée (%d morceaux) : %.2fs", n_shards, time.perf_counter() - start)
+
+        report = outputs.pop("validation_report")
+        catalog.save("validation_report", report)
+        stock_m3_rfx = outputs.pop("stock_m3_rfx")
+        for name, df in outputs.items():
+            catalog.save(name, df)
+            click.echo(f"{name} : {len(df)} ligne(s)")
+        # comme le node generate_api_m3_rfx : fichier précédent conservé si la validation échoue
+        _require_valid(report)
+        catalog.save("stock_m3_rfx", stock_m3_rfx)
+        click.echo(f"stock_m3_rfx : {len(stock_m3_rfx)} ligne(s)")
@@ -0,0 +1,163 @@
+"""
+Jeux de données synthétiques pour les benchmarks et les tests de charge.
+
+Les tables ont la forme des requêtes d'extraction du catalog :
+  - ``generate_m3_stock`` : sortie de ``m3_stock_dataset`` (MITLOC + MITMAS + MITPOP),
+  - ``generate_reflex_stock`` : sortie de ``reflex_stock_dataset`` (HLGEINP),
+  - ``generate_m3_po`` : sortie de ``m3_po_dataset`` (MPHEAD, dépôt 150).
+
+Les proportions (articles lotés / non lotés, recouvrement des clés entre M3 et Reflex,
+dépôts, emplacements) sont réglables ; les valeurs par défaut imitent un entrepôt réel.
+Tout est tiré d'un générateur NumPy seedé : même taille + même seed = mêmes données.
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# ===== Référentiels =====
+
+DEPOTS = np.array(["100", "150", "200", "400"])
+DEPOT_WEIGHTS = np.array([0.55, 0.15, 0.1, 0.2])
+
+# emplacements M3 compatibles avec ``m3_mapping_rules``, par dépôt
+EMPLACEMENTS = {
+    "100": (["STOCK", "NDISP", "REJET"], [0.85, 0.1, 0.05]),
+    "150": (["STOCK"], [1.0]),
+    "200": (["DEF", "DES"], [0.5, 0.5]),
+    "400": (["STOCK", "NDISP", "REJET"], [0.85, 0.1, 0.05]),
+}
+
+ITEM_TYPES = np.array(["A01", "A06", "B01"])
+REFLEX_QUALITES = np.array(["STD", "CAT", "QUA", "REC", "RET", "BLO", "DEF", "DES"])
+REFLEX_QUALITE_WEIGHTS = np.array([0.8, 0.04, 0.03, 0.03, 0.03, 0.03, 0.02, 0.02])
+
+# tailles nommées utilisées par les benchmarks
+SIZES = {"100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+
+
+def _codes(prefix: str, values: np.ndarray, width: int) -> np.ndarray:
+    return np.char.add(prefix, np.char.zfill(values.astype(str), width))
+
+
+def _pad(values: np.ndarray, rng: np.random.Generator, share: float) -> np.ndarray:
+    # une partie des codes arrive avec des blancs de fin, comme les CHAR SQL Server
+    padded = rng.random(len(values)) < share
+    return np.where(padded, np.char.add(values, "  "), values)
+
+
+# ===== Générateurs =====
+
+def generate_m3_stock(
+    n_rows: int,
+    seed: int = 0,
+    rows_per_sku: int = 8,
+    lot_share: float = 0.6,
+    wms_share: float = 0.2,
+) -> pd.DataFrame:
+    """
+    Stock M3 brut (colonnes ``SKU, Type, Depot, Emplacement, Lot, Quantite, WMS``).
+
+    ``lot_share`` : part des articles gérés en lot ; les autres ont un lot vide.
+    ``wms_share`` : part des articles ayant un code WMS différent du code M3.
+    """
+    rng = np.random.default_rng(seed)
+    n_skus = max(n_rows // rows_per_sku, 1)
+
+    sku_ids = rng.integers(0, n_skus, n_rows)
+    skus = _codes("M", sku_ids, 7)
+    # caractéristiques portées par l'article : type, gestion en lot, code WMS
+    sku_type = ITEM_TYPES[rng.integers(0, len(ITEM_TYPES), n_skus)]
+    sku_has_lot = rng.random(n_skus) < lot_share
+    sku_has_wms = rng.random(n_skus) < wms_share
+
+    depots = rng.choice(DEPOTS, n_rows, p=DEPOT_WEIGHTS)
+    emplacements = np.empty(n_rows, dtype=object)
+    for depot, (values, weights) in EMPLACEMENTS.items():
+        mask = depots == depot
+        emplacements[mask] = rng.choice(values, mask.sum(), p=weights)
+
+    # quelques lots par article : numéro de lot = article + indice
+    has_lot = sku_has_lot[sku_ids]
+    lots = np.where(
+        has_lot,
+        np.char.add(_codes("L", sku_ids, 7), _codes("-", rng.integers(0, 4, n_rows), 2)),
+        "",
+    )
+    wms = np.where(sku_has_wms[sku_ids], _codes("W", sku_ids, 7), "N/A")
+
+    return pd.DataFrame(
+        {
+            "SKU": _pad(skus, rng, 0.1),
+            "Type": sku_type[sku_ids],
+            "Depot": depots,
+            "Emplacement": emplacements,
+            "Lot": _pad(lots, rng, 0.1),
+            "Quantite": rng.integers(1, 500, n_rows).astype(float),
+            "WMS": wms,
+        }
+    )
+
+
+def generate_reflex_stock(
+    m3_stock: pd.DataFrame,
+    n_rows: int,
+    seed: int = 1,
+    key_overlap: float = 0.85,
+) -> pd.DataFrame:
+    """
+    Stock Reflex brut (colonnes ``SKU, Qualite_Origine, Stock_en_VL, Lot_1``).
+
+    ``key_overlap`` : part des lignes Reflex dont l'article / lot existe aussi dans M3
+    (avec son code WMS s'il en a un) ; le reste correspond à des articles inconnus de M3.
+    """
+    rng = np.random.default_rng(seed)
+
+    sku_m3 = m3_stock["SKU"].str.strip().to_numpy()
+    wms = m3_stock["WMS"].to_numpy()
+    keys_sku = np.where(wms == "N/A", sku_m3, wms)
+    keys_lot = m3_stock["Lot"].str.strip().to_numpy()
+
+    picked = rng.integers(0, len(m3_stock), n_rows)
+    skus = keys_sku[picked].astype(object)
+    lots = keys_lot[picked].astype(object)
+
+    unknown = rng.random(n_rows) >= key_overlap
+    n_unknown = int(unknown.sum())
+    skus[unknown] = _codes("X", rng.integers(0, max(n_rows // 8, 1), n_unknown), 7)
+    lots[unknown] = np.where(
+        rng.random(n_unknown) < 0.5, _codes("LX", rng.integers(0, 10_000, n_unknown), 6), ""
+    )
+
+    return pd.DataFrame(
+        {
+            "SKU": _pad(skus.astype(str), rng, 0.1),
+            "Qualite_Origine": rng.choice(REFLEX_QUALITES, n_rows, p=REFLEX_QUALITE_WEIGHTS),
+            "Stock_en_VL": rng.integers(0, 500, n_rows).astype(float),
+            "Lot_1": lots.astype(str),
+        }
+    )
+
+
+def generate_m3_po(m3_stock: pd.DataFrame, seed: int = 2, po_share: float = 0.05) -> pd.DataFrame:
+    """PO web du dépôt 150 (colonnes ``Depot, PO``) : une partie des lots du dépôt 150."""
+    rng = np.random.default_rng(seed)
+    lots = m3_stock.loc[m3_stock["Depot"] == "150", "Lot"].str.strip()
+    lots = lots[lots != ""].unique()
+    pos = lots[rng.random(len(lots)) < po_share]
+    return pd.DataFrame({"Depot": "150", "PO": pos})
+
+
+def generate_raw_tables(size: str, seed: int = 0) -> Dict[str, pd.DataFrame]:
+    """
+    Les trois tables brutes pour une taille nommée de ``SIZES`` (``"100k"``, ``"1M"``...) :
+    autant de lignes Reflex que de lignes M3 / 2.
+    """
+    n_rows = SIZES[size]
+    m3 = generate_m3_stock(n_rows, seed=seed)
+    return {
+        "m3_stock_dataset": m3,
+        "reflex_stock_dataset": generate_reflex_stock(m3, n_rows // 2, seed=seed + 1),
+        "m3_po_dataset": generate_m3_po(m3, seed=seed + 2),
+    }
+
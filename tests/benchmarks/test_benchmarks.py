@@ -0,0 +1,290 @@
+"""
+Benchmarks des nodes sur données synthétiques (``regulstock.synthetic``).
+
+Exclus du ``pytest`` par défaut (marqueur ``benchmark``) :
+
+    pytest -m benchmark tests/benchmarks
+    REGULSTOCK_BENCH_SIZES=100k,1M pytest -m benchmark tests/benchmarks
+    REGULSTOCK_BENCH_RECORD=1 pytest -m benchmark tests/benchmarks   # réenregistre les budgets
+
+Chaque node est chronométré (meilleure de ``ROUNDS`` passes), puis rejoué sous
+``tracemalloc`` pour mesurer son pic d'allocation Python, et sur un pool mémoire Arrow
+dédié pour le pic des buffers Arrow (invisibles de ``tracemalloc`` : lecture parquet,
+colonnes numériques partagées sans copie avec pandas). Le test échoue si le temps ou
+un pic dépasse le budget enregistré dans ``budgets.yml`` pour la taille testée.
+"""
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+import os
+import time
+import tracemalloc
+
+import pyarrow as pa
+import pytest
+import yaml
+from kedro.config import OmegaConfigLoader
+
+from regulstock.datasets import ChunkedCSVDataset, PartitionedParquetDataset
+from regulstock.pipelines.extraction import old_nodes as extraction_old_nodes
+from regulstock.pipelines.extraction.nodes import standardize_m3, standardize_po, standardize_reflex
+from regulstock.pipelines.preprocessing.nodes import map_m3, map_reflex
+from regulstock.pipelines.processing.nodes import (
+    compute_m3_regul_node,
+    generate_api_m3_rfx_chunks,
+    reconcile_reflex_m3_node,
+)
+from regulstock.pipelines.processing.validation_nodes import validate_regul_outputs
+from regulstock.synthetic import generate_raw_tables
+
+pytestmark = pytest.mark.benchmark
+
+BUDGETS_PATH = Path(__file__).with_name("budgets.yml")
+CONF_SOURCE = Path(__file__).parents[2] / "conf"
+SIZES = os.environ.get("REGULSTOCK_BENCH_SIZES", "100k").split(",")
+RECORD = os.environ.get("REGULSTOCK_BENCH_RECORD") == "1"
+ROUNDS = 3
+
+# marge appliquée aux mesures lors de l'enregistrement des budgets
+TIME_MARGIN = 2.0
+MEMORY_MARGIN = 1.3
+# en dessous, le bruit de mesure domine : budget de temps plancher
+MIN_SECONDS = 0.05
+
+
+@lru_cache(maxsize=1)
+def _parameters() -> Dict[str, Any]:
+    return OmegaConfigLoader(conf_source=str(CONF_SOURCE), base_env="base", default_run_env="local")["parameters"]
+
+
+@lru_cache(maxsize=1)
+def _stages(size: str) -> Dict[str, Any]:
+    """Entrées de chaque node pour une taille, calculées une fois avec les nodes eux-mêmes."""
+    params = _parameters()
+    raw = generate_raw_tables(size)
+    stages = dict(raw)
+    stages["m3_stock_parquet"] = standardize_m3(raw["m3_stock_dataset"])
+    stages["reflex_stock_parquet"] = standardize_reflex(raw["reflex_stock_dataset"])
+    stages["m3_po_parquet"] = standardize_po(raw["m3_po_dataset"])
+    stages["m3_map"] = map_m3(
+        stages["m3_stock_parquet"].copy(), params["m3_mapping_rules"], stages["m3_po_parquet"]
+    )
+    stages["reflex_map"] = map_reflex(stages["reflex_stock_parquet"], params["reflex_mapping_rules"])
+    stages["corr_dataset"], _ = reconcile_reflex_m3_node(
+        stages["reflex_map"].copy(), stages["m3_map"].copy(), params["stock_reconciliation"]
+    )
+    stages["reflex_m3_regul"] = compute_m3_regul_node(stages["corr_dataset"], params["stock_regulation"])
+    stages["validation_report"] = validate_regul_outputs(
+        stages["corr_dataset"], stages["reflex_m3_regul"], stages["m3_map"], params["output_validation"]
+    )
+    return stages
+
+
+def _write_stock_m3_rfx(reflex_m3_regul, m3_map, validation_report, filepath) -> None:
+    # node de génération + écriture des CSV d'update, comme le fait le ChunkedCSVDataset du catalog
+    config = yaml.safe_load((CONF_SOURCE / "base" / "catalog.yml").read_text())["stock_m3_rfx"]
+    dataset = ChunkedCSVDataset(**{k: v for k, v in config.items() if k not in ("type", "filepath")}, filepath=str(filepath))
+    for chunk in generate_api_m3_rfx_chunks(reflex_m3_regul, m3_map, validation_report=validation_report):
+        dataset.save(chunk)
+
+
+def _regul_to_stock_m3_rfx(corr_dataset, m3_map, params, filepath) -> None:
+    # enchaînement du pipeline processing après la réconciliation : régul, contrôles, CSV
+    reflex_m3_regul = compute_m3_regul_node(corr_dataset, params["stock_regulation"])
+    report = validate_regul_outputs(corr_dataset, reflex_m3_regul, m3_map, params["output_validation"])
+    _write_stock_m3_rfx(reflex_m3_regul, m3_map, report, filepath)
+
+
+def _m3_map_dataset(m3_map, root: Path, node_name=None) -> PartitionedParquetDataset:
+    # m3_map écrit une fois par le dataset du catalog, puis relu (projeté pour ``node_name``)
+    config = yaml.safe_load((CONF_SOURCE / "base" / "catalog.yml").read_text())["m3_map"]
+    dataset = PartitionedParquetDataset(
+        **{k: v for k, v in config.items() if k not in ("type", "filepath")}, filepath=str(root / "m3_map")
+    )
+    if not (root / "m3_map").exists():
+        dataset.save(m3_map)
+    if node_name is not None:
+        dataset.project(node_name)
+    return dataset
+
+
+def _load(dataset) -> None:
+    dataset.load()
+
+
+# node -> (fonction, construction des arguments à partir des étapes)
+CASES: Dict[str, Tuple[Callable, Callable[[Dict[str, Any], Dict[str, Any], Path], Dict[str, Any]]]] = {
+    "standardize_m3": (standardize_m3, lambda s, p, tmp: {"m3_df": s["m3_stock_dataset"]}),
+    "standardize_reflex": (standardize_reflex, lambda s, p, tmp: {"reflex_df": s["reflex_stock_dataset"]}),
+    # standardisation d'avant Arrow, pour comparaison
+    "standardize_m3_legacy": (
+        extraction_old_nodes.standardize_m3,
+        lambda s, p, tmp: {"m3_df": s["m3_stock_dataset"]},
+    ),
+    "standardize_reflex_legacy": (
+        extraction_old_nodes.standardize_reflex,
+        lambda s, p, tmp: {"reflex_df": s["reflex_stock_dataset"]},
+    ),
+    "map_m3": (
+        map_m3,
+        lambda s, p, tmp: {
+            "m3_df": s["m3_stock_parquet"].copy(),
+            "rules": p["m3_mapping_rules"],
+            "pos_df": s["m3_po_parquet"],
+        },
+    ),
+    "map_reflex": (
+        map_reflex,
+        lambda s, p, tmp: {"reflex_df": s["reflex_stock_parquet"], "mapping": p["reflex_mapping_rules"]},
+    ),
+    # relecture de m3_map : complète / colonnes de la réconciliation / de l'allocation (node_columns)
+    "load_m3_map": (_load, lambda s, p, tmp: {"dataset": _m3_map_dataset(s["m3_map"], tmp)}),
+    "load_m3_map_reconcile": (
+        _load,
+        lambda s, p, tmp: {"dataset": _m3_map_dataset(s["m3_map"], tmp, "reconcile_reflex_m3")},
+    ),
+    "load_m3_map_generate_api": (
+        _load,
+        lambda s, p, tmp: {"dataset": _m3_map_dataset(s["m3_map"], tmp, "generate_api_m3_rfx")},
+    ),
+    "reconcile_reflex_m3": (
+        reconcile_reflex_m3_node,
+        lambda s, p, tmp: {
+            "reflex_map": s["reflex_map"].copy(),
+            "m3_map": s["m3_map"].copy(),
+            "params": p["stock_reconciliation"],
+        },
+    ),
+    "compute_m3_regul": (
+        compute_m3_regul_node,
+        lambda s, p, tmp: {"corr_dataset": s["corr_dataset"], "params": p["stock_regulation"]},
+    ),
+    "validate_regul_outputs": (
+        validate_regul_outputs,
+        lambda s, p, tmp: {
+            "corr_dataset": s["corr_dataset"],
+            "reflex_m3_regul": s["reflex_m3_regul"],
+            "m3_map": s["m3_map"],
+            "params": p["output_validation"],
+        },
+    ),
+    "generate_api_m3_rfx": (
+        _write_stock_m3_rfx,
+        lambda s, p, tmp: {
+            "reflex_m3_regul": s["reflex_m3_regul"],
+            "m3_map": s["m3_map"].copy(),
+            "validation_report": s["validation_report"],
+            "filepath": tmp / "API-MMS310MI.Update",
+        },
+    ),
+    "regul_to_stock_m3_rfx": (
+        _regul_to_stock_m3_rfx,
+        lambda s, p, tmp: {
+            "corr_dataset": s["corr_dataset"],
+            "m3_map": s["m3_map"].copy(),
+            "params": p,
+            "filepath": tmp / "API-MMS310MI.Update",
+        },
+    ),
+}
+
+
+def _measure(func: Callable, make_kwargs: Callable[[], Dict[str, Any]]) -> Dict[str, float]:
+    seconds = []
+    for _ in range(ROUNDS):
+        kwargs = make_kwargs()
+        start = time.perf_counter()
+        func(**kwargs)
+        seconds.append(time.perf_counter() - start)
+
+    kwargs = make_kwargs()
+    default_pool = pa.default_memory_pool()
+    arrow_pool = pa.proxy_memory_pool(default_pool)
+    pa.set_memory_pool(arrow_pool)
+    tracemalloc.start()
+    try:
+        func(**kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        pa.set_memory_pool(default_pool)
+
+    return {
+        "seconds": round(min(seconds), 4),
+        "peak_mb": round(peak / 1024**2, 2),
+        "arrow_mb": round(arrow_pool.max_memory() / 1024**2, 2),
+    }
+
+
+@pytest.fixture(scope="session")
+def budgets():
+    budgets = yaml.safe_load(BUDGETS_PATH.read_text()) if BUDGETS_PATH.exists() else {}
+    budgets = budgets or {}
+    yield budgets
+    if RECORD:
+        BUDGETS_PATH.write_text(yaml.safe_dump(budgets, sort_keys=True))
+
+
+# une taille à la fois : les étapes d'une taille sont calculées une fois pour tous les nodes
+@pytest.mark.parametrize("node_name", list(CASES))
+@pytest.mark.parametrize("size", SIZES)
+def test_node_within_budget(size, node_name, budgets, tmp_path):
+    func, build_kwargs = CASES[node_name]
+    stages, params = _stages(size), _parameters()
+    measured = _measure(func, lambda: build_kwargs(stages, params, tmp_path))
+
+    if RECORD:
+        budgets.setdefault(size, {})[node_name] = {
+            "seconds": round(max(measured["seconds"] * TIME_MARGIN, MIN_SECONDS), 3),
+            "peak_mb": round(measured["peak_mb"] * MEMORY_MARGIN, 1),
+            "arrow_mb": round(measured["arrow_mb"] * MEMORY_MARGIN, 1),
+        }
+        return
+
+    budget = budgets.get(size, {}).get(node_name)
+    if budget is None:
+        pytest.skip(f"pas de budget enregistré pour {node_name} [{size}]")
+    assert measured["seconds"] <= budget["seconds"], (
+        f"{node_name} [{size}] : {measured['seconds']:.3f}s > budget {budget['seconds']}s"
+    )
+    assert measured["peak_mb"] <= budget["peak_mb"], (
+        f"{node_name} [{size}] : pic {measured['peak_mb']:.1f} Mo > budget {budget['peak_mb']} Mo"
+    )
+    assert measured["arrow_mb"] <= budget.get("arrow_mb", float("inf")), (
+        f"{node_name} [{size}] : pic Arrow {measured['arrow_mb']:.1f} Mo > budget {budget['arrow_mb']} Mo"
+    )
+
+
+@pytest.mark.parametrize("node_name", ["reconcile_reflex_m3", "generate_api_m3_rfx", "validate_regul_outputs"])
+@pytest.mark.parametrize("size", SIZES)
+def test_projected_load_below_full_load(size, node_name, tmp_path):
+    """
+    ``node_columns`` de m3_map : la relecture projetée d'un node consommateur coûte moins
+    de mémoire Arrow que la relecture complète, sans dépasser son pic Python.
+    """
+    stages = _stages(size)
+    full = _measure(_load, lambda: {"dataset": _m3_map_dataset(stages["m3_map"], tmp_path)})
+    projected = _measure(_load, lambda: {"dataset": _m3_map_dataset(stages["m3_map"], tmp_path, node_name)})
+
+    assert projected["arrow_mb"] < full["arrow_mb"]
+    assert projected["peak_mb"] <= full["peak_mb"] * MEMORY_MARGIN
+
+
+@pytest.mark.parametrize("table", ["m3", "reflex"])
+@pytest.mark.parametrize("size", SIZES)
+def test_standardize_below_legacy(size, table, tmp_path):
+    """
+    Standardisation Arrow face à la version pandas : pas plus lente, pic Python pas plus
+    haut. Python + Arrow (somme de deux pics non simultanés, donc majorée) reste dans la
+    marge des budgets autour du pic de la version pandas.
+    """
+    stages, params = _stages(size), _parameters()
+    measured = {}
+    for name in (f"standardize_{table}", f"standardize_{table}_legacy"):
+        func, build_kwargs = CASES[name]
+        measured[name] = _measure(func, lambda: build_kwargs(stages, params, tmp_path))
+    arrow, legacy = measured[f"standardize_{table}"], measured[f"standardize_{table}_legacy"]
+
+    assert arrow["seconds"] <= legacy["seconds"]
+    assert arrow["peak_mb"] <= legacy["peak_mb"]
+    assert arrow["peak_mb"] + arrow["arrow_mb"] <= (legacy["peak_mb"] + legacy["arrow_mb"]) * MEMORY_MARGIN
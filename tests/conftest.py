@@ -0,0 +1,74 @@
+"""
+Fixtures partagées : paramètres et catalog de ``conf/base``, tables synthétiques
+(``regulstock.synthetic``) et écriture des sorties par les datasets du catalog.
+"""
+from pathlib import Path
+
+import pytest
+import yaml
+from kedro_datasets.pandas import ParquetDataset
+
+from regulstock.datasets import ChunkedCSVDataset, PartitionedParquetDataset
+from regulstock.pipelines.extraction.nodes import standardize_m3, standardize_po, standardize_reflex
+from regulstock.synthetic import generate_m3_po, generate_m3_stock, generate_reflex_stock
+
+CONF = Path(__file__).parents[1] / "conf" / "base"
+DATASET_TYPES = {
+    "regulstock.datasets.PartitionedParquetDataset": PartitionedParquetDataset,
+    "regulstock.datasets.ChunkedCSVDataset": ChunkedCSVDataset,
+    "pandas.ParquetDataset": ParquetDataset,
+}
+
+
+@pytest.fixture
+def conf_params():
+    """Paramètres de preprocessing et de processing, sans préfixe ``params:``."""
+    params = {}
+    for name in ["parameters_preprocessing.yml", "parameters_processing.yml"]:
+        params.update(yaml.safe_load((CONF / name).read_text()))
+    return params
+
+
+@pytest.fixture
+def catalog_conf():
+    return yaml.safe_load((CONF / "catalog.yml").read_text())
+
+
+@pytest.fixture
+def raw_tables():
+    """Tables M3 / Reflex / PO synthétiques, colonnes des requêtes d'extraction."""
+    m3 = generate_m3_stock(4000, seed=3)
+    return {"m3": m3, "reflex": generate_reflex_stock(m3, 2000, seed=4), "po": generate_m3_po(m3, seed=5)}
+
+
+@pytest.fixture
+def synthetic_inputs(raw_tables):
+    """Entrées du preprocessing : ``raw_tables`` standardisées comme par l'extraction."""
+    return {
+        "m3_stock_parquet": standardize_m3(raw_tables["m3"]),
+        "reflex_stock_parquet": standardize_reflex(raw_tables["reflex"]),
+        "m3_po_parquet": standardize_po(raw_tables["po"]),
+    }
+
+
+@pytest.fixture
+def catalog_dataset(catalog_conf):
+    """Dataset ``name`` configuré comme dans le catalog, écrit sous ``root / name``."""
+
+    def make(name, root):
+        config = {k: v for k, v in catalog_conf[name].items() if k not in ("type", "filepath")}
+        return DATASET_TYPES[catalog_conf[name]["type"]](filepath=str(root / name), **config)
+
+    return make
+
+
+@pytest.fixture
+def written_bytes(catalog_dataset):
+    """Sorties écrites par les datasets du catalog (chemins sous ``root``) : octets par fichier."""
+
+    def write(outputs, root):
+        for name, df in outputs.items():
+            catalog_dataset(name, root).save(df)
+        return {path.relative_to(root): path.read_bytes() for path in sorted(root.rglob("*")) if path.is_file()}
+
+    return write
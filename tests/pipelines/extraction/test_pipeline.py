@@ -7,3 +7,406 @@ Kedro recommends using `pytest` framework, more info about it can be found
 in the official documentation:
 https://docs.pytest.org/en/latest/getting-started.html
 """
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+import yaml
+from kedro.framework.hooks.manager import _create_hook_manager
+from kedro.io import DataCatalog
+from kedro.pipeline import node
+from kedro.runner import SequentialRunner
+from kedro_datasets.pandas import SQLQueryDataset
+
+from regulstock.categoricals import to_categorical
+from regulstock.datasets import (
+    ArrowSQLQueryDataset,
+    PartitionedParquetDataset,
+    PooledSQLQueryDataset,
+    PushdownSQLQueryDataset,
+)
+from regulstock.datasets import arrow_sql_dataset
+from regulstock.datasets.pushdown_sql_dataset import pushdown_sql
+from regulstock.hooks import ColumnProjectionHooks, ConcurrentExtractionHooks
+from regulstock.pipelines.extraction import create_pipeline, old_nodes
+from regulstock.pipelines.extraction.nodes import standardize_m3, standardize_po, standardize_reflex
+from regulstock.synthetic import generate_m3_po, generate_m3_stock, generate_reflex_stock
+
+CATALOG = Path(__file__).parents[3] / "conf" / "base" / "catalog.yml"
+
+# requêtes d'avant PushdownSQLQueryDataset : nettoyage fait en Python par la standardisation
+LEGACY_M3_SQL = """
+    SELECT mit.ITNO AS SKU, mas.ITTY AS Type, mit.WHLO AS Depot, mit.WHSL AS Emplacement,
+      mit.BANO AS Lot, SUM(mit.STQT) AS Quantite, COALESCE(pop.POPN, 'N/A') AS WMS
+    FROM MITLOC mit
+    LEFT JOIN MITPOP pop ON pop.ITNO = mit.ITNO AND pop.ALWT = 3 AND pop.ALWQ = 'WMS'
+    LEFT JOIN MITMAS mas ON mas.ITNO = mit.ITNO
+    WHERE mit.WHLO NOT IN ('300', '301', '302')
+    GROUP BY mit.ITNO, mas.ITTY, mit.WHLO, mit.WHSL, mit.BANO, pop.POPN
+"""
+LEGACY_REFLEX_SQL = """
+    SELECT src.GECART AS SKU, src.GECQAL AS Qualite_Origine, sum(src.GEQGEI) AS Stock_en_VL,
+      src.GELOTF AS Lot_1
+    FROM HLGEINP AS src
+    WHERE src.GECACT = 'WLF' AND src.GECTST in ('020','200')
+    GROUP BY src.GECACT, src.GECDPO, src.GECART, src.GECQAL, src.GELOTF
+"""
+
+
+@pytest.fixture
+def m3_sqlite(tmp_path):
+    """Base SQLite avec le schéma MITLOC / MITMAS / MITPOP utilisé par m3_stock_dataset."""
+    path = tmp_path / "m3.db"
+    con = sqlite3.connect(path)
+    con.executescript(
+        """
+        CREATE TABLE MITLOC (ITNO TEXT, WHLO TEXT, WHSL TEXT, BANO TEXT, STQT REAL);
+        CREATE TABLE MITMAS (ITNO TEXT, ITTY TEXT);
+        CREATE TABLE MITPOP (ITNO TEXT, ALWT INTEGER, ALWQ TEXT, POPN TEXT);
+        """
+    )
+    con.executemany(
+        "INSERT INTO MITLOC VALUES (?, ?, ?, ?, ?)",
+        [
+            ("ITEM1 ", "100", "STOCK", "L1", 5),
+            ("ITEM1 ", "100", "STOCK\r", "L1\t", 3),
+            ("ITEM1 ", "150", "STOCK", "", 2),
+            ("ITEM2", "400", "NDISP ", None, 7),
+            ("ITEM3", "200", "DES", "L2", 1),
+            ("ITEM3", "300", "STOCK", "L2", 9),
+            ("ITEM4\r\n", "100", "STOCK", "nan\t", 4),
+        ],
+    )
+    con.executemany("INSERT INTO MITMAS VALUES (?, ?)", [("ITEM1 ", "A01"), ("ITEM2", "A06")])
+    con.executemany(
+        "INSERT INTO MITPOP VALUES (?, ?, ?, ?)",
+        [("ITEM1 ", 3, "WMS", "WMS1"), ("ITEM2", 1, "WMS", "IGNORED")],
+    )
+    con.commit()
+    con.close()
+    return f"sqlite:///{path}"
+
+
+@pytest.fixture
+def reflex_sqlite(tmp_path):
+    """Base SQLite avec la table HLGEINP utilisée par reflex_stock_dataset."""
+    path = tmp_path / "reflex.db"
+    con = sqlite3.connect(path)
+    con.execute(
+        "CREATE TABLE HLGEINP (GECACT TEXT, GECTST TEXT, GECDPO TEXT, GECART TEXT, GECQAL TEXT, GEQGEI REAL, GELOTF TEXT)"
+    )
+    con.executemany(
+        "INSERT INTO HLGEINP VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            ("WLF", "020", "D1", "SKU1", "STD", 5, "L1"),
+            ("WLF", "200", "D1", "SKU1 ", "STD", 2, "L1 "),
+            ("WLF", "020", "D2", "SKU1", "STD", 1, "L1"),
+            ("WLF", "020", "D1", "SKU2", "CAT ", 4, "N/A"),
+            ("WLF", "020", "D1", "SKU2", "CAT", None, ""),
+            ("WLF", "020", "D2", "SKU2\t", "CAT\r", 3, "N/A\r\n"),
+            ("WLF", "999", "D1", "SKU3", "STD", 8, None),
+            ("XXX", "020", "D1", "SKU4", "STD", 9, None),
+        ],
+    )
+    con.commit()
+    con.close()
+    return f"sqlite:///{path}"
+
+
+def _pushdown_args(name: str, prefix: str) -> dict:
+    config = yaml.safe_load(CATALOG.read_text())[name]
+    return {
+        "source": config["source"].replace(prefix, ""),
+        "text_cols": config["text_cols"],
+        "null_cols": config["null_cols"],
+        "sum_cols": config["sum_cols"],
+        "group_on": config.get("group_on", "raw"),
+    }
+
+
+def _m3_query() -> str:
+    return pushdown_sql(**_pushdown_args("m3_stock_dataset", "M3.dbo."))
+
+
+def _sorted_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Lignes triées sur toutes les colonnes, en valeurs (comparaison des deux chemins)."""
+    df = df.astype({c: object for c in df.select_dtypes("category").columns})
+    return df.sort_values(list(df.columns), na_position="last").reset_index(drop=True)
+
+
+def test_chunked_extraction_matches_full_load(m3_sqlite, tmp_path):
+    full = SQLQueryDataset(sql=_m3_query(), credentials={"con": m3_sqlite}).load()
+    reference = PartitionedParquetDataset(filepath=str(tmp_path / "m3_stock_full"))
+    reference.save(standardize_m3(full))
+    expected = reference.load().sort_values(["sku_m3", "depot", "lot"]).reset_index(drop=True)
+
+    output = PartitionedParquetDataset(filepath=str(tmp_path / "m3_stock"))
+    catalog = DataCatalog(
+        datasets={
+            "m3_stock_dataset": SQLQueryDataset(
+                sql=_m3_query(), credentials={"con": m3_sqlite}, load_args={"chunksize": 2}
+            ),
+            "m3_stock_parquet": output,
+        }
+    )
+    SequentialRunner().run(create_pipeline().only_nodes("standardize_m3"), catalog)
+
+    assert len(list((tmp_path / "m3_stock").glob("part-*.parquet"))) == 3
+    result = output.load().sort_values(["sku_m3", "depot", "lot"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+@pytest.mark.parametrize(
+    "name, prefix, legacy_sql, standardize, keys",
+    [
+        ("m3_stock_dataset", "M3.dbo.", LEGACY_M3_SQL, standardize_m3, None),
+        ("reflex_stock_dataset", "REFLEX.dbo.", LEGACY_REFLEX_SQL, standardize_reflex, ["sku", "lot", "qualite"]),
+    ],
+)
+def test_pushdown_extraction_matches_python_standardization(
+    m3_sqlite, reflex_sqlite, name, prefix, legacy_sql, standardize, keys
+):
+    con = m3_sqlite if name == "m3_stock_dataset" else reflex_sqlite
+    args = _pushdown_args(name, prefix)
+    legacy = standardize(SQLQueryDataset(sql=legacy_sql, credentials={"con": con}).load())
+    raw = PushdownSQLQueryDataset(credentials={"con": con}, **args).load()
+    pushed = standardize(raw)
+
+    # plus rien à nettoyer : les colonnes texte sortent de la base comme après str.strip
+    text = raw[args["text_cols"]].stack()
+    assert (text == text.str.strip()).all()
+
+    if keys is None:
+        # M3 groupé sur les valeurs brutes : des lots qui ne diffèrent que par des blancs ou
+        # une sentinelle restent des lignes distinctes (lignes débitées par generate_api_m3_rfx)
+        assert len(pushed) == len(legacy)
+    else:
+        # Reflex groupé sur les clés nettoyées (tabulation, CR / LF compris) : une ligne par
+        # clé, avec les sommes que la réconciliation calcule à partir des lignes brutes
+        assert len(pushed) < len(legacy)
+        assert not pushed.duplicated(keys).any()
+        legacy = legacy.groupby(keys, dropna=False, observed=True)["qty_reflex"].sum().reset_index()
+    pd.testing.assert_frame_equal(_sorted_rows(pushed), _sorted_rows(legacy))
+
+
+def test_pushdown_sql_rejects_unknown_group_on():
+    with pytest.raises(ValueError, match="group_on"):
+        pushdown_sql("SELECT 1", ["SKU"], ["Quantite"], group_on="category")
+
+
+@pytest.mark.parametrize(
+    "name, prefix, standardize",
+    [("m3_stock_dataset", "M3.dbo.", standardize_m3), ("reflex_stock_dataset", "REFLEX.dbo.", standardize_reflex)],
+)
+def test_arrow_sql_dataset_matches_read_sql(m3_sqlite, reflex_sqlite, name, prefix, standardize):
+    pytest.importorskip("adbc_driver_sqlite")
+    con = m3_sqlite if name == "m3_stock_dataset" else reflex_sqlite
+    expected = PushdownSQLQueryDataset(credentials={"con": con}, **_pushdown_args(name, prefix)).load()
+    dataset = ArrowSQLQueryDataset(credentials={"con": con}, **_pushdown_args(name, prefix))
+
+    result = dataset.load()
+
+    assert dataset.fetch_path == "arrow"
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in result.dtypes)
+    pd.testing.assert_frame_equal(standardize(result), standardize(expected))
+
+    # lots d'au moins 2 lignes assemblés à partir de batches d'une ligne
+    chunked = ArrowSQLQueryDataset(
+        credentials={"con": con}, load_args={"chunksize": 2}, batch_rows=1, **_pushdown_args(name, prefix)
+    )
+    chunks = list(chunked.load())
+    assert [len(c) for c in chunks[:-1]] == [2] * (len(chunks) - 1)
+    assert chunked.fetch_stats["rows"] == len(expected)
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), result)
+
+
+def test_arrow_sql_dataset_falls_back_to_read_sql(m3_sqlite, monkeypatch):
+    monkeypatch.setattr(arrow_sql_dataset, "ARROW_DRIVERS", {})
+    dataset = ArrowSQLQueryDataset(credentials={"con": m3_sqlite}, sql=_m3_query())
+
+    result = dataset.load()
+
+    assert dataset.fetch_path == "read_sql"
+    pd.testing.assert_frame_equal(result, SQLQueryDataset(sql=_m3_query(), credentials={"con": m3_sqlite}).load())
+
+
+def _arrow_columns(df):
+    return pa.Table.from_pandas(df, preserve_index=False).to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def test_standardize_arrow_columns_match_object_columns():
+    m3_raw = _edge_values(generate_m3_stock(5000, seed=11), "Lot", EDGE_VALUES)
+    reflex_raw = _edge_values(generate_reflex_stock(m3_raw, 3000, seed=12), "Lot_1", EDGE_VALUES)
+    po_raw = generate_m3_po(m3_raw, seed=5)
+
+    for standardize, raw in [(standardize_m3, m3_raw), (standardize_reflex, reflex_raw), (standardize_po, po_raw)]:
+        raw = raw.reset_index(drop=True)
+        pd.testing.assert_frame_equal(standardize(_arrow_columns(raw)), standardize(raw))
+
+
+def _edge_values(df, col, values):
+    # valeurs de bord en tête de colonne : blancs unicode, sentinelles, None / NaN, nombres
+    df = df.copy()
+    df[col] = df[col].astype(object)
+    df.iloc[: len(values), df.columns.get_loc(col)] = pd.Series(values, dtype=object).to_numpy()
+    return df
+
+
+EDGE_VALUES = ["\xa0L1\u3000", " N/A ", "None", "", "nan", None, "\tNaN\n"]
+
+
+@pytest.mark.parametrize("nan_in", [None, "Lot", "SKU"])
+def test_standardize_m3_matches_legacy(nan_in):
+    raw = generate_m3_stock(5000, seed=11)
+    for col in ["Lot", "WMS", "SKU", "Depot"]:
+        raw = _edge_values(raw, col, EDGE_VALUES)
+    if nan_in:
+        # NaN flottants / nombres : repli sur astype(str)
+        raw = _edge_values(raw, nan_in, [np.nan, 12, 3.5])
+
+    pd.testing.assert_frame_equal(standardize_m3(raw.copy()), old_nodes.standardize_m3(raw.copy()))
+    pd.testing.assert_frame_equal(standardize_m3(raw.iloc[:0]), old_nodes.standardize_m3(raw.iloc[:0]))
+
+
+def test_standardize_reflex_matches_legacy():
+    m3_raw = generate_m3_stock(5000, seed=11)
+    raw = _edge_values(generate_reflex_stock(m3_raw, 3000, seed=12), "Lot_1", EDGE_VALUES)
+    raw.index = raw.index + 100
+
+    pd.testing.assert_frame_equal(standardize_reflex(raw.copy()), old_nodes.standardize_reflex(raw.copy()))
+
+
+def test_partitioned_parquet_dataset_overwrites_previous_run(tmp_path):
+    df = pd.DataFrame({"sku": ["A", "B"], "qty_m3": [1.0, 2.0]})
+
+    first = PartitionedParquetDataset(filepath=str(tmp_path / "out"))
+    first.save(df)
+    first.save(df)
+    second = PartitionedParquetDataset(filepath=str(tmp_path / "out"))
+    second.save(df)
+
+    pd.testing.assert_frame_equal(second.load(), df)
+
+
+def test_pooled_engine_created_once_across_threads(tmp_path, monkeypatch):
+    created = []
+    create_connection = SQLQueryDataset.create_connection.__func__
+
+    def slow_create_connection(cls, connection_str, connection_args=None):
+        time.sleep(0.05)
+        created.append(connection_str)
+        create_connection(cls, connection_str, connection_args)
+
+    monkeypatch.setattr(SQLQueryDataset, "create_connection", classmethod(slow_create_connection))
+    credentials = {"con": f"sqlite:///{tmp_path / 'threads.db'}"}
+    datasets = [PooledSQLQueryDataset(sql="SELECT 1 AS x", credentials=credentials) for _ in range(8)]
+    barrier = threading.Barrier(len(datasets))
+
+    def engine(dataset):
+        barrier.wait()
+        return dataset.engine
+
+    with ThreadPoolExecutor(len(datasets)) as executor:
+        engines = list(executor.map(engine, datasets))
+
+    assert created == [credentials["con"]]
+    assert all(e is engines[0] for e in engines)
+    # cache partagé avec SQLQueryDataset (un engine par chaîne de connexion)
+    assert SQLQueryDataset.engines[credentials["con"]] is engines[0]
+
+
+def test_concurrent_extraction_prefetches_sql_inputs(m3_sqlite, tmp_path):
+    credentials = {"con": m3_sqlite}
+    m3_stock = PooledSQLQueryDataset(sql=_m3_query(), credentials=credentials, load_args={"chunksize": 2})
+    m3_po = PooledSQLQueryDataset(sql="SELECT '150' AS Depot, 'PO1 ' AS PO", credentials=credentials)
+    catalog = DataCatalog(
+        datasets={
+            "m3_stock_dataset": m3_stock,
+            "m3_po_dataset": m3_po,
+            "m3_stock_parquet": PartitionedParquetDataset(filepath=str(tmp_path / "m3_stock")),
+        }
+    )
+    hooks = ConcurrentExtractionHooks()
+    hook_manager = _create_hook_manager()
+    hook_manager.register(hooks)
+    pipe = create_pipeline().only_nodes("standardize_m3", "standardize_po")
+
+    hooks.before_pipeline_run(run_params={}, pipeline=pipe, catalog=catalog)
+    assert m3_stock._prefetched is not None and m3_po._prefetched is not None
+    outputs = SequentialRunner().run(pipe, catalog, hook_manager=hook_manager)
+    hooks.after_pipeline_run(run_params={}, pipeline=pipe, catalog=catalog)
+
+    assert m3_stock.engine is m3_po.engine
+    assert m3_stock.fetch_stats["rows"] == 6
+    assert m3_po.fetch_stats["rows"] == 1
+    assert outputs["m3_po_parquet"].load()["PO"].tolist() == ["PO1"]
+
+
+def test_partitioned_parquet_dataset_hive_partitions_and_filters(tmp_path):
+    df = to_categorical(
+        pd.DataFrame(
+            {
+                "sku": ["B", "A", "C", "A", "B"],
+                "lot": ["L1", None, "L2", "L1", None],
+                "depot": ["100", "150", "100", None, "100"],
+                "category": ["STOCK", "STOCK", "DES", "STOCK", "STOCK"],
+                "qty_m3": [1.0, 2.0, 3.0, 4.0, 5.0],
+            }
+        )
+    )
+    dataset = PartitionedParquetDataset(
+        filepath=str(tmp_path / "m3_map"), partition_cols=["category", "depot"], sort_by=["sku"]
+    )
+    dataset.save(df)
+
+    assert (tmp_path / "m3_map" / "category=STOCK" / "depot=100" / "part-00000.parquet").exists()
+    loaded = dataset.load()
+    assert list(loaded.columns) == list(df.columns)
+    assert (loaded.dtypes == df.dtypes).all()
+    expected = df.sort_values(["category", "depot", "sku"], kind="stable").reset_index(drop=True)
+    pd.testing.assert_frame_equal(loaded, expected)
+
+    depot_100 = dataset.read(filters=[["depot", "==", "100"]], columns=["sku", "qty_m3"])
+    assert depot_100.to_dict("list") == {"sku": ["C", "B", "B"], "qty_m3": [3.0, 1.0, 5.0]}
+    assert dataset.read(filters=[["sku", "==", "A"]])["qty_m3"].tolist() == [2.0, 4.0]
+
+
+def test_partitioned_parquet_dataset_projects_columns_per_node(tmp_path):
+    df = to_categorical(
+        pd.DataFrame(
+            {
+                "sku": ["B", "A", "C"],
+                "lot": ["L1", None, "L2"],
+                "depot": ["100", "150", "100"],
+                "category": ["STOCK", "STOCK", "DES"],
+                "qty_m3": [1.0, 2.0, 3.0],
+                "is_sms": [0, 0, 1],
+            }
+        )
+    )
+    dataset = PartitionedParquetDataset(
+        filepath=str(tmp_path / "m3_map"),
+        partition_cols=["category"],
+        sort_by=["sku"],
+        node_columns={"allocation": ["sku", "category", "qty_m3"]},
+    )
+    dataset.save(df)
+    full = dataset.load()
+
+    hooks = ColumnProjectionHooks()
+    hooks.before_pipeline_run(run_params={}, pipeline=None, catalog=DataCatalog(datasets={"m3_map": dataset}))
+    hooks.before_dataset_loaded(dataset_name="m3_map", node=node(len, "m3_map", "n_rows", name="allocation"))
+    projected = dataset.load()
+
+    pd.testing.assert_frame_equal(projected, full[["sku", "category", "qty_m3"]])
+    assert isinstance(projected["sku"].dtype, pd.CategoricalDtype)
+    # projection limitée au load qui suit
+    assert list(dataset.load().columns) == list(full.columns)
+    hooks.before_dataset_loaded(dataset_name="m3_map", node=node(len, "m3_map", "n_rows", name="autre"))
+    assert list(dataset.load().columns) == list(full.columns)
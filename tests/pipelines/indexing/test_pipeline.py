@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from click.testing import CliRunner
+
+from regulstock.categoricals import to_categorical
+from regulstock.lookup import _row_groups_for, lookup, lookup_command, lookup_table
+from regulstock.pipelines.indexing.nodes import build_lookup_index
+
+
+def _m3_map(n=5000):
+    rng = np.random.default_rng(0)
+    lots = np.array([f"L{i}" for i in range(20)] + [None] * 5, dtype=object)
+    return to_categorical(
+        pd.DataFrame(
+            {
+                "sku": rng.choice([f"S{i}" for i in range(300)], n),
+                "lot": rng.choice(lots, n),
+                "depot": rng.choice(["100", "150", "400"], n),
+                "qty_m3": rng.integers(0, 50, n).astype(float),
+            }
+        )
+    )
+
+
+def _write_index(df, path):
+    build_lookup_index(df).to_parquet(path, row_group_size=200, index=False)
+    return str(path)
+
+
+def test_lookup_matches_full_scan(tmp_path):
+    df = _m3_map()
+    path = _write_index(df, tmp_path / "m3_map.parquet")
+
+    found = lookup_table(path, "S42", "L3")
+    expected = df[(df["sku"] == "S42") & (df["lot"] == "L3")]
+    assert len(found) == len(expected) > 0
+    assert found["qty_m3"].sum() == expected["qty_m3"].sum()
+    assert len(lookup_table(path, "S42")) == (df["sku"] == "S42").sum()
+
+    pf = pq.ParquetFile(path)
+    assert len(_row_groups_for(pf, "S42")) <= 2 < pf.metadata.num_row_groups
+
+
+def test_lookup_command(tmp_path):
+    path = _write_index(_m3_map(), tmp_path / "m3_map.parquet")
+    assert set(lookup("S1", paths={"m3_map": path, "corr_dataset": str(tmp_path / "absent.parquet")})) == {"m3_map"}
+
+    conf = tmp_path / "conf"
+    (conf / "base").mkdir(parents=True)
+    (conf / "local").mkdir()
+    (conf / "base" / "catalog.yml").write_text(
+        "\n".join(
+            f"{name}_lookup:\n  type: pandas.ParquetDataset\n  filepath: {path if name == 'm3_map' else tmp_path / 'absent.parquet'}"
+            for name in ("corr_dataset", "m3_reliquat", "m3_map", "reflex_map")
+        )
+    )
+    result = CliRunner().invoke(lookup_command, ["--sku", "S1", "--conf-source", str(conf)])
+    assert result.exit_code == 0, result.output
+    assert "== m3_map :" in result.output
+    assert "== reflex_map : index absent" in result.output
@@ -7,3 +7,65 @@ Kedro recommends using `pytest` framework, more info about it can be found
 in the official documentation:
 https://docs.pytest.org/en/latest/getting-started.html
 """
+import pandas as pd
+
+from regulstock.categoricals import to_categorical
+from regulstock.pipelines.preprocessing.nodes import UNMAPPED_M3, map_m3, map_reflex
+
+MAPPING = {"STD": "STOCK", "CAT": "NDISP", "QUA": "NDISP"}
+
+M3_RULES = [
+    {"depot_in": ["100", "150"], "emplacement_eq": "STOCK", "category": "STOCK"},
+    {"depot_in": ["100"], "emplacement_eq": "NDISP", "category": "NDISP"},
+    # paire (100, STOCK) déjà couverte par la première règle
+    {"depot_in": ["100", "200"], "emplacement_eq": "STOCK", "category": "DES"},
+]
+
+
+def test_map_reflex_keeps_categorical_encoding(tmp_path):
+    reflex = to_categorical(
+        pd.DataFrame(
+            {
+                "sku": ["A", "B", "C", "D"],
+                "lot": ["L1", None, "L2", None],
+                "qualite": ["STD", "CAT", "XXX", None],
+                "qty_reflex": [1.0, 2.0, 3.0, 4.0],
+            }
+        )
+    )
+
+    result = map_reflex(reflex, MAPPING)
+
+    assert isinstance(result["category"].dtype, pd.CategoricalDtype)
+    assert result["category"].tolist() == ["STOCK", "NDISP", "UNMAPPED_REFLEX", "UNMAPPED_REFLEX"]
+
+    result.to_parquet(tmp_path / "rfx_map.parquet")
+    reloaded = pd.read_parquet(tmp_path / "rfx_map.parquet")
+    assert all(isinstance(reloaded[c].dtype, pd.CategoricalDtype) for c in ["sku", "lot", "qualite", "category"])
+
+
+def test_map_m3_applies_rules_first_match_wins(caplog):
+    m3 = to_categorical(
+        pd.DataFrame(
+            {
+                "sku": ["A", "B", "C", "D", "E", "F"],
+                "lot": ["L1", None, "L2", None, "L3", None],
+                "depot": ["100", "150", "200", "100", "400", None],
+                "category": ["STOCK", "STOCK", "STOCK", "NDISP", "STOCK", "STOCK"],
+                "qty_m3": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+            }
+        )
+    )
+    pos = pd.DataFrame({"PO": ["L2"]})
+
+    before = m3.copy()
+
+    result = map_m3(m3, M3_RULES, pos)
+
+    assert isinstance(result["category"].dtype, pd.CategoricalDtype)
+    assert result["category"].tolist() == ["STOCK", "STOCK", "DES", "NDISP", UNMAPPED_M3, UNMAPPED_M3]
+    # emplacement réel M3 conservé (WHSL), entrée du node inchangée
+    assert result["emplacement"].tolist() == before["category"].tolist()
+    pd.testing.assert_frame_equal(m3, before)
+    assert result["is_150"].tolist() == [0, 0, 1, 0, 0, 0]
+    assert "2 ligne(s) sans règle de mapping" in caplog.text
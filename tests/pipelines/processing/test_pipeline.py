@@ -7,3 +7,501 @@ Kedro recommends using `pytest` framework, more info about it can be found
 in the official documentation:
 https://docs.pytest.org/en/latest/getting-started.html
 """
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+
+from regulstock.categoricals import to_categorical
+from regulstock.datasets import ChunkedCSVDataset
+from regulstock.pipelines.preprocessing.nodes import map_m3, map_reflex
+from regulstock.pipelines.processing import old_nodes
+from regulstock.pipelines.processing.nodes import (
+    build_reflex_m3_wide_node,
+    compute_m3_regul_node,
+    compute_m3_reliquat_node,
+    STOCK_M3_RFX_COLUMNS,
+    generate_api_m3_rfx,
+    generate_api_m3_rfx_chunks,
+    reconcile_reflex_m3_node,
+)
+from regulstock.pipelines.processing.validation_nodes import validate_regul_outputs
+
+RECONCILIATION_PARAMS = {
+    "depots": ["100", "150", "400"],
+    "wide_flows": [
+        {
+            "name": "with lot",
+            "lot_mode": "with_lot",
+            "m3_group_cols": ["depot", "category", "lot", "type", "sku"],
+            "m3_pivot_index": ["category", "lot", "type", "sku"],
+            "merge_on": ["category", "lot", "sku"],
+        },
+        {
+            "name": "no lot",
+            "lot_mode": "no_lot",
+            "reflex_agg": True,
+            "reflex_group_cols": ["category", "sku"],
+            "m3_group_cols": ["depot", "category", "type", "sku"],
+            "m3_pivot_index": ["category", "type", "sku"],
+            "merge_on": ["sku", "category"],
+        },
+    ],
+    "reliquat_flows": [
+        {"name": "with lot", "lot_mode": "with_lot", "key_cols": ["sku", "lot", "category"]},
+        {"name": "no lot", "lot_mode": "no_lot", "key_cols": ["sku", "category"]},
+    ],
+}
+
+
+def _nulls_as_none(df: pd.DataFrame) -> pd.DataFrame:
+    # pandas mélange NaN / pd.NA / None selon l'étape ; seul le fait d'être nul compte
+    return df.astype(object).where(df.notna(), None)
+
+
+def _random_maps():
+    rng = np.random.default_rng(0)
+    skus = [f"S{i}" for i in range(40)]
+    lots = [f"L{i}" for i in range(15)] + [pd.NA] * 8
+
+    n_m3, n_rfx = 1500, 800
+    m3 = pd.DataFrame(
+        {
+            "sku": rng.choice(skus, n_m3),
+            "sku_m3": rng.choice(skus, n_m3),
+            "lot": rng.choice(np.array(lots, dtype=object), n_m3),
+            "depot": rng.choice(["100", "150", "200", "400"], n_m3),
+            "category": rng.choice(["STOCK", "NDISP", "DES"], n_m3),
+            "type": rng.choice(["A01", "A06"], n_m3),
+            "qty_m3": rng.integers(0, 50, n_m3).astype(float),
+        }
+    )
+    reflex = pd.DataFrame(
+        {
+            "sku": rng.choice(skus, n_rfx),
+            "lot": rng.choice(np.array(lots, dtype=object), n_rfx),
+            "qualite": rng.choice(["STD", "CAT"], n_rfx),
+            "qty_reflex": rng.integers(0, 50, n_rfx).astype(float),
+        }
+    )
+    reflex["category"] = reflex["qualite"].map({"STD": "STOCK", "CAT": "NDISP"})
+    return m3, reflex
+
+
+@pytest.fixture(params=["object", "category"])
+def random_maps(request):
+    m3, reflex = _random_maps()
+    if request.param == "category":
+        return to_categorical(m3), to_categorical(reflex)
+    return m3, reflex
+
+
+def test_polars_engine_matches_pandas(random_maps):
+    m3, reflex = random_maps
+    params_pl = {**RECONCILIATION_PARAMS, "engine": "polars"}
+
+    pd.testing.assert_frame_equal(
+        _nulls_as_none(build_reflex_m3_wide_node(reflex, m3, params_pl)),
+        _nulls_as_none(build_reflex_m3_wide_node(reflex, m3, RECONCILIATION_PARAMS)),
+    )
+    pd.testing.assert_frame_equal(
+        _nulls_as_none(compute_m3_reliquat_node(m3, reflex, params_pl)),
+        _nulls_as_none(compute_m3_reliquat_node(m3, reflex, RECONCILIATION_PARAMS)),
+    )
+
+
+def test_build_reflex_m3_wide_matches_legacy(random_maps):
+    m3, reflex = random_maps
+    m3_obj, reflex_obj = (df.astype({c: object for c in df.select_dtypes("category")}) for df in (m3, reflex))
+    expected = old_nodes.build_reflex_m3_wide_with_lotless(reflex_obj.copy(), m3_obj.copy(), ["100", "150", "400"])
+
+    pd.testing.assert_frame_equal(
+        _nulls_as_none(build_reflex_m3_wide_node(reflex, m3, RECONCILIATION_PARAMS)),
+        _nulls_as_none(expected),
+        check_dtype=False,
+    )
+
+
+def test_build_reflex_m3_wide_more_depots_matches_polars(random_maps):
+    m3, reflex = random_maps
+    # dépôts absents des données et ordre différent de celui des catégories
+    params = {**RECONCILIATION_PARAMS, "depots": ["400", "200", "100", "999", "150"]}
+
+    pd.testing.assert_frame_equal(
+        _nulls_as_none(build_reflex_m3_wide_node(reflex, m3, params)),
+        _nulls_as_none(build_reflex_m3_wide_node(reflex, m3, {**params, "engine": "polars"})),
+    )
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars"])
+def test_reconcile_matches_separate_nodes(random_maps, engine):
+    m3, reflex = random_maps
+    params = {**RECONCILIATION_PARAMS, "engine": engine}
+
+    wide, reliquat = reconcile_reflex_m3_node(reflex, m3, params)
+
+    pd.testing.assert_frame_equal(wide, build_reflex_m3_wide_node(reflex, m3, params))
+    pd.testing.assert_frame_equal(reliquat, compute_m3_reliquat_node(m3, reflex, params))
+
+
+def test_reconcile_reliquat_flow_without_wide_flow(random_maps):
+    m3, reflex = random_maps
+    # clés de reliquat différentes de celles de la table wide : jointure propre au flux
+    params = {
+        **RECONCILIATION_PARAMS,
+        "reliquat_flows": [{"name": "sku only", "lot_mode": "with_lot", "key_cols": ["sku"]}],
+    }
+
+    _, reliquat = reconcile_reflex_m3_node(reflex, m3, params)
+
+    m3_lot = m3[m3["lot"].notna()]
+    expected = m3_lot[~m3_lot["sku"].astype(object).isin(set(reflex.loc[reflex["lot"].notna(), "sku"].astype(object)))]
+    assert reliquat["sku_m3"].astype(object).tolist() == expected["sku_m3"].astype(object).tolist()
+    assert set(reliquat["reliquat_reason"]) <= {"NO_MATCH_WITH_LOT"}
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars"])
+def test_reconciliation_keeps_categorical_encoding(engine):
+    m3, reflex = _random_maps()
+    m3_cat, reflex_cat = to_categorical(m3.copy()), to_categorical(reflex.copy())
+    params = {**RECONCILIATION_PARAMS, "engine": engine}
+    m3_dtypes, reflex_dtypes = m3_cat.dtypes.copy(), reflex_cat.dtypes.copy()
+
+    wide = build_reflex_m3_wide_node(reflex_cat, m3_cat, params)
+    reliquat = compute_m3_reliquat_node(m3_cat, reflex_cat, params)
+
+    # entrées de node partagées : catégories alignées sur des copies, jamais en place
+    pd.testing.assert_series_equal(m3_cat.dtypes, m3_dtypes)
+    pd.testing.assert_series_equal(reflex_cat.dtypes, reflex_dtypes)
+
+    for col in ["sku", "lot", "qualite", "type", "category"]:
+        assert isinstance(wide[col].dtype, pd.CategoricalDtype), col
+    for col in ["sku_m3", "sku", "lot", "depot", "category"]:
+        assert isinstance(reliquat[col].dtype, pd.CategoricalDtype), col
+
+    pd.testing.assert_frame_equal(
+        _nulls_as_none(wide), _nulls_as_none(build_reflex_m3_wide_node(reflex, m3, params))
+    )
+    pd.testing.assert_frame_equal(
+        _nulls_as_none(reliquat), _nulls_as_none(compute_m3_reliquat_node(m3, reflex, params))
+    )
+
+
+def test_generate_api_m3_rfx_categorical_inputs(reflex_m3_regul, m3_map):
+    expected = generate_api_m3_rfx(reflex_m3_regul, m3_map)
+    result = generate_api_m3_rfx(to_categorical(reflex_m3_regul), to_categorical(m3_map))
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_unknown_engine_raises(random_maps):
+    m3, reflex = random_maps
+
+    with pytest.raises(ValueError, match="Unknown engine"):
+        build_reflex_m3_wide_node(reflex, m3, {**RECONCILIATION_PARAMS, "engine": "spark"})
+
+
+REGULATION_PARAMS = yaml.safe_load(
+    (Path(__file__).parents[3] / "conf" / "base" / "parameters_processing.yml").read_text()
+)["stock_regulation"]
+
+
+def _regul_loop(corr, params):
+    """Référence ligne à ligne : première règle applicable, dépôts débités dans l'ordre."""
+    out = {f"regul_{d}": [] for d in params["depots"]}
+    for rec in corr.to_dict("records"):
+        remaining = max(rec["stock_total_m3"] - rec["qty_reflex"], 0.0)
+        taken = dict.fromkeys(params["depots"], 0.0)
+        rule = next(
+            (
+                r
+                for r in params["rules"]
+                if (r.get("categories") is None or rec["category"] in r["categories"])
+                and (r.get("types") is None or rec["type"] in r["types"])
+            ),
+            None,
+        )
+        for depot in rule["depots"] if rule else []:
+            taken[depot] = min(remaining, max(rec.get(f"stock_{depot}", 0.0), 0.0))
+            remaining -= taken[depot]
+        for depot in params["depots"]:
+            out[f"regul_{depot}"].append(taken[depot])
+    return pd.DataFrame(out)
+
+
+@pytest.mark.parametrize(
+    "a01_depots", [["100", "150"], ["150", "100"], ["150", "400", "100"]]
+)
+def test_compute_m3_regul_matches_row_loop(random_maps, a01_depots):
+    reflex, m3 = random_maps[1], random_maps[0]
+    params = {**RECONCILIATION_PARAMS, "depots": ["100", "150", "200", "400"]}
+    corr = reconcile_reflex_m3_node(reflex.copy(), m3.copy(), params)[0]
+    rules = [{**REGULATION_PARAMS["rules"][0], "depots": a01_depots}, *REGULATION_PARAMS["rules"][1:]]
+    regul_params = {**REGULATION_PARAMS, "rules": rules}
+
+    regul = compute_m3_regul_node(corr, regul_params)
+
+    regul_cols = [f"regul_{d}" for d in regul_params["depots"]]
+    pd.testing.assert_frame_equal(regul[regul_cols].reset_index(drop=True), _regul_loop(corr, regul_params))
+    assert regul["regul_total"].sum() > 0
+    # jamais plus que l'excédent ni que le stock du dépôt
+    excess = (corr["stock_total_m3"] - corr["qty_reflex"]).clip(lower=0)
+    assert (regul["regul_total"] <= excess + 1e-9).all()
+    for depot in regul_params["depots"]:
+        assert (regul[f"regul_{depot}"] <= corr[f"stock_{depot}"] + 1e-9).all()
+    np.testing.assert_allclose(
+        regul["ecart_rfx_m3_apres_regul"], corr["qty_reflex"] - (corr["stock_total_m3"] - regul["regul_total"])
+    )
+
+
+def test_compute_m3_regul_missing_stock_column(random_maps, caplog):
+    reflex, m3 = random_maps[1], random_maps[0]
+    # la réconciliation ne produit pas stock_200 : rien n'est retiré du 200
+    params = {**RECONCILIATION_PARAMS, "depots": ["100", "150", "400"]}
+    corr = reconcile_reflex_m3_node(reflex.copy(), m3.copy(), params)[0]
+
+    regul = compute_m3_regul_node(corr, REGULATION_PARAMS)
+
+    assert "stock_200" in caplog.text
+    assert (regul["regul_200"] == 0).all()
+    with pytest.raises(ValueError, match="dépôt absent"):
+        compute_m3_regul_node(corr, {**REGULATION_PARAMS, "rules": [{"depots": ["999"]}]})
+
+
+@pytest.fixture
+def m3_map():
+    return pd.DataFrame(
+        {
+            "sku": ["A", "A", "A", "A", "B", "B", "C"],
+            "sku_m3": ["A1", "A2", "A3", "A4", "B1", "B2", "C1"],
+            "lot": ["L1", "L1", "L1", None, None, None, "L9"],
+            "depot": ["100", "100", "150", "100", "400", "400", "100"],
+            "category": ["STOCK"] * 6 + ["NDISP"],
+            "emplacement": ["STOCK"] * 6 + ["NDISP"],
+            "type": ["A01"] * 4 + ["A06"] * 2 + ["A01"],
+            "qty_m3": [5.0, 8.0, 4.0, 3.0, 2.0, 0.0, 1.0],
+        }
+    )
+
+
+@pytest.fixture
+def reflex_m3_regul():
+    return pd.DataFrame(
+        {
+            "sku": ["A", "A", "B", "C"],
+            "lot": ["L1", None, None, "L9"],
+            "category": ["STOCK", "STOCK", "STOCK", "STOCK"],
+            "regul_100": [10.0, 7.0, 0.0, 1.0],
+            "regul_150": [3.0, 0.0, 0.0, 0.0],
+            "regul_400": [0.0, 0.0, 5.0, 0.0],
+            "regul_total": [13.0, 7.0, 5.0, 1.0],
+        }
+    )
+
+
+def test_generate_api_m3_rfx_matches_legacy_loop(reflex_m3_regul, m3_map):
+    expected = old_nodes.generate_api_m3_rfx(reflex_m3_regul, m3_map)
+    result = generate_api_m3_rfx(reflex_m3_regul, m3_map)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_generate_api_m3_rfx_never_exceeds_stock(reflex_m3_regul, m3_map):
+    result = generate_api_m3_rfx(reflex_m3_regul, m3_map)
+
+    assert result.groupby("ITNO")["STQI"].sum().to_dict() == {
+        "A2": 8, "A1": 2, "A3": 3, "A4": 3, "B1": 2,
+    }
+
+
+def test_generate_api_m3_rfx_writes_m3_emplacement(reflex_m3_regul, m3_map):
+    # emplacement M3 rangé dans la catégorie STOCK par m3_mapping_rules
+    m3_map["emplacement"] = ["STOCK", "PICK", "STOCK", "STOCK", "RES", "RES", "NDISP"]
+
+    result = generate_api_m3_rfx(reflex_m3_regul, m3_map)
+
+    assert result.set_index("ITNO")["WHSL"].to_dict() == {
+        "A1": "STOCK", "A2": "PICK", "A3": "STOCK", "A4": "STOCK", "B1": "RES",
+    }
+
+
+def test_generate_api_m3_rfx_empty():
+    regul = pd.DataFrame({"sku": [], "lot": [], "category": [], "regul_100": []})
+    m3 = pd.DataFrame(columns=["sku", "sku_m3", "lot", "depot", "category", "emplacement", "qty_m3"])
+
+    result = generate_api_m3_rfx(regul, m3)
+
+    assert list(result.columns) == ["CONO", "WHLO", "ITNO", "WHSL", "BANO", "STQI", "STAG", "BREM", "RSCD"]
+    assert result.empty
+
+
+@pytest.mark.parametrize("max_rows, max_bytes, rows_per_file", [(3, None, [3, 2]), (None, 1, [1] * 5)])
+def test_generate_api_m3_rfx_chunks_capped_files(reflex_m3_regul, m3_map, tmp_path, max_rows, max_bytes, rows_per_file):
+    expected = generate_api_m3_rfx(reflex_m3_regul, m3_map)
+    dataset = ChunkedCSVDataset(
+        filepath=str(tmp_path / "API-MMS310MI.Update"),
+        columns=STOCK_M3_RFX_COLUMNS,
+        quantity_col="STQI",
+        max_rows=max_rows,
+        max_bytes=max_bytes,
+    )
+
+    # lots de 2 lignes : un fichier est complété par le lot suivant avant d'être fermé
+    for chunk in generate_api_m3_rfx_chunks(reflex_m3_regul, m3_map, chunk_rows=2):
+        dataset.save(chunk)
+
+    manifest = dataset.manifest()
+    assert [entry["rows"] for entry in manifest["files"]] == rows_per_file
+    assert manifest["rows"] == len(expected)
+    assert manifest["quantity"] == expected["STQI"].sum()
+    for entry in manifest["files"]:
+        lines = (tmp_path / "API-MMS310MI.Update" / entry["file"]).read_text().splitlines()
+        assert lines[0] == ",".join(STOCK_M3_RFX_COLUMNS)
+        assert len(lines) == entry["rows"] + 1
+    pd.testing.assert_frame_equal(dataset.load(), expected.astype(str))
+
+
+def test_generate_api_m3_rfx_chunks_empty_output(tmp_path):
+    regul = pd.DataFrame({"sku": [], "lot": [], "category": [], "regul_100": []})
+    m3 = pd.DataFrame(columns=["sku", "sku_m3", "lot", "depot", "category", "emplacement", "qty_m3"])
+    dataset = ChunkedCSVDataset(filepath=str(tmp_path / "out"), columns=STOCK_M3_RFX_COLUMNS, quantity_col="STQI")
+
+    for chunk in generate_api_m3_rfx_chunks(regul, m3):
+        dataset.save(chunk)
+
+    assert dataset.manifest()["files"] == []
+    assert dataset.load().empty
+
+
+VALIDATION_PARAMS = yaml.safe_load(
+    (Path(__file__).parents[3] / "conf" / "base" / "parameters_processing.yml").read_text()
+)["output_validation"]
+
+
+@pytest.fixture
+def corr_dataset():
+    return pd.DataFrame(
+        {
+            "sku": ["A", "A", "B", "C"],
+            "lot": ["L1", None, None, "L9"],
+            "category": ["STOCK"] * 4,
+            "type": ["A01", "A01", "A06", "A01"],
+            "qty_reflex": [0.0, 0.0, 0.0, 0.0],
+            "stock_100": [13.0, 3.0, 0.0, 1.0],
+            "stock_150": [4.0, 0.0, 0.0, 0.0],
+            "stock_400": [0.0, 0.0, 2.0, 0.0],
+            "stock_total_m3": [17.0, 3.0, 2.0, 1.0],
+        }
+    )
+
+
+def test_validate_regul_outputs_ok(corr_dataset, reflex_m3_regul, m3_map):
+    regul = reflex_m3_regul.assign(
+        regul_100=[10.0, 3.0, 0.0, 1.0], regul_400=[0.0, 0.0, 2.0, 0.0], regul_total=[13.0, 3.0, 2.0, 1.0]
+    )
+
+    report = validate_regul_outputs(corr_dataset, regul, m3_map, VALIDATION_PARAMS)
+
+    assert report["status"] == "ok"
+    assert report["rows"] == {"corr_dataset": 4, "reflex_m3_regul": 4, "m3_map": 7}
+    assert {name: c["violations"] for name, c in report["checks"].items()} == dict.fromkeys(
+        ["schema", "negative_quantity", "regul_total_mismatch", "removal_exceeds_stock", "duplicate_corr_key"], 0
+    )
+    json.dumps(report)
+
+
+def test_validate_regul_outputs_reports_violations(corr_dataset, reflex_m3_regul, m3_map, tmp_path):
+    corr = pd.concat([corr_dataset, corr_dataset.iloc[[0]]], ignore_index=True)
+    corr.loc[2, "qty_reflex"] = -1.0
+    regul = reflex_m3_regul.assign(regul_total=[13.0, 7.0, 5.0, 2.0])
+
+    report = validate_regul_outputs(corr, regul, m3_map, VALIDATION_PARAMS)
+
+    checks = report["checks"]
+    assert report["status"] == "failed"
+    assert checks["negative_quantity"]["examples"] == [
+        {"table": "corr_dataset", "column": "qty_reflex", "sku": "B", "lot": None, "category": "STOCK", "qty_reflex": -1.0}
+    ]
+    assert checks["regul_total_mismatch"]["violations"] == 1
+    assert checks["regul_total_mismatch"]["examples"][0]["sku"] == "C"
+    # (A, sans lot, 100) : 7 demandés pour 3 en stock ; (B, sans lot, 400) : 5 pour 2
+    assert checks["removal_exceeds_stock"]["examples"] == [
+        {"sku": "A", "lot": None, "depot": "100", "removed": 7.0, "qty_m3": 3.0},
+        {"sku": "B", "lot": None, "depot": "400", "removed": 5.0, "qty_m3": 2.0},
+    ]
+    assert checks["duplicate_corr_key"]["violations"] == 2
+    assert report["violations"] == 1 + 1 + 2 + 2
+    json.dumps(report)
+
+    # le fichier STOCK_M3_RFX n'est pas généré
+    with pytest.raises(ValueError, match="removal_exceeds_stock"):
+        next(generate_api_m3_rfx_chunks(regul, m3_map, validation_report=report))
+
+
+def test_validate_regul_outputs_allows_negative_m3_stock(corr_dataset, reflex_m3_regul, m3_map):
+    # stock M3 négatif : ni la ligne de m3_map ni les stocks agrégés de corr_dataset ne sont signalés
+    m3 = pd.concat([m3_map, m3_map.iloc[[6]].assign(qty_m3=-4.0)], ignore_index=True)
+    corr = corr_dataset.assign(stock_150=[4.0, -4.0, 0.0, 0.0], stock_total_m3=[17.0, -1.0, 2.0, 1.0])
+    regul = reflex_m3_regul.assign(
+        regul_100=[10.0, 0.0, 0.0, 1.0], regul_400=[0.0, 0.0, 0.0, 0.0], regul_total=[13.0, 0.0, 0.0, 1.0]
+    )
+    params = {k: v for k, v in VALIDATION_PARAMS.items() if k != "corr_keys"}
+
+    report = validate_regul_outputs(corr, regul, m3, params)
+
+    assert report["checks"]["negative_quantity"]["violations"] == 0
+    # corr_keys par défaut : sku, lot, category, type
+    assert report["checks"]["duplicate_corr_key"]["violations"] == 0
+    assert report["status"] == "ok"
+
+
+def test_validate_regul_outputs_schema(corr_dataset, reflex_m3_regul, m3_map):
+    m3 = m3_map.assign(qty_m3=m3_map["qty_m3"].astype(str))
+
+    report = validate_regul_outputs(corr_dataset.drop(columns="type"), reflex_m3_regul, m3, VALIDATION_PARAMS)
+
+    # schéma invalide : les autres contrôles ne sont pas lancés
+    assert list(report["checks"]) == ["schema"]
+    assert [(e["table"], e["column"]) for e in report["checks"]["schema"]["examples"]] == [
+        ("corr_dataset", "type"),
+        ("m3_map", "qty_m3"),
+    ]
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars"])
+def test_default_flows_pass_validation_on_duplicated_reflex_lots(synthetic_inputs, conf_params, engine):
+    inputs, params = synthetic_inputs, conf_params
+    reflex = inputs["reflex_stock_parquet"]
+    # Reflex synthétique non dédoublonné : plusieurs lignes par (sku, lot)
+    assert reflex[reflex["lot"].notna()].duplicated(["sku", "lot"]).any()
+    m3_map = map_m3(inputs["m3_stock_parquet"], params["m3_mapping_rules"], inputs["m3_po_parquet"])
+    reflex_map = map_reflex(reflex, params["reflex_mapping_rules"])
+
+    corr, _ = reconcile_reflex_m3_node(reflex_map, m3_map, {**params["stock_reconciliation"], "engine": engine})
+    regul = compute_m3_regul_node(corr, params["stock_regulation"])
+    report = validate_regul_outputs(corr, regul, m3_map, params["output_validation"])
+
+    # lignes Reflex d'un même (category, lot, sku) agrégées : pas de double retrait
+    assert report["status"] == "ok", report["checks"]
+    # aucune quantité Reflex perdue par l'agrégation (répétée par type M3 éventuellement)
+    assert corr["qty_reflex"].sum() >= reflex_map["qty_reflex"].sum()
+    next(generate_api_m3_rfx_chunks(regul, m3_map, validation_report=report))
+
+
+def test_conf_depots_cover_regulation_rules(synthetic_inputs, conf_params, caplog):
+    inputs, params = synthetic_inputs, conf_params
+    m3_map = map_m3(inputs["m3_stock_parquet"], params["m3_mapping_rules"], inputs["m3_po_parquet"])
+    reflex_map = map_reflex(inputs["reflex_stock_parquet"], params["reflex_mapping_rules"])
+
+    corr, _ = reconcile_reflex_m3_node(reflex_map, m3_map, params["stock_reconciliation"])
+    regul = compute_m3_regul_node(corr, params["stock_regulation"])
+
+    # chaque dépôt de stock_regulation a sa colonne stock_<depot> : pas d'avertissement,
+    # et le stock DES / DEF (dépôt 200) est bien régularisé
+    assert "stock_" not in caplog.text
+    des_def = corr["category"].isin(["DES", "DEF"]).to_numpy()
+    assert regul.loc[des_def, "regul_200"].sum() > 0
+    assert (regul.loc[~des_def, "regul_200"] == 0).all()
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+from kedro.io import DataCatalog, MemoryDataset
+from kedro.runner import SequentialRunner
+
+from regulstock.m3api import MIClient
+from regulstock.m3api_mock import serve_mock_m3
+from regulstock.pipelines.processing.nodes import STOCK_M3_RFX_COLUMNS
+from regulstock.pipelines.submission import create_pipeline
+from regulstock.pipelines.submission.nodes import submit_stock_m3_rfx
+
+
+def _stock_m3_rfx(n=3000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "CONO": 100,
+            "WHLO": rng.choice(["100", "150", "400"], n),
+            "ITNO": [f"ITEM{i:05d}" for i in range(n)],
+            "WHSL": "STOCK",
+            "BANO": rng.choice(["L1", "L2", ""], n),
+            # une ligne sur 500 à 0 : rejetée par MMS310MI
+            "STQI": np.where(np.arange(n) % 500 == 0, 0, rng.integers(1, 20, n)),
+            "STAG": 2,
+            "BREM": "ECART",
+            "RSCD": "X01",
+        }
+    )[STOCK_M3_RFX_COLUMNS]
+
+
+def test_submission_pipeline_posts_every_row():
+    rows = _stock_m3_rfx()
+    params = {"batch_size": 100, "max_workers": 8, "max_retries": 4, "backoff_s": 0.01}
+
+    with serve_mock_m3(latency_s=0.005, fail_every=7) as server:
+        catalog = DataCatalog(
+            datasets={
+                "stock_m3_rfx": MemoryDataset(rows),
+                "params:m3_api": MemoryDataset({**params, "base_url": server.url}),
+            }
+        )
+        outputs = SequentialRunner().run(create_pipeline(), catalog)
+
+    log, summary = outputs["submission_log"].load(), outputs["submission_summary"].load()
+
+    assert len(log) == len(rows) and log["ITNO"].tolist() == rows["ITNO"].tolist()
+    rejected = log["STQI"] == "0"
+    assert (log.loc[rejected, "status"] == "ERROR").all() and (log.loc[~rejected, "status"] == "OK").all()
+    assert log.loc[rejected, "error"].str.contains("Quantité").all()
+    # les 503 périodiques sont absorbés par les renvois
+    assert summary["retries"] > 0
+    assert (summary["rows"], summary["ok"], summary["errors"], summary["batches"]) == (3000, 2994, 6, 30)
+    assert summary["rows_per_s"] > 0 and summary["latency_p95_s"] >= summary["latency_p50_s"]
+
+    # lignes acceptées reçues une fois chacune, lot vide non transmis
+    assert sorted(r["ITNO"] for r in server.received) == log.loc[~rejected, "ITNO"].tolist()
+    assert sum("BANO" not in r for r in server.received) == ((log["BANO"] == "") & ~rejected).sum()
+
+
+def test_client_gives_up_after_max_retries():
+    rows = _stock_m3_rfx(10)
+
+    # chaque requête échoue : lot abandonné après 1 + max_retries tentatives
+    with serve_mock_m3(fail_every=1) as server:
+        log, summary = MIClient(server.url, batch_size=5, max_retries=2, backoff_s=0.01).submit(rows)
+
+    assert (log["status"] == "ERROR").all()
+    assert (log["attempts"] == 3).all()
+    assert log["error"].str.startswith("HTTP 503").all()
+    assert summary["errors"] == 10 and summary["retries"] == 4
+    assert server.requests == 6
+
+
+@pytest.mark.parametrize(
+    "server_args, client_args",
+    [({"fail_every": 1, "fail_status": 500}, {}), ({"latency_s": 0.3}, {"timeout_s": 0.05})],
+)
+def test_client_does_not_resend_uncertain_batches(server_args, client_args):
+    rows = _stock_m3_rfx(10)
+
+    # 500 / délai de lecture dépassé : M3 a pu appliquer le lot, un renvoi retirerait deux fois le stock
+    with serve_mock_m3(**server_args) as server:
+        log, summary = MIClient(server.url, batch_size=5, max_retries=3, backoff_s=0.01, **client_args).submit(rows)
+
+    assert (log["status"] == "UNKNOWN").all()
+    assert (log["attempts"] == 1).all()
+    assert log["error"].str.contains("non renvoyé").all()
+    assert (summary["unknown"], summary["errors"], summary["retries"]) == (10, 0, 0)
+    assert server.requests == 2
+
+
+def test_client_records_client_errors():
+    # 4xx hors 429 : pas de renvoi, lignes en erreur (pas d'exception : le journal est écrit)
+    with serve_mock_m3(fail_every=1, fail_status=401) as server:
+        log, summary = MIClient(server.url, batch_size=2, backoff_s=0.01).submit(_stock_m3_rfx(3))
+    with serve_mock_m3() as other:
+        not_found, _ = MIClient(other.url + "/autre-chemin").submit(_stock_m3_rfx(3))
+
+    assert (log["status"] == "ERROR").all() and log["error"].str.startswith("HTTP 401").all()
+    assert summary["errors"] == 3 and server.requests == 2
+    assert (not_found["status"] == "ERROR").all() and not_found["error"].str.startswith("HTTP 404").all()
+    assert other.requests == 0
+
+
+def test_client_retries_when_connection_refused():
+    with serve_mock_m3() as server:
+        url = server.url
+    # serveur arrêté : connexion refusée, la requête n'est jamais partie
+    log, summary = MIClient(url, batch_size=5, max_retries=2, backoff_s=0.01).submit(_stock_m3_rfx(5))
+
+    assert (log["status"] == "ERROR").all() and (log["attempts"] == 3).all()
+    assert log["error"].str.startswith("ConnectionError après 3").all()
+
+
+def test_client_marks_rows_missing_from_response(monkeypatch):
+    client = MIClient("http://m3.invalid", batch_size=3)
+    response = requests.Response()
+    response.status_code = 200
+    response._content = b'{"results": [{"transaction": "Update"}, {"errorMessage": "Article inconnu"}]}'
+    monkeypatch.setattr(client.session, "post", lambda *args, **kwargs: response)
+
+    log, summary = client.submit(_stock_m3_rfx(3))
+
+    assert log["status"].tolist() == ["OK", "ERROR", "UNKNOWN"]
+    assert log["error"].tolist() == ["", "Article inconnu", "Résultat absent de la réponse M3"]
+    assert (summary["ok"], summary["errors"], summary["unknown"]) == (1, 1, 1)
+
+
+def test_submission_requires_both_credentials(monkeypatch):
+    monkeypatch.setenv("M3_API_USER", "regul")
+    monkeypatch.delenv("M3_API_PASSWORD", raising=False)
+
+    with pytest.raises(ValueError, match="M3_API_PASSWORD manquant"):
+        submit_stock_m3_rfx(_stock_m3_rfx(1), {"base_url": "http://m3.invalid"})
@@ -0,0 +1,78 @@
+import json
+
+import pandas as pd
+
+from regulstock.datasets import ChunkedCSVDataset, PartitionedParquetDataset
+from regulstock.diff import diff_datasets
+
+
+def _diff_outputs(root, corr, stock_m3_rfx, columns):
+    """corr_dataset / stock_m3_rfx écrits comme par le catalog (nouvelle instance = nouveau run)."""
+    datasets = {
+        "corr_dataset": PartitionedParquetDataset(filepath=str(root / "corr"), partition_cols=["category"], sort_by=["sku"]),
+        "stock_m3_rfx": ChunkedCSVDataset(
+            filepath=str(root / "API-MMS310MI.Update"),
+            columns=columns,
+            quantity_col="STQI",
+            max_rows=2,
+        ),
+    }
+    datasets["corr_dataset"].save(corr)
+    datasets["stock_m3_rfx"].save(stock_m3_rfx)
+    return datasets
+
+
+def test_diff_reports_added_removed_changed_keys(catalog_conf, tmp_path):
+    columns = catalog_conf["stock_m3_rfx"]["columns"]
+    corr = pd.DataFrame(
+        {
+            "sku": ["A", "A", "B", "C"],
+            "lot": ["L1", None, None, "L9"],
+            "category": ["STOCK", "STOCK", "NDISP", "STOCK"],
+            "type": ["A01", "A01", "A06", "A01"],
+            "qty_reflex": [1.0, 2.0, 3.0, 4.0],
+            "stock_100": [10.0, 3.0, 0.0, 5.0],
+            "stock_total_m3": [10.0, 3.0, 0.0, 5.0],
+        }
+    )
+    rfx = pd.DataFrame(
+        {
+            "CONO": "100", "WHLO": ["100", "100", "150"], "ITNO": ["A1", "A2", "C1"], "WHSL": "STOCK",
+            "BANO": ["L1", "", "L9"], "STQI": ["9", "1", "1"], "STAG": "2", "BREM": "REGUL", "RSCD": "INV",
+        }
+    )
+    state_dir = tmp_path / "state"
+    first = diff_datasets(_diff_outputs(tmp_path / "day1", corr, rfx, columns), state_dir)
+    # premier run : tout est ajouté
+    assert first["previous_run"] is None
+    assert first["datasets"]["corr_dataset"]["added"] == 4
+    assert first["datasets"]["stock_m3_rfx"]["quantity_delta"]["total"] == {"STQI": 11.0}
+
+    # C supprimé, D ajouté, stock de (A, L1) et STQI de A2 modifiés, qty_reflex de B inchangée
+    corr2 = pd.concat(
+        [corr.iloc[:3], corr.iloc[[3]].assign(sku="D", qty_reflex=6.0, stock_total_m3=1.0)], ignore_index=True
+    )
+    corr2.loc[0, ["stock_100", "stock_total_m3"]] = 12.0
+    rfx2 = rfx.assign(STQI=["9", "4", "1"])
+    report = diff_datasets(_diff_outputs(tmp_path / "day2", corr2, rfx2, columns), state_dir)
+
+    result = report["datasets"]["corr_dataset"]
+    assert report["previous_run"] == first["generated_at"]
+    assert (result["added"], result["removed"], result["changed"]) == (1, 1, 1)
+    assert result["quantity_delta"]["total"] == {"qty_reflex": 2.0, "stock_total_m3": -2.0}
+    assert result["quantity_delta"]["changed"] == {"qty_reflex": 0.0, "stock_total_m3": 2.0}
+    assert result["examples"]["removed"] == [
+        {"sku": "C", "lot": "L9", "category": "STOCK", "type": "A01", "qty_reflex": 4.0, "stock_total_m3": 5.0}
+    ]
+    assert result["examples"]["added"][0]["sku"] == "D"
+    assert result["examples"]["changed"][0]["stock_total_m3_before"] == 10.0
+    assert result["examples"]["changed"][0]["stock_total_m3_after"] == 12.0
+    rfx_result = report["datasets"]["stock_m3_rfx"]
+    assert (rfx_result["added"], rfx_result["removed"], rfx_result["changed"]) == (0, 0, 1)
+    assert rfx_result["quantity_delta"]["total"] == {"STQI": 3.0}
+    json.dumps(report)
+
+    # mêmes sorties : rien n'a changé ; --no-update garde les instantanés
+    same = diff_datasets(_diff_outputs(tmp_path / "day3", corr2, rfx2, columns), state_dir, update=False)
+    assert all(r["added"] == r["removed"] == r["changed"] == 0 for r in same["datasets"].values())
+    assert diff_datasets(_diff_outputs(tmp_path / "day4", corr, rfx, columns), state_dir)["datasets"]["corr_dataset"]["changed"] == 1
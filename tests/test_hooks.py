@@ -0,0 +1,150 @@
+import json
+
+import pandas as pd
+import pytest
+from kedro.framework.hooks.manager import _create_hook_manager
+from kedro.io import DataCatalog, MemoryDataset
+from kedro.runner import SequentialRunner
+
+from regulstock import hooks as regulstock_hooks
+from regulstock.categoricals import sort_by_value
+from regulstock.hooks import ArrowHandoffHooks, NodeCacheHooks, ProfilingHooks
+from regulstock.pipelines.preprocessing import create_pipeline as create_preprocessing_pipeline
+from regulstock.pipelines.preprocessing.nodes import map_m3, map_reflex
+from regulstock.pipelines.processing.pipeline import create_pipeline
+
+
+@pytest.fixture
+def maps(synthetic_inputs, conf_params):
+    """m3_map / reflex_map des entrées synthétiques, comme en sortie du preprocessing."""
+    m3 = map_m3(synthetic_inputs["m3_stock_parquet"], conf_params["m3_mapping_rules"], synthetic_inputs["m3_po_parquet"])
+    reflex = map_reflex(synthetic_inputs["reflex_stock_parquet"], conf_params["reflex_mapping_rules"])
+    return m3, reflex
+
+
+def _run_reconciliation(hooks, m3, reflex, params):
+    hook_manager = _create_hook_manager()
+    hook_manager.register(hooks)
+    catalog = DataCatalog(
+        datasets={
+            "m3_map": MemoryDataset(m3),
+            "reflex_map": MemoryDataset(reflex),
+            "params:stock_reconciliation": MemoryDataset(params),
+        }
+    )
+    pipe = create_pipeline().only_nodes("reconcile_reflex_m3")
+    hooks.before_pipeline_run(run_params={}, pipeline=pipe, catalog=catalog)
+    outputs = SequentialRunner().run(pipe, catalog, hook_manager=hook_manager)
+    hooks.after_pipeline_run(run_params={}, pipeline=pipe, catalog=catalog)
+    return {name: outputs[name].load() for name in ("corr_dataset", "m3_reliquat")}
+
+
+def test_node_cache_hits_when_inputs_unchanged(maps, conf_params, tmp_path):
+    m3, reflex = maps
+    params = conf_params["stock_reconciliation"]
+    hooks = NodeCacheHooks(cache_dir=str(tmp_path / "cache"), report_path=str(tmp_path / "report.json"))
+
+    first = _run_reconciliation(hooks, m3.copy(), reflex.copy(), params)
+    assert {r["status"] for r in hooks.report.values()} == {"miss"}
+
+    second = _run_reconciliation(hooks, m3.copy(), reflex.copy(), params)
+    assert {r["status"] for r in hooks.report.values()} == {"hit"}
+    for name in first:
+        pd.testing.assert_frame_equal(second[name], first[name])
+
+    _run_reconciliation(hooks, m3.copy(), reflex.copy(), {**params, "depots": ["100", "150"]})
+    assert {r["status"] for r in hooks.report.values()} == {"miss"}
+    assert '"misses": 1' in (tmp_path / "report.json").read_text()
+
+
+def test_node_cache_misses_when_code_changes(maps, conf_params, tmp_path, monkeypatch):
+    m3, reflex = maps
+    params = conf_params["stock_reconciliation"]
+    hooks = NodeCacheHooks(cache_dir=str(tmp_path / "cache"), report_path=None)
+    _run_reconciliation(hooks, m3.copy(), reflex.copy(), params)
+
+    # modification d'un module du package (ex. categoricals.py) ou d'une version de pandas
+    monkeypatch.setattr(regulstock_hooks, "code_fingerprint", lambda: "autre code")
+    _run_reconciliation(hooks, m3.copy(), reflex.copy(), params)
+    assert {r["status"] for r in hooks.report.values()} == {"miss"}
+
+
+def test_node_cache_evicts_least_recently_used(maps, conf_params, tmp_path):
+    m3, reflex = maps
+    hooks = NodeCacheHooks(cache_dir=str(tmp_path / "cache"), max_bytes=1, report_path=None)
+
+    _run_reconciliation(hooks, m3, reflex, conf_params["stock_reconciliation"])
+    # l'entrée dépasse la taille max mais n'est jamais évincée juste après son écriture
+    assert [entry.parent.name for entry in (tmp_path / "cache").glob("*/*")] == ["reconcile_reflex_m3"]
+
+
+def test_profiling_hooks_report(maps, conf_params, tmp_path):
+    m3, reflex = maps
+    hooks = ProfilingHooks(report_dir=str(tmp_path), sampling=True, interval=0.001)
+
+    _run_reconciliation(hooks, m3, reflex, conf_params["stock_reconciliation"])
+
+    report = json.loads(next(tmp_path.glob("profile-*.json")).read_text())
+    entries = {entry["node"]: entry for entry in report["nodes"]}
+    assert set(entries) == {"reconcile_reflex_m3"}
+    wide = entries["reconcile_reflex_m3"]
+    assert wide["wall_s"] > 0 and wide["peak_mb"] > 0
+    assert wide["inputs"]["m3_map"]["rows"] == len(m3)
+    assert wide["outputs"]["corr_dataset"]["rows"] > 0
+    folded = next(tmp_path.glob("profile-*.folded")).read_text().splitlines()
+    assert folded and all(line.rsplit(" ", 1)[1].isdigit() for line in folded)
+
+
+@pytest.fixture
+def run_full(synthetic_inputs, conf_params, catalog_dataset):
+    """Preprocessing + processing, datasets du catalog (parquet, STOCK_M3_RFX) écrits sous ``root``."""
+
+    def run(root, hooks=None, nodes=None):
+        datasets = {
+            name: catalog_dataset(name, root)
+            for name in ("m3_map", "reflex_map", "corr_dataset", "m3_reliquat", "stock_m3_rfx")
+        }
+        catalog = DataCatalog(
+            datasets={
+                **{name: MemoryDataset(df.copy()) for name, df in synthetic_inputs.items()},
+                **datasets,
+                **{f"params:{key}": MemoryDataset(value) for key, value in conf_params.items()},
+            }
+        )
+        pipe = create_preprocessing_pipeline() + create_pipeline()
+        if nodes:
+            pipe = pipe.only_nodes(*nodes)
+        hook_manager = _create_hook_manager()
+        if hooks is not None:
+            hook_manager.register(hooks)
+            hooks.before_pipeline_run(run_params={}, pipeline=pipe, catalog=catalog)
+        SequentialRunner().run(pipe, catalog, hook_manager=hook_manager)
+        if hooks is not None:
+            hooks.after_pipeline_run(run_params={}, pipeline=pipe, catalog=catalog)
+        return catalog, datasets
+
+    return run
+
+
+def test_arrow_handoff_persists_same_outputs(run_full, tmp_path):
+    hooks = ArrowHandoffHooks()
+    catalog, datasets = run_full(tmp_path / "handoff", hooks)
+    _, reference = run_full(tmp_path / "reference")
+
+    # datasets d'origine remis dans le catalog, parquet entièrement écrit en fin de run
+    assert all(catalog.get(name) is dataset for name, dataset in datasets.items())
+    for name, dataset in datasets.items():
+        result, expected = dataset.load(), reference[name].load()
+        assert len(result) > 0
+        pd.testing.assert_frame_equal(
+            sort_by_value(result, list(result.columns)), sort_by_value(expected, list(expected.columns))
+        )
+    # fichier STOCK_M3_RFX identique à l'octet près : l'allocation ne dépend pas de l'ordre
+    # des lignes de m3_map (mémoire dans l'ordre des lots, relecture par partition)
+    written = {p.name: p.read_bytes() for p in sorted((tmp_path / "handoff" / "stock_m3_rfx").glob("*.csv"))}
+    assert written
+    assert written == {p.name: p.read_bytes() for p in sorted((tmp_path / "reference" / "stock_m3_rfx").glob("*.csv"))}
+
+    # relance partielle : m3_map / reflex_map relus depuis le parquet écrit en tâche de fond
+    catalog, _ = run_full(tmp_path / "handoff", ArrowHandoffHooks(), nodes=["reconcile_reflex_m3"])
+    assert len(catalog.get("corr_dataset").load()) == len(datasets["corr_dataset"].load())
@@ -0,0 +1,38 @@
+import logging
+import re
+
+import pandas as pd
+
+from regulstock.incremental import load_state, run_incremental, save_state
+from regulstock.pipelines.extraction.nodes import standardize_m3, standardize_po, standardize_reflex
+
+
+def test_incremental_run_matches_full_rebuild(raw_tables, conf_params, written_bytes, tmp_path, caplog):
+    m3_raw, reflex_raw = raw_tables["m3"], raw_tables["reflex"]
+    po = standardize_po(raw_tables["po"])
+
+    def inputs(m3, reflex):
+        return {"m3_stock_parquet": standardize_m3(m3), "reflex_stock_parquet": standardize_reflex(reflex), "m3_po_parquet": po}
+
+    _, state = run_incremental(inputs(m3_raw.copy(), reflex_raw.copy()), conf_params)
+    save_state(tmp_path / "state", state)
+
+    # quantités modifiées, lot changé, lignes supprimées, nouveau sku
+    m3_new, reflex_new = m3_raw.copy(), reflex_raw.copy()
+    m3_new.loc[[5, 17, 250], "Quantite"] += 7
+    m3_new.loc[40, "Lot"] = "LNEW"
+    m3_new = m3_new.drop(index=[100, 101])
+    reflex_new = reflex_new.drop(index=[3])
+    new_row = m3_new.iloc[[0]].assign(SKU="NOUVEAU", WMS="")
+    m3_new = pd.concat([m3_new, new_row], ignore_index=True)
+
+    with caplog.at_level(logging.INFO, logger="regulstock.incremental"):
+        incremental, _ = run_incremental(
+            inputs(m3_new.copy(), reflex_new.copy()), conf_params, load_state(tmp_path / "state")
+        )
+    n_changed = int(re.search(r"(\d+) sku\(s\) à recalculer", caplog.text).group(1))
+    assert 0 < n_changed <= 8
+    full, _ = run_incremental(inputs(m3_new.copy(), reflex_new.copy()), conf_params)
+
+    assert set(incremental) == {"m3_map", "reflex_map", "corr_dataset", "m3_reliquat"}
+    assert written_bytes(incremental, tmp_path / "incremental") == written_bytes(full, tmp_path / "full")
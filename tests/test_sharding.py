@@ -0,0 +1,27 @@
+import pandas as pd
+
+from regulstock.datasets import PartitionedParquetDataset
+from regulstock.pipelines.processing.nodes import compute_m3_regul_node, generate_api_m3_rfx
+from regulstock.sharding import SHARDED_OUTPUTS, run_sharded
+
+
+def test_sharded_run_matches_single_process_byte_for_byte(synthetic_inputs, conf_params, written_bytes, tmp_path):
+    inputs, params = synthetic_inputs, conf_params
+
+    single = run_sharded({k: v.copy() for k, v in inputs.items()}, params, n_shards=1)
+    sharded = run_sharded({k: v.copy() for k, v in inputs.items()}, params, n_shards=3, max_workers=2)
+
+    assert set(sharded) == {*SHARDED_OUTPUTS, "validation_report"}
+    assert len(single["stock_m3_rfx"]) > 0
+    # tables complètes validées comme par le node validate_regul_outputs
+    report = sharded.pop("validation_report")
+    assert report["status"] == "ok"
+    assert report["rows"] == single.pop("validation_report")["rows"]
+    # régul calculée sur le corr_dataset du run, tel que relu par compute_m3_regul dans un kedro run
+    corr_dataset = PartitionedParquetDataset(filepath=str(tmp_path / "corr"), partition_cols=["category"], sort_by=["sku"])
+    corr_dataset.save(single["corr_dataset"])
+    regul = compute_m3_regul_node(corr_dataset.load(), params["stock_regulation"])
+    pd.testing.assert_frame_equal(sharded["reflex_m3_regul"], regul, check_categorical=False)
+    # mêmes lignes STOCK_M3_RFX, dans le même ordre que le node de génération
+    pd.testing.assert_frame_equal(sharded["stock_m3_rfx"], generate_api_m3_rfx(regul, single["m3_map"]))
+    assert written_bytes(sharded, tmp_path / "sharded") == written_bytes(single, tmp_path / "single")